@@ -1,25 +1,30 @@
 import os
-from batch_framework.filesystem import LocalBackend, DropboxBackend
+from batch_framework.filesystem import LocalBackend
 from batch_framework.rdb import DuckDBBackend
-from src.meta import metagraph
-from src.puppygraph import convert_duckdb_to_schema
+from src.meta import metagraph, parquet_options, node_attributes, summary_tables, collection_resource
+from src.puppygraph import build_schema, publish_database
 from src.puppygraph import ResultCollectLayer
+from etl import get_dropbox_fs
 import json
+# the serving database data/duckdb/demo.db is copied into
+# the working copy duckdb/demo.db, on which the collection is built
 rdb = DuckDBBackend(LocalBackend('data/duckdb'), db_name='demo.db')
 to_puppygraph_adaptor = ResultCollectLayer(
     rdb, metagraph=metagraph,
-    input_fs=DropboxBackend('/data/graph/')
+    input_fs=get_dropbox_fs('/data/graph/'),
+    parquet_options=parquet_options,
+    node_attributes=node_attributes,
+    summary_tables=summary_tables,
+    resource_config=collection_resource,
+    incremental=True
 )
 
 if __name__ == '__main__':
-    if os.path.exists('data/duckdb/demo.db'):
-        os.remove('data/duckdb/demo.db')
-    if os.path.exists('duckdb/demo.db'):
-        os.remove('duckdb/demo.db')
+    # WAL of an interrupted run does not belong to the fresh working copy
+    if os.path.exists('duckdb/demo.db.wal'):
+        os.remove('duckdb/demo.db.wal')
     to_puppygraph_adaptor.execute()
-    rdb.commit()
-    schema = convert_duckdb_to_schema(
-        'data/duckdb/demo.db',
-        metagraph=metagraph
-    )
+    rdb.conn.close()
+    publish_database('duckdb/demo.db', 'data/duckdb/demo.db')
+    schema = build_schema(metagraph, to_puppygraph_adaptor.table_stats)
     json.dump(schema, open('schema.json', 'w'))
@@ -0,0 +1,75 @@
+"""
+Capture query plans of all MetaGraph SQLs and compare them
+against the previous report.
+
+Usage:
+    python -m benchmark.explain --packages 10000
+    python -m benchmark.explain --data data/canon/output/ --report plans.json
+"""
+import argparse
+import os
+import shutil
+import tempfile
+from batch_framework.rdb import DuckDBBackend
+from batch_framework.storage import PandasStorage
+from batch_framework.filesystem import LocalBackend
+from src.meta import metagraph
+from src.tabularize import LatestTabularize
+from src.graph.explain import explain_metagraph, compare_reports, save_report, load_report
+from .generator import generate_latest
+
+REPORT_PATH = os.path.join(os.path.dirname(__file__), 'plans.json')
+
+
+def explain_synthetic(num_packages: int, seed: int = 0, blowup_ratio: float = 1.0):
+    workdir = tempfile.mkdtemp(prefix='pypi_graph_explain_')
+    try:
+        os.makedirs(f'{workdir}/raw')
+        generate_latest(num_packages, f'{workdir}/raw/latest.parquet', seed=seed)
+        canon_fs = LocalBackend(f'{workdir}/canon/')
+        LatestTabularize(
+            input_storage=PandasStorage(LocalBackend(f'{workdir}/raw/')),
+            output_storage=PandasStorage(canon_fs)
+        ).execute()
+        return explain_metagraph(
+            metagraph, DuckDBBackend(), canon_fs, blowup_ratio=blowup_ratio)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--packages', type=int, default=10000,
+                        help='number of synthetic packages')
+    parser.add_argument('--data', default=None,
+                        help='folder of tabularized tables to explain instead of synthetic data')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--report', default=REPORT_PATH)
+    parser.add_argument('--update-report', action='store_true',
+                        help='overwrite the previous report with this run')
+    parser.add_argument('--tolerance', type=float, default=0.5,
+                        help='allowed relative slowdown of a SQL before flagging')
+    parser.add_argument('--blowup-ratio', type=float, default=1.0,
+                        help='flag joins producing more than this times their largest input')
+    args = parser.parse_args()
+    if args.data is not None:
+        report = explain_metagraph(
+            metagraph, DuckDBBackend(), LocalBackend(args.data),
+            blowup_ratio=args.blowup_ratio)
+    else:
+        report = explain_synthetic(
+            args.packages, seed=args.seed, blowup_ratio=args.blowup_ratio)
+    print(f"{'sql':<45}{'ms':>10}{'rows':>12}  issues")
+    for key, result in sorted(report.items(), key=lambda x: -x[1]['total_ms']):
+        print(f"{key:<45}{result['total_ms']:>10.1f}{result['rows']:>12}  "
+              f"{'; '.join(result['issues'])}")
+    previous = load_report(args.report)
+    if args.update_report or previous is None:
+        save_report(report, args.report)
+        print('report saved:', args.report)
+    else:
+        regressions = compare_reports(previous, report, tolerance=args.tolerance)
+        for regression in regressions:
+            print('regression -', regression)
+        if regressions:
+            raise SystemExit(f'{len(regressions)} SQL regressions')
@@ -0,0 +1,150 @@
+"""
+Generate synthetic `latest.parquet` rows in the shape of
+the pypi rawdata consumed by `LatestTabularize`.
+
+Popularity of packages as requirements, keywords and licenses
+follows a Zipf-like distribution so that the graph has
+the heavy-tailed degrees of the real PyPI graph.
+"""
+from typing import Dict, List, Optional
+import json
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+__all__ = ['generate_records', 'generate_latest', 'MIN_PACKAGES']
+
+LICENSES = ['MIT', 'BSD', 'Apache 2.0', 'GPLv3', 'LGPL', 'MPL-2.0',
+            'UNKNOWN', '', None]
+KEYWORDS = ['python', 'data', 'api', 'web', 'cli', 'machine learning',
+            'testing', 'async', 'database', 'cloud', 'django', 'flask',
+            'json', 'http', 'parser', 'security', 'plugin', 'tool']
+DOMAINS = ['gmail.com', 'example.org', 'corp.com', 'university.edu',
+           'mail.ru', 'outlook.com']
+# LatestTabularize keeps a keyword once it is seen more than 300 times,
+# so the first packages always have the most popular keyword
+MIN_PACKAGES = 301
+PYTHON_REQUIRES = ['>=3.6', '>=3.7', '>=3.8', '>=3.9', '>=3.10', None]
+MARKERS = ['', "; python_version < '3.8'", "; extra == 'dev'",
+           "; sys_platform == 'win32'"]
+
+
+def _zipf_choice(rng: np.random.Generator, size: int, n: int,
+                 a: float = 1.3) -> np.ndarray:
+    return (rng.zipf(a, size=size) - 1) % n
+
+
+def _package_name(i: int) -> str:
+    # Mix spellings as seen on PyPI (case, '-', '_', '.')
+    sep = ['-', '_', '.', '-'][i % 4]
+    name = f'pkg{sep}{i}'
+    return name.capitalize() if i % 7 == 0 else name
+
+
+def _versions(rng: np.random.Generator, count: int) -> List[str]:
+    majors = rng.integers(0, 5, size=count)
+    minors = rng.integers(0, 30, size=count)
+    return sorted({f'{a}.{b}.0' for a, b in zip(majors, minors)})
+
+
+def _person(rng: np.random.Generator, i: int) -> Dict[str, Optional[str]]:
+    person_id = int(_zipf_choice(rng, 1, 50000, a=1.1)[0])
+    name = f'Person {person_id}'
+    email = f'person.{person_id}@{DOMAINS[person_id % len(DOMAINS)]}'
+    style = i % 4
+    if style == 0:
+        return {'name': name, 'email': email}
+    elif style == 1:
+        return {'name': None, 'email': f'{name} <{email}>'}
+    elif style == 2:
+        return {'name': name, 'email': f'{email},other.{person_id}@corp.com'}
+    else:
+        return {'name': name, 'email': None}
+
+
+def _latest(rng: np.random.Generator, i: int, name: str,
+            num_packages: int) -> Dict:
+    num_releases = int(rng.integers(1, 50))
+    num_requires = int(rng.poisson(3))
+    requires = dict()
+    for dep in _zipf_choice(rng, num_requires, num_packages + 100):
+        req_name = _package_name(int(dep)).lower()
+        if rng.random() < 0.1:
+            requires[req_name] = None
+        else:
+            marker = MARKERS[int(rng.integers(0, len(MARKERS)))]
+            requires[req_name] = {
+                'releases': _versions(rng, int(rng.integers(0, 10))),
+                'requirement': f'{req_name}>={int(rng.integers(0, 5))}.0{marker}'
+            }
+    author = _person(rng, i)
+    maintainer = _person(rng, i + 1) if rng.random() < 0.3 else {
+        'name': None, 'email': None}
+    github = f'https://github.com/account{i % 997}/{name}'
+    keyword_ids = _zipf_choice(rng, int(rng.integers(0, 5)), len(KEYWORDS), a=1.5)
+    if i < MIN_PACKAGES:
+        keyword_ids = np.append(keyword_ids, 0)
+    keywords = ','.join(KEYWORDS[k] for k in np.unique(keyword_ids))
+    info = {
+        'name': name,
+        'package_url': f'https://pypi.org/project/{name}/',
+        'requires_python': PYTHON_REQUIRES[i % len(PYTHON_REQUIRES)],
+        'version': _versions(rng, 1)[0],
+        'license': LICENSES[int(_zipf_choice(rng, 1, len(LICENSES))[0])],
+        'project_urls': {
+            'Homepage': github,
+            'Documentation': f'https://{name}.readthedocs.io/en/latest/',
+            'Issues': f'{github}/issues'
+        } if i % 5 else None,
+        'home_page': github if i % 3 else '',
+        'docs_url': None,
+        'keywords': keywords if keywords else None,
+        'author': author['name'],
+        'author_email': author['email'],
+        'maintainer': maintainer['name'],
+        'maintainer_email': maintainer['email']
+    }
+    return {
+        'info': info,
+        'num_releases': num_releases,
+        'num_info_dependencies': num_requires,
+        'requires': requires if requires else None
+    }
+
+
+def generate_records(num_packages: int, start: int = 0, stop: Optional[int] = None,
+                     seed: int = 0) -> pd.DataFrame:
+    """
+    Generate rows `start` ~ `stop` of a `latest` table of `num_packages` packages.
+    """
+    stop = num_packages if stop is None else stop
+    rng = np.random.default_rng([seed, start])
+    names = []
+    latests = []
+    for i in range(start, stop):
+        name = _package_name(i)
+        names.append(name)
+        latests.append(json.dumps(_latest(rng, i, name, num_packages)))
+    return pd.DataFrame({'name': names, 'latest': latests})
+
+
+def generate_latest(num_packages: int, path: str, seed: int = 0,
+                    batch_size: int = 100000):
+    """
+    Write a synthetic `latest.parquet` of `num_packages` packages
+    batch by batch, keeping memory bounded for large scales.
+    """
+    writer = None
+    try:
+        for start in range(0, num_packages, batch_size):
+            stop = min(start + batch_size, num_packages)
+            table = pa.Table.from_pandas(
+                generate_records(num_packages, start, stop, seed=seed),
+                preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(path, table.schema)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
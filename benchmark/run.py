@@ -0,0 +1,274 @@
+"""
+Benchmark the pipeline stage by stage on LocalBackend
+with synthetic data.
+
+Usage:
+    python -m benchmark.run --packages 1000 10000
+    python -m benchmark.run --packages 100000 --update-baseline
+"""
+from typing import Callable, Dict, List, Optional
+import argparse
+import copy
+import json
+import os
+import re
+import resource
+import shutil
+import tempfile
+import threading
+import time
+import tracemalloc
+from batch_framework.rdb import DuckDBBackend
+from batch_framework.storage import PandasStorage
+from batch_framework.filesystem import FileSystem, LocalBackend
+from src.meta import metagraph, dependency_link, analytics_links, node_attributes, summary_tables, parquet_options
+from src.tabularize import LatestTabularize
+from src.graph.subgraph.validate import Validator
+from src.graph.csr import CSRExporter
+from src.graph.dependency import DependencyClosure
+from src.graph.analytics import GraphAnalytics
+from src.puppygraph import ResultCollectLayer
+from src.graph.executor import GraphSQLExecutor
+from src.graph.encoding import EncodedStorage, ParquetOptions
+from .generator import generate_latest, MIN_PACKAGES
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'baseline.json')
+
+
+class PeakMemory:
+    """
+    Sample resident set size of the process in a background thread
+    and keep the peak observed between `start` and `stop`.
+    """
+
+    def __init__(self, interval: float = 0.01):
+        self._interval = interval
+        self._peak = 0
+        self._on = False
+        self._thread = None
+
+    @staticmethod
+    def current_rss() -> int:
+        try:
+            with open('/proc/self/statm') as f:
+                return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+        except (OSError, ValueError):
+            # Not on Linux: fallback to the peak of the whole process
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+    def _sample(self):
+        while self._on:
+            self._peak = max(self._peak, PeakMemory.current_rss())
+            time.sleep(self._interval)
+
+    def start(self):
+        self._peak = PeakMemory.current_rss()
+        self._on = True
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> int:
+        self._on = False
+        self._thread.join()
+        return max(self._peak, PeakMemory.current_rss())
+
+
+def measure(func: Callable[[], None], trace_python: bool = False) -> Dict[str, float]:
+    """
+    Run `func` and measure wall time, cpu time and peak memory.
+    """
+    sampler = PeakMemory()
+    if trace_python:
+        tracemalloc.start()
+    sampler.start()
+    start_rss = PeakMemory.current_rss()
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    try:
+        func()
+    finally:
+        wall = time.perf_counter() - wall_start
+        cpu = time.process_time() - cpu_start
+        peak_rss = sampler.stop()
+    result = {
+        'seconds': round(wall, 4),
+        'cpu_seconds': round(cpu, 4),
+        'peak_rss_mb': round(peak_rss / 2**20, 1),
+        'rss_increase_mb': round((peak_rss - start_rss) / 2**20, 1)
+    }
+    if trace_python:
+        result['python_peak_mb'] = round(
+            tracemalloc.get_traced_memory()[1] / 2**20, 1)
+        tracemalloc.stop()
+    return result
+
+
+class SingleSQL(GraphSQLExecutor):
+    """
+    Run one SQL of a stage on its referenced input tables only
+    """
+
+    def __init__(self, name: str, sql: str, candidates: List[str],
+                 input_fs: FileSystem, output_fs: FileSystem,
+                 parquet_options: Optional[ParquetOptions] = None):
+        self._name = name
+        self._sql = sql
+        self._inputs = [
+            id for id in candidates if re.search(rf'\b{id}\b', sql)]
+        super().__init__(DuckDBBackend(), input_fs=input_fs, output_fs=output_fs)
+        if parquet_options is not None:
+            self._output_storage = EncodedStorage(output_fs, parquet_options)
+
+    def end(self, **kwargs):
+        if isinstance(self._output_storage, EncodedStorage):
+            self._output_storage.print_report()
+
+    @property
+    def input_ids(self):
+        return self._inputs
+
+    @property
+    def output_ids(self):
+        return [self._name]
+
+    def sqls(self, **kwargs):
+        return {self._name: self._sql}
+
+
+def build_stages(workdir: str) -> Dict[str, Callable[[], None]]:
+    """
+    Build the ordered benchmark stages on local folders of `workdir`
+    """
+    raw_fs = LocalBackend(f'{workdir}/raw/')
+    canon_fs = LocalBackend(f'{workdir}/canon/')
+    subgraph_fs = LocalBackend(f'{workdir}/subgraph/')
+    output_fs = LocalBackend(f'{workdir}/graph/')
+    csr_fs = LocalBackend(f'{workdir}/csr/')
+    grouping_meta = metagraph.grouping_meta
+    # grouped tables are encoded as in production, reporting the bytes saved by the encoding
+    grouping_options = copy.copy(parquet_options)
+    grouping_options.measure_baseline = True
+    stages = dict()
+    stages['tabularize'] = LatestTabularize(
+        input_storage=PandasStorage(raw_fs),
+        output_storage=PandasStorage(canon_fs)
+    ).execute
+    for name, sql in metagraph.node_sqls.items():
+        stages[f'node_sql/{name}'] = SingleSQL(
+            name, sql, metagraph.input_ids, canon_fs, subgraph_fs).execute
+    for name, sql in metagraph.link_sqls.items():
+        stages[f'link_sql/{name}'] = SingleSQL(
+            name, sql, metagraph.input_ids, canon_fs, subgraph_fs).execute
+    validators = Validator(metagraph, PandasStorage(subgraph_fs)).validator_list
+    stages['validation'] = lambda: [v.execute() for v in validators]
+    for name, sql in grouping_meta.node_grouping_sqls.items():
+        stages[f'grouping/{name}'] = SingleSQL(
+            name, sql, grouping_meta.input_nodes, subgraph_fs, output_fs,
+            parquet_options=grouping_options).execute
+    for name, sql in grouping_meta.link_grouping_sqls.items():
+        stages[f'grouping/{name}'] = SingleSQL(
+            name, sql, grouping_meta.input_links, subgraph_fs, output_fs,
+            parquet_options=grouping_options).execute
+    stages['csr_export'] = CSRExporter(
+        metagraph.triplets, input_fs=output_fs, output_fs=csr_fs).execute
+    node = metagraph.triplets[dependency_link][0]
+    stages['dependency_closure'] = DependencyClosure(
+        dependency_link, node, PandasStorage(output_fs)).execute
+    stages['analytics'] = GraphAnalytics(
+        metagraph.triplets, analytics_links,
+        input_fs=output_fs, output_fs=output_fs).execute
+    stages['result_collection'] = ResultCollectLayer(
+        DuckDBBackend(), metagraph=metagraph, input_fs=output_fs,
+        node_attributes=node_attributes, summary_tables=summary_tables).execute
+    return stages
+
+
+def run(num_packages: int, trace_python: bool = False,
+        seed: int = 0) -> Dict[str, Dict[str, float]]:
+    workdir = tempfile.mkdtemp(prefix='pypi_graph_bench_')
+    try:
+        os.makedirs(f'{workdir}/raw')
+        generate_latest(num_packages, f'{workdir}/raw/latest.parquet', seed=seed)
+        results = dict()
+        for name, stage in build_stages(workdir).items():
+            results[name] = measure(stage, trace_python=trace_python)
+            print(f'[{num_packages}] {name}: {results[name]}')
+        return results
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def compare(results: Dict[str, Dict[str, float]],
+            baseline: Dict[str, Dict[str, float]], tolerance: float,
+            min_seconds: float = 0.) -> List[str]:
+    """
+    Print results against the baseline.
+
+    Args:
+        - min_seconds: slowdowns shorter than this are not flagged,
+            as the timings of short stages are dominated by noise.
+
+    Returns:
+        List[str]: stages slower or more memory hungry than
+            the baseline by more than `tolerance`.
+    """
+    regressions = []
+    print(f"{'stage':<40}{'sec':>10}{'base':>10}{'ratio':>8}"
+          f"{'rss_mb':>10}{'base':>10}{'ratio':>8}")
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            print(f"{name:<40}{result['seconds']:>10.3f}{'-':>10}{'-':>8}"
+                  f"{result['peak_rss_mb']:>10.1f}{'-':>10}{'-':>8}")
+            continue
+        time_ratio = result['seconds'] / max(base['seconds'], 1e-3)
+        rss_ratio = result['peak_rss_mb'] / max(base['peak_rss_mb'], 1e-3)
+        flag = ''
+        slower = time_ratio > 1 + tolerance and \
+            result['seconds'] - base['seconds'] > min_seconds
+        if slower or rss_ratio > 1 + tolerance:
+            flag = '  <- regression'
+            regressions.append(name)
+        print(f"{name:<40}{result['seconds']:>10.3f}{base['seconds']:>10.3f}"
+              f"{time_ratio:>8.2f}{result['peak_rss_mb']:>10.1f}"
+              f"{base['peak_rss_mb']:>10.1f}{rss_ratio:>8.2f}{flag}")
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--packages', type=int, nargs='+', default=[1000],
+                        help=f'numbers of synthetic packages ({MIN_PACKAGES} ~ 1M)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--update-baseline', action='store_true',
+                        help='overwrite the baseline of the measured scales')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='allowed relative slowdown before flagging')
+    parser.add_argument('--min-seconds', type=float, default=0.5,
+                        help='allowed absolute slowdown before flagging')
+    parser.add_argument('--trace-python', action='store_true',
+                        help='also trace python heap peak (slows python code)')
+    args = parser.parse_args()
+    if min(args.packages) < MIN_PACKAGES:
+        parser.error(f'--packages should be at least {MIN_PACKAGES}')
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    else:
+        baseline = dict()
+    regressions = []
+    for num_packages in args.packages:
+        results = run(num_packages, trace_python=args.trace_python, seed=args.seed)
+        print(f'\n=== {num_packages} packages ===')
+        regressions.extend(
+            compare(results, baseline.get(str(num_packages), dict()),
+                    args.tolerance, args.min_seconds))
+        if args.update_baseline:
+            baseline[str(num_packages)] = results
+    if args.update_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print('baseline updated:', args.baseline)
+    elif regressions:
+        raise SystemExit(f'regressions: {regressions}')
@@ -0,0 +1,83 @@
+"""
+Benchmark Dropbox chunk transfers on a local mock server
+throttling like Dropbox: fixed concurrencies against AIMD.
+
+Usage:
+    python -m benchmark.transport --chunks 200 --max-concurrency 16
+"""
+from typing import Dict
+import argparse
+import asyncio
+import os
+import time
+from threading import Thread
+from plugins.async_dropbox import AIMDLimiter, AsyncDropboxTransport
+from plugins.mock_dropbox_server import MockDropboxServer
+
+
+def start_server(server: MockDropboxServer) -> str:
+    """
+    Run the mock server on an event loop of its own thread
+
+    Returns:
+        str: url of the server
+    """
+    loop = asyncio.new_event_loop()
+    Thread(target=loop.run_forever, daemon=True).start()
+    return asyncio.run_coroutine_threadsafe(server.start(), loop).result()
+
+
+def run_transfers(url: str, limiter: AIMDLimiter, chunks: int,
+                  chunk_size: int) -> Dict[str, float]:
+    transport = AsyncDropboxTransport(
+        lambda: 'token', limiter, base_delay=0.1, content_url=url)
+    data = os.urandom(chunk_size)
+    try:
+        start = time.time()
+        futures = [
+            transport.submit(transport.upload(f'/bench/{i}.parquet', data))
+            for i in range(chunks)]
+        for future in futures:
+            future.result()
+        futures = [
+            transport.submit(transport.download(f'/bench/{i}.parquet'))
+            for i in range(chunks)]
+        for future in futures:
+            assert future.result() == data
+        seconds = time.time() - start
+    finally:
+        transport.close()
+    return {
+        'seconds': seconds,
+        'mb_per_s': 2 * chunks * chunk_size / seconds / 1024 ** 2,
+        'throttled': transport.stats['throttled'],
+        'limit': limiter.limit
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--chunks', type=int, default=200)
+    parser.add_argument('--chunk-size', type=int, default=100000)
+    parser.add_argument('--max-concurrency', type=int, default=16,
+                        help='concurrency beyond which the mock server throttles')
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--bandwidth', type=float, default=None,
+                        help='bytes per second of the mock server')
+    parser.add_argument('--retry-after', type=float, default=1.)
+    args = parser.parse_args()
+    server = MockDropboxServer(
+        max_concurrency=args.max_concurrency, latency=args.latency,
+        bandwidth=args.bandwidth, retry_after=args.retry_after)
+    url = start_server(server)
+    limiters = {
+        'fixed-8': lambda: AIMDLimiter(8, 8, 8),
+        'fixed-32': lambda: AIMDLimiter(32, 32, 32),
+        'fixed-64': lambda: AIMDLimiter(64, 64, 64),
+        'aimd': lambda: AIMDLimiter(8, 1, 64)
+    }
+    print(f'{"transport":<12}{"seconds":>10}{"MB/s":>10}{"throttled":>12}{"limit":>8}')
+    for name, create_limiter in limiters.items():
+        result = run_transfers(url, create_limiter(), args.chunks, args.chunk_size)
+        print(f'{name:<12}{result["seconds"]:>10.2f}{result["mb_per_s"]:>10.1f}'
+              f'{result["throttled"]:>12}{result["limit"]:>8.1f}')
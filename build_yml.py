@@ -1,14 +1,48 @@
 """
 Build ETL.yml into github action
+
+Usage:
+    python build_yml.py
+    python build_yml.py --costs 'profiles/*.jsonl'
+    python build_yml.py --local     # without Dropbox credentials
+
+With `--costs`, tasks are packed into jobs by their recorded
+time and memory (profiles of `PYPI_GRAPH_PROFILE`, uploaded
+as artifacts by job.yml).
+
+The task ids are also written to tasks.json, locating every task
+in the ETL objects for run_task.py.
+
+The tasks only depend on the ETL objects and their input / output ids,
+so `--local` builds them from the local transformer, which does not
+connect to Dropbox.
 """
+import argparse
 from etl import get_transformer
-from batch_framework.adaptor import GithubActionAdaptor
+from plugins.cost_aware_adaptor import CostAwareAdaptor, load_costs
+from plugins.task_manifest import save_manifest
 
 if __name__ == '__main__':
-    etl_obj = get_transformer(local=False)
-    adaptor = GithubActionAdaptor(etl_group=etl_obj)
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--costs', nargs='*', default=[],
+                        help='profile files (glob patterns) with the task costs')
+    parser.add_argument('--max-job-seconds', type=float, default=5 * 3600)
+    parser.add_argument('--max-job-memory-mb', type=float, default=12000)
+    parser.add_argument('--job-overhead-seconds', type=float, default=60)
+    parser.add_argument('--local', action='store_true',
+                        help='build the tasks from the local transformer')
+    args = parser.parse_args()
+    etl_obj = get_transformer(local=args.local)
+    adaptor = CostAwareAdaptor(
+        etl_group=etl_obj,
+        costs=load_costs(args.costs),
+        max_job_seconds=args.max_job_seconds,
+        max_job_memory_mb=args.max_job_memory_mb,
+        job_overhead_seconds=args.job_overhead_seconds
+    )
     adaptor.create_yml(
         job_yml_path='./.github/workflows/job.yml',
         template_yml_path='./template.yml',
         target_yml_path='./.github/workflows/etl.yml'
     )
+    save_manifest(adaptor, etl_obj, 'tasks.json')
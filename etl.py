@@ -1,7 +1,20 @@
-import copy
-from batch_framework.filesystem import LocalBackend, DropboxBackend
+import os
+from batch_framework.filesystem import LocalBackend
+from plugins.new_dropbox_backend import NewDropboxBackend
 from src.main import WholeGraphDataPlatform
-from src.meta import metagraph
+from src.meta import metagraph, parquet_options, dependency_link, analytics_links, resources, resolution
+
+# Chunks are transferred by the asyncio transport adapting its concurrency
+# to Dropbox throttling if PYPI_GRAPH_ASYNC_TRANSPORT is set (e.g., to 1)
+ASYNC_TRANSPORT = bool(os.environ.get('PYPI_GRAPH_ASYNC_TRANSPORT'))
+
+
+def get_dropbox_fs(directory: str) -> NewDropboxBackend:
+    """
+    Dropbox folder resuming interrupted uploads, downloading
+    the inputs of a stage through shared workers and streaming SQL outputs.
+    """
+    return NewDropboxBackend(directory, async_transport=ASYNC_TRANSPORT)
 
 
 def rawdata_cloud2local():
@@ -11,7 +24,7 @@ def rawdata_cloud2local():
     """
     for folder in ['raw']:
         local_fs = LocalBackend(f'./data/canon/{folder}/')
-        dropbox_fs = DropboxBackend(f'/data/canon/{folder}/')
+        dropbox_fs = get_dropbox_fs(f'/data/canon/{folder}/')
         for file in ['latest.parquet']:
             print('folder:', folder, 'file:', file, 'upload started')
             buff = dropbox_fs.download_core(file)
@@ -23,19 +36,35 @@ def rawdata_cloud2local():
 def get_transformer(local: bool = False) -> WholeGraphDataPlatform:
     if local:
         return WholeGraphDataPlatform(
-            metagraph=copy.deepcopy(metagraph),
+            metagraph=metagraph,
             raw_fs=LocalBackend('data/canon/raw/'),
             canon_fs=LocalBackend('data/canon/output/'),
             subgraph_fs=LocalBackend('data/subgraph/'),
-            output_fs=LocalBackend('data/graph/')
+            output_fs=LocalBackend('data/graph/'),
+            parquet_options=parquet_options,
+            csr_fs=LocalBackend('data/csr/'),
+            dependency_link=dependency_link,
+            analytics_links=analytics_links,
+            resources=resources,
+            checkpoint=True,
+            resolution=resolution,
+            snapshot_fs=LocalBackend('data/snapshot/')
         )
     else:
         return WholeGraphDataPlatform(
-            metagraph=copy.deepcopy(metagraph),
-            raw_fs=DropboxBackend('/data/canon/raw/'),
-            canon_fs=DropboxBackend('/data/canon/output/'),
-            subgraph_fs=DropboxBackend('/data/subgraph/'),
-            output_fs=DropboxBackend('/data/graph/')
+            metagraph=metagraph,
+            raw_fs=get_dropbox_fs('/data/canon/raw/'),
+            canon_fs=get_dropbox_fs('/data/canon/output/'),
+            subgraph_fs=get_dropbox_fs('/data/subgraph/'),
+            output_fs=get_dropbox_fs('/data/graph/'),
+            parquet_options=parquet_options,
+            csr_fs=get_dropbox_fs('/data/csr/'),
+            dependency_link=dependency_link,
+            analytics_links=analytics_links,
+            resources=resources,
+            checkpoint=True,
+            resolution=resolution,
+            snapshot_fs=get_dropbox_fs('/data/snapshot/')
         )
 
 
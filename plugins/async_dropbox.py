@@ -0,0 +1,172 @@
+"""
+Asyncio transport of Dropbox files
+
+All requests share one aiohttp connection pool, and their concurrency
+is adapted AIMD-style (additive increase / multiplicative decrease):
+the limit grows by one every `limit` successful requests and is cut by
+`decrease` when Dropbox throttles (HTTP 429) or fails. Throttled and failed
+(5xx, connection error) requests are retried with exponential backoff
+and jitter, waiting at least the `Retry-After` of the response.
+
+The event loop runs in a background thread, so that blocking code
+can `submit` transfers and wait for the returned futures.
+"""
+from typing import Callable, Dict, Optional
+from concurrent.futures import Future
+from threading import Thread
+import asyncio
+import json
+import random
+import time
+import aiohttp
+
+__all__ = ['AIMDLimiter', 'AsyncDropboxTransport']
+
+CONTENT_URL = 'https://content.dropboxapi.com'
+
+
+class AIMDLimiter:
+    """
+    Limit of concurrent requests adapted by their outcome
+
+    Args:
+        - initial: starting limit.
+        - minimum / maximum: bounds of the limit.
+        - decrease: factor applied to the limit when throttled or failing.
+    """
+
+    def __init__(self, initial: int = 8, minimum: int = 1,
+                 maximum: int = 64, decrease: float = 0.5):
+        assert 1 <= minimum <= initial <= maximum, 'requires 1 <= minimum <= initial <= maximum'
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self._decrease = decrease
+        self._in_flight = 0
+        self._last_decrease = 0.
+        self._condition = asyncio.Condition()
+
+    async def acquire(self) -> float:
+        """
+        Wait for a free slot.
+
+        Returns:
+            float: start time of the request, to be passed to `release`.
+        """
+        async with self._condition:
+            await self._condition.wait_for(lambda: self._in_flight < int(self.limit))
+            self._in_flight += 1
+        return time.monotonic()
+
+    async def release(self, started: float, congested: bool):
+        async with self._condition:
+            self._in_flight -= 1
+            if congested:
+                # requests started before the last decrease were sent
+                # under the higher limit: count their congestion only once
+                if started >= self._last_decrease:
+                    self.limit = max(self.minimum, self.limit * self._decrease)
+                    self._last_decrease = time.monotonic()
+            else:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self._condition.notify_all()
+
+
+class AsyncDropboxTransport:
+    """
+    Upload and download of Dropbox files through the content API
+
+    Args:
+        - get_token: returns a valid access token (called for every request).
+        - limiter: concurrency limiter (default: `AIMDLimiter()`).
+        - max_retries: retries of a throttled or failed request.
+        - base_delay / max_delay: bounds of the exponential backoff in seconds.
+        - timeout: timeout of a request in seconds.
+        - content_url: url of the content API (e.g., a `MockDropboxServer`).
+    """
+
+    def __init__(self, get_token: Callable[[], str],
+                 limiter: Optional[AIMDLimiter] = None,
+                 max_retries: int = 8, base_delay: float = 0.5,
+                 max_delay: float = 60., timeout: float = 300.,
+                 content_url: str = CONTENT_URL):
+        self._get_token = get_token
+        self._max_retries = max_retries
+        self._base_delay = base_delay
+        self._max_delay = max_delay
+        self._timeout = timeout
+        self._content_url = content_url
+        self._session = None
+        self._loop = asyncio.new_event_loop()
+        self._thread = Thread(target=self._loop.run_forever, daemon=True)
+        self._thread.start()
+        self.limiter = limiter if limiter is not None else AIMDLimiter()
+        self.stats = {'requests': 0, 'throttled': 0, 'retries': 0}
+
+    def submit(self, coro) -> Future:
+        """
+        Schedule a coroutine (e.g., `upload` or `download`) on the event loop
+        """
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    def run(self, coro):
+        """
+        Run a coroutine on the event loop and wait for its result
+        """
+        return self.submit(coro).result()
+
+    def close(self):
+        if self._session is not None:
+            self.run(self._session.close())
+            self._session = None
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+
+    async def upload(self, path: str, data: bytes):
+        await self._request('files/upload', {'path': path, 'mode': 'overwrite', 'mute': True}, data)
+
+    async def download(self, path: str) -> bytes:
+        return await self._request('files/download', {'path': path})
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.limiter.maximum),
+                timeout=aiohttp.ClientTimeout(total=self._timeout))
+        return self._session
+
+    async def _request(self, endpoint: str, arg: Dict, data: bytes = b'') -> bytes:
+        session = await self._get_session()
+        for attempt in range(self._max_retries + 1):
+            started = await self.limiter.acquire()
+            congested = True
+            retry_after = 0.
+            try:
+                self.stats['requests'] += 1
+                async with session.post(
+                    f'{self._content_url}/2/{endpoint}',
+                    headers={
+                        'Authorization': f'Bearer {self._get_token()}',
+                        'Dropbox-API-Arg': json.dumps(arg),
+                        'Content-Type': 'application/octet-stream'
+                    },
+                    data=data
+                ) as response:
+                    if response.status == 429:
+                        self.stats['throttled'] += 1
+                        retry_after = float(response.headers.get('Retry-After', 0))
+                    elif response.status < 500:
+                        congested = False
+                        # other errors (e.g., 409 path not found) are not retried
+                        response.raise_for_status()
+                        return await response.read()
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                print(f'{endpoint} {arg["path"]} failed: {e!r}')
+            finally:
+                await self.limiter.release(started, congested)
+            if attempt == self._max_retries:
+                break
+            self.stats['retries'] += 1
+            backoff = min(self._max_delay, self._base_delay * 2 ** attempt)
+            await asyncio.sleep(max(retry_after, backoff * random.uniform(0.5, 1.)))
+        raise IOError(f'{endpoint} {arg["path"]} failed after {self._max_retries} retries')
@@ -0,0 +1,187 @@
+"""
+GithubActionAdaptor packing tasks into jobs by their measured cost
+
+Costs are read from profiles recorded with `PYPI_GRAPH_PROFILE`
+(see src/graph/profiling.py): wall time and peak memory of every task.
+Tasks at the same level of the DAG are independent; they are bin-packed
+into jobs running them sequentially, such that
+- a job takes no longer than the most expensive task of its level
+    (or `job_overhead_seconds`), so that merging tiny tasks
+    does not lengthen the level, and no longer than `max_job_seconds`.
+- the peak memory of a job is within `max_job_memory_mb`.
+Object vertices are not turned into jobs: a job needs the jobs of
+the tasks it depends on directly.
+"""
+from typing import Any, Dict, List, Set
+import glob
+import inspect
+import json
+import yaml
+from batch_framework.adaptor import GithubActionAdaptor
+from batch_framework.etl import ETLGroup
+from batch_framework.base import ETL
+
+__all__ = ['CostAwareAdaptor', 'load_costs']
+
+
+def load_costs(paths: List[str]) -> Dict[str, Dict[str, float]]:
+    """
+    Load task costs from profiles (JSON lines or Chrome trace files).
+
+    Returns:
+        Dict: task name (repr of the ETL unit) to its `seconds` and `max_rss_mb`,
+            the maximum over all recorded runs.
+    """
+    results = dict()
+    for pattern in paths:
+        for path in glob.glob(pattern):
+            with open(path) as f:
+                if path.endswith('.jsonl'):
+                    events = [json.loads(line) for line in f if line.strip()]
+                else:
+                    events = [{
+                        'cat': e['cat'],
+                        'wall_ms': e['dur'] / 1000,
+                        'max_rss_mb': e['args'].get('max_rss_mb', 0.),
+                        'args': e['args']
+                    } for e in json.load(f)['traceEvents']]
+            for event in events:
+                if event['cat'] != 'etl':
+                    continue
+                cost = results.setdefault(
+                    event['args']['etl'], {'seconds': 0., 'max_rss_mb': 0.})
+                cost['seconds'] = max(cost['seconds'], event['wall_ms'] / 1000)
+                cost['max_rss_mb'] = max(cost['max_rss_mb'], event['max_rss_mb'])
+    return results
+
+
+class CostAwareAdaptor(GithubActionAdaptor):
+    """
+    Args:
+        - etl_group: the ETL to be run by github action.
+        - costs: task costs from `load_costs`. Tasks without costs get their own job.
+        - max_job_seconds: time limit of a job.
+        - max_job_memory_mb: memory limit of a job (runner memory with some headroom).
+        - job_overhead_seconds: startup cost of a job (checkout, installation, ...).
+    """
+
+    def __init__(self, etl_group: ETLGroup,
+                 costs: Dict[str, Dict[str, float]] = dict(),
+                 max_job_seconds: float = 5 * 3600,
+                 max_job_memory_mb: float = 12000,
+                 job_overhead_seconds: float = 60):
+        super().__init__(etl_group)
+        self._costs = costs
+        self._max_job_seconds = max_job_seconds
+        self._max_job_memory_mb = max_job_memory_mb
+        self._job_overhead_seconds = job_overhead_seconds
+
+    def create_yml(self, job_yml_path='./.github/workflows/job.yml',
+                   template_yml_path='./.github/workflow/template.yml', target_yml_path='./.github/workflows/etl.yml'):
+        jobs = self.pack_jobs()
+        for i, job in enumerate(jobs):
+            seconds = sum(self._get_cost(task)['seconds'] for task in job)
+            print(f'job {i}: {len(job)} tasks, {seconds:.0f} seconds')
+        with open(template_yml_path, 'r') as f:
+            result = yaml.safe_load(f)
+        result.update({'jobs': self._get_packed_jobs_config(jobs, job_yml_path)})
+        with open(target_yml_path, 'w') as file:
+            yaml.safe_dump(result, file)
+            print(target_yml_path, 'generated with', len(jobs), 'jobs')
+
+    def is_task(self, vertex: Any) -> bool:
+        if isinstance(vertex, str):
+            return False
+        return not (callable(vertex) and not isinstance(vertex, ETL)
+                    and 'raise NotImplemented' in inspect.getsource(vertex))
+
+    def pack_jobs(self) -> List[List[Any]]:
+        """
+        Returns:
+            List[List]: tasks of every job, in the order of DAG levels.
+        """
+        memo = dict()
+        levels = dict()
+        for vertex in self.vertices:
+            if self.is_task(vertex):
+                levels.setdefault(self._get_level(vertex, memo), []).append(vertex)
+        jobs = []
+        for level in sorted(levels):
+            jobs.extend(self._pack_level(levels[level]))
+        return jobs
+
+    def _pack_level(self, tasks: List[Any]) -> List[List[Any]]:
+        """
+        First-fit decreasing of the tasks of a level.
+        ETL units without costs are put into their own jobs,
+        while start / end hooks of ETL groups are taken as free.
+        """
+        measured = [
+            t for t in tasks if str(t) in self._costs or not isinstance(t, ETL)]
+        results = [[t] for t in tasks if t not in measured]
+        measured = sorted(measured, key=lambda t: -self._get_cost(t)['seconds'])
+        capacity = min(
+            max([self._get_cost(t)['seconds'] for t in measured] + [self._job_overhead_seconds]),
+            self._max_job_seconds)
+        bins = []
+        for task in measured:
+            cost = self._get_cost(task)
+            for job in bins:
+                seconds = sum(self._get_cost(t)['seconds'] for t in job)
+                memory = max(self._get_cost(t)['max_rss_mb'] for t in job)
+                if seconds + cost['seconds'] <= capacity and \
+                        max(memory, cost['max_rss_mb']) <= self._max_job_memory_mb:
+                    job.append(task)
+                    break
+            else:
+                if cost['max_rss_mb'] > self._max_job_memory_mb:
+                    print(f'WARNING: {task} needs {cost["max_rss_mb"]}MB over the job memory limit')
+                bins.append([task])
+        return results + bins
+
+    def _get_cost(self, task: Any) -> Dict[str, float]:
+        return self._costs.get(str(task), {'seconds': 0., 'max_rss_mb': 0.})
+
+    def _get_level(self, vertex: Any, memo: Dict[Any, int]) -> int:
+        """
+        Number of tasks on the longest path ending at the vertex
+        """
+        if vertex not in memo:
+            levels = [self._get_level(p, memo) for p in self._dag.predecessors(vertex)]
+            memo[vertex] = max(levels, default=0) + int(self.is_task(vertex))
+        return memo[vertex]
+
+    def _get_task_predecessors(self, vertex: Any) -> Set[Any]:
+        """
+        Tasks the vertex depends on directly (possibly through objects)
+        """
+        results = set()
+        for p in self._dag.predecessors(vertex):
+            if self.is_task(p):
+                results.add(p)
+            else:
+                results |= self._get_task_predecessors(p)
+        return results
+
+    def _get_packed_jobs_config(self, jobs: List[List[Any]],
+                                job_yml_path: str) -> Dict[str, Any]:
+        job_ids = dict()
+        for job in jobs:
+            for task in job:
+                job_ids[task] = self.obj2id(job[0])
+        results = dict()
+        for job in jobs:
+            needs = set()
+            for task in job:
+                needs |= {job_ids[p] for p in self._get_task_predecessors(task)}
+            results[self.obj2id(job[0])] = {
+                'uses': job_yml_path,
+                'with': {
+                    'task-id': ','.join(self.obj2id(t) for t in job),
+                    'task-name': ' & '.join(str(t) for t in job)[:1000]
+                },
+                'secrets': 'inherit',
+                'name': str(job[0]) if len(job) == 1 else f'{len(job)} tasks: {job[0]}',
+                'needs': sorted(needs)
+            }
+        return results
@@ -0,0 +1,119 @@
+"""
+Local mock of the Dropbox content API for testing transports
+
+Files are kept in memory. Like Dropbox, requests beyond
+`max_concurrency` in flight are throttled with HTTP 429 and a
+`Retry-After` header. Every request takes `latency` seconds and
+all transfers share `bandwidth` bytes per second.
+
+Usage:
+    python -m plugins.mock_dropbox_server --port 8765 --max-concurrency 16
+"""
+from typing import Dict, Optional
+import argparse
+import asyncio
+import json
+import time
+from aiohttp import web
+
+__all__ = ['MockDropboxServer']
+
+
+class MockDropboxServer:
+    def __init__(self, max_concurrency: int = 16, latency: float = 0.05,
+                 bandwidth: Optional[float] = None, retry_after: float = 1.):
+        self.files: Dict[str, bytes] = dict()
+        self.stats = {'requests': 0, 'throttled': 0, 'max_in_flight': 0}
+        self._max_concurrency = max_concurrency
+        self._latency = latency
+        self._bandwidth = bandwidth
+        self._retry_after = retry_after
+        self._in_flight = 0
+        self._busy_until = 0.
+        self._runner = None
+
+    def app(self) -> web.Application:
+        app = web.Application(client_max_size=1024 ** 3)
+        app.router.add_post('/2/files/upload', self._handle_upload)
+        app.router.add_post('/2/files/download', self._handle_download)
+        return app
+
+    async def start(self, host: str = '127.0.0.1', port: int = 0) -> str:
+        """
+        Returns:
+            str: url of the server, to be used as `content_url`.
+        """
+        self._runner = web.AppRunner(self.app())
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = self._runner.addresses[0][1]
+        return f'http://{host}:{port}'
+
+    async def stop(self):
+        await self._runner.cleanup()
+
+    async def _handle_upload(self, request: web.Request) -> web.Response:
+        async def upload(path: str) -> web.Response:
+            data = await request.read()
+            await self._transfer(len(data))
+            self.files[path] = data
+            return web.json_response({'path_display': path, 'size': len(data)})
+        return await self._handle(request, upload)
+
+    async def _handle_download(self, request: web.Request) -> web.Response:
+        async def download(path: str) -> web.Response:
+            if path not in self.files:
+                return web.json_response(
+                    {'error_summary': 'path/not_found/'}, status=409)
+            data = self.files[path]
+            await self._transfer(len(data))
+            return web.Response(
+                body=data,
+                headers={'Dropbox-API-Result': json.dumps({'path_display': path, 'size': len(data)})})
+        return await self._handle(request, download)
+
+    async def _handle(self, request: web.Request, handler) -> web.Response:
+        self.stats['requests'] += 1
+        if self._in_flight >= self._max_concurrency:
+            self.stats['throttled'] += 1
+            await request.read()
+            return web.json_response(
+                {'error_summary': 'too_many_requests/'}, status=429,
+                headers={'Retry-After': str(self._retry_after)})
+        self._in_flight += 1
+        self.stats['max_in_flight'] = max(self.stats['max_in_flight'], self._in_flight)
+        try:
+            path = json.loads(request.headers['Dropbox-API-Arg'])['path']
+            return await handler(path)
+        finally:
+            self._in_flight -= 1
+
+    async def _transfer(self, size: int):
+        """
+        Wait for the latency and for the transfer of `size` bytes
+        over the bandwidth shared by all requests
+        """
+        now = time.monotonic()
+        if self._bandwidth is not None:
+            self._busy_until = max(now, self._busy_until) + size / self._bandwidth
+            done = max(self._busy_until, now + self._latency)
+        else:
+            done = now + self._latency
+        await asyncio.sleep(done - now)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--max-concurrency', type=int, default=16)
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--bandwidth', type=float, default=None,
+                        help='bytes per second shared by all transfers')
+    parser.add_argument('--retry-after', type=float, default=1.)
+    args = parser.parse_args()
+    server = MockDropboxServer(
+        max_concurrency=args.max_concurrency, latency=args.latency,
+        bandwidth=args.bandwidth, retry_after=args.retry_after)
+    web.run_app(server.app(), host=args.host, port=args.port)
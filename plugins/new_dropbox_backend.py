@@ -1,88 +1,203 @@
 import io
+import atexit
+import posixpath
 from fsspec.implementations.dirfs import DirFileSystem
 import tqdm
 import base64
-import time
-from typing import Iterator
-from threading import Thread
-from split_file_reader.split_file_writer import SplitFileWriter
-from split_file_reader import SplitFileReader
-from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import json
+from typing import Deque, Dict, Iterator, List, Optional, Set, Tuple
+from collections import deque
+from threading import Lock
+from concurrent.futures import Future, ThreadPoolExecutor
+import dropbox
+import requests
 from batch_framework.filesystem import DropboxBackend
+from .async_dropbox import AIMDLimiter, AsyncDropboxTransport
 
-__all__ = ['NewDropboxBackend']
+__all__ = ['NewDropboxBackend', 'ChunkedUploadWriter']
 
 
-class Pipe:
+class ChunkedUploadWriter:
     """
-    FIFO pipe for connecting a writing thread with
-    a reading thread
+    Writable file object uploading its content as the chunks of
+    `NewDropboxBackend._upload_core` while it is being written.
+    At most `max_pending` full chunks are held in memory waiting for their upload.
+
+    `manifest.json` and `total.txt` are written by `close` after all the
+    chunks, so that a failed write never looks like a complete upload.
     """
 
-    def __init__(self, max_size=8, wait_duration=0.01):
-        self._max_size = max_size
-        self._current_size = 0
-        self._array = []
-        self._index = -1
-        self._on = True
-        self._wait_duration = wait_duration
-        self._total_size = None
-
-    def send_input(self, input_element):
-        assert self._on, 'pipe already closed'
-        while self._current_size >= self._max_size:
-            time.sleep(self._wait_duration)
-        self._array.append(input_element)
-        self._current_size += 1
-
-    def generate_output(self) -> Iterator:
-        while self._current_size == 0:
-            time.sleep(self._wait_duration)
-        while self._on or self._index < len(self._array) - 1:
-            self._index += 1
-            yield self._array[self._index]
-            self._current_size -= 1
-            while self._on and self._current_size == 0:
-                time.sleep(self._wait_duration)
-
-    def load_input(self, input_pipe: Iterator):
-        assert self._total_size is not None
-        for element in input_pipe:
-            self.send_input(element)
-
-    def __getitem__(self, idx: int):
-        if idx >= self._total_size:
-            raise IndexError
-        self._index += 1
-        assert idx == self._index
-        while idx >= len(self._array):
-            time.sleep(self._wait_duration)
-        result = self._array[idx]
-        self._current_size -= 1
-        return result
-
-    def set_total_size(self, count: int):
-        self._total_size = count
-
-    def __len__(self):
-        while self._total_size is None:
-            time.sleep(self._wait_duration)
-        return self._total_size
+    def __init__(self, backend: 'NewDropboxBackend', remote_path: str,
+                 chunk_size: int = 1000000, max_pending: int = 8):
+        assert '.' in remote_path, f'requires file ext .xxx provided in `remote_path` but it is {remote_path}'
+        self._backend = backend
+        self._remote_path = remote_path
+        self._file_name = remote_path.split('.')[0]
+        self._ext = remote_path.split('.')[1]
+        self._chunk_size = chunk_size
+        self._max_pending = max_pending
+        self._buffer = bytearray()
+        self._sha256 = hashlib.sha256()
+        self._size = 0
+        self._chunk_cnt = 0
+        self._pending: Deque[Future] = deque()
+        self._closed = False
+        fs = backend._fs
+        if fs.exists(self._file_name):
+            fs.rm(self._file_name)
+        fs.mkdir(self._file_name)
+        assert fs.exists(self._file_name), f'{self._file_name} folder make failed'
+        self._dfs = DirFileSystem(f'/{self._file_name}', fs)
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    @property
+    def sha256(self) -> str:
+        return self._sha256.hexdigest()
+
+    def writable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return False
+
+    def tell(self) -> int:
+        return self._size
+
+    def flush(self):
+        pass
+
+    def write(self, data) -> int:
+        data = memoryview(data).cast('B')
+        self._sha256.update(data)
+        self._buffer += data
+        self._size += data.nbytes
+        while len(self._buffer) >= self._chunk_size:
+            self._submit(bytes(self._buffer[:self._chunk_size]))
+            del self._buffer[:self._chunk_size]
+        return data.nbytes
+
+    def _submit(self, chunk: bytes):
+        while len(self._pending) >= self._max_pending:
+            self._pending.popleft().result()
+        self._pending.append(self._backend._submit_upload_chunk(
+            self._dfs, self._file_name, self._ext, self._chunk_cnt, chunk))
+        self._chunk_cnt += 1
 
     def close(self):
-        self._on = False
+        if self._closed:
+            return
+        self._closed = True
+        if self._buffer or self._chunk_cnt == 0:
+            self._submit(bytes(self._buffer))
+            self._buffer = bytearray()
+        while self._pending:
+            self._pending.popleft().result()
+        manifest = {
+            'sha256': self.sha256,
+            'size': self._size,
+            'chunk_size': self._chunk_size,
+            'chunk_cnt': self._chunk_cnt
+        }
+        with self._dfs.open('manifest.json', 'w') as f:
+            f.write(json.dumps(manifest))
+        uploaded = self._backend._get_uploaded_chunks(self._file_name, self._dfs, manifest)
+        assert uploaded is not None and len(uploaded) == self._chunk_cnt, \
+            f'{self._remote_path}: {self._chunk_cnt - len(uploaded or [])} chunks missing after upload'
+        with self._dfs.open('total.txt', 'w') as f:
+            f.write(str(self._chunk_cnt))
+        print(f'Done upload {self._remote_path} as {self._chunk_cnt} files')
+
+    def abort(self):
+        """
+        Stop writing without completing the upload
+        """
+        self._closed = True
+        for future in self._pending:
+            future.cancel()
+        self._pending.clear()
+
+    def __enter__(self) -> 'ChunkedUploadWriter':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
 
 
 class NewDropboxBackend(DropboxBackend):
-    def upload_core(self, file_obj: io.BytesIO, remote_path: str):
+    """
+    Args:
+        - directory: root folder on Dropbox.
+        - max_workers: number of download workers (and pooled connections)
+            shared by all downloads of the backend.
+        - async_transport: transfer chunks with `AsyncDropboxTransport`,
+            adapting the concurrency (up to `max_workers`) to throttling.
+    """
+
+    def __init__(self, directory='/', max_workers: int = 32,
+                 async_transport: bool = False):
+        super().__init__(directory)
+        self._max_workers = max_workers
+        self._executor = None
+        self._executor_lock = Lock()
+        root_fs = self._fs.fs
+        root_fs.dbx = dropbox.Dropbox(
+            app_key=root_fs.app_key,
+            app_secret=root_fs.app_secret,
+            oauth2_refresh_token=root_fs.refresh_token,
+            session=dropbox.create_session(max_connections=max_workers)
+        )
+        root_fs.session.mount(
+            'https://', requests.adapters.HTTPAdapter(pool_maxsize=max_workers))
+        if async_transport:
+            self._transport = AsyncDropboxTransport(
+                self._get_access_token,
+                AIMDLimiter(initial=min(8, max_workers), maximum=max_workers))
+            atexit.register(self._transport.close)
+        else:
+            self._transport = None
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self._max_workers)
+        return self._executor
+
+    def _get_access_token(self) -> str:
+        dbx = self._fs.fs.dbx
+        dbx.check_and_refresh_access_token()
+        return dbx._oauth2_access_token
+
+    def _get_chunk_path(self, file_name: str, index: int, ext: str) -> str:
+        return posixpath.join(self._fs.path, file_name, f'{index}.{ext}')
+
+    def open_upload(self, remote_path: str, chunk_size=1000000) -> ChunkedUploadWriter:
+        """Open a writable file object uploading to `remote_path` while being written
+
+        Args:
+            remote_path (str): remote file path
+        """
+        return ChunkedUploadWriter(
+            self, remote_path, chunk_size=chunk_size, max_pending=self._max_workers)
+
+    def upload_core(self, file_obj: io.BytesIO, remote_path: str, check: bool = False):
         """Upload file object
 
         Args:
             file_obj (io.BytesIO): file to be upload
             remote_path (str): remote file path
+            check (bool): download the uploaded file and compare it with `file_obj`
         """
         self._upload_core(file_obj, remote_path)
-        self._check_upload_success(file_obj, remote_path)
+        if check:
+            self._check_upload_success(file_obj, remote_path)
         file_obj.flush()
         file_obj.close()
 
@@ -96,7 +211,11 @@ class NewDropboxBackend(DropboxBackend):
 
     def _upload_core(self, file_obj: io.BytesIO,
                      remote_path: str, max_workers=8, chunk_size=1000000):
-        """Upload file object to local storage
+        """Upload file object as base64 encoded chunks
+
+        A `manifest.json` describing the content and its chunking is written
+        before the chunks, and `total.txt` after all of them. If an upload of
+        the same content was interrupted, only the missing chunks are uploaded.
 
         Args:
             file_obj (io.BytesIO): file to be upload
@@ -105,44 +224,79 @@ class NewDropboxBackend(DropboxBackend):
         assert '.' in remote_path, f'requires file ext .xxx provided in `remote_path` but it is {remote_path}'
         file_name = remote_path.split('.')[0]
         ext = remote_path.split('.')[1]
-        if self._fs.exists(file_name):
-            self._fs.rm(file_name)
-        self._fs.mkdir(file_name)
         file_obj.seek(0)
-        chunk_cnt = file_obj.getbuffer().nbytes // chunk_size + 1
-        assert self._fs.exists(file_name), f'{file_name} folder make failed'
-        dfs = DirFileSystem(f'/{file_name}', self._fs)
-        pipe = Pipe(max_workers)
-        thread = Thread(target=self._upload_all,
-                        args=(dfs, ext, pipe, max_workers, chunk_cnt, remote_path))
-        thread.start()
-
-        def gen(pipe):
-            while True:
-                buff = io.BytesIO()
-                pipe.send_input(buff)
-                yield buff
-        with SplitFileWriter(gen(pipe), chunk_size) as sfw:
-            sfw.write(file_obj.getbuffer())
-        pipe.close()
-        thread.join()
-
-    def _upload_all(self, dfs, ext, pipe, max_workers, chunk_cnt, remote_path):
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            input_pipe = enumerate(pipe.generate_output())
-            output_pipe = executor.map(
-                lambda x: self._upload_chunk(dfs, ext, x[0], x[1]),
-                input_pipe)
-            output = list(
-                tqdm.tqdm(
-                    output_pipe,
-                    total=chunk_cnt,
-                    desc=f'Upload {remote_path}'))
-        total_size = len(output)
-        print('number of chunks:', total_size)
+        with file_obj.getbuffer() as data:
+            chunk_cnt = max(1, -(-data.nbytes // chunk_size))
+            manifest = {
+                'sha256': hashlib.sha256(data).hexdigest(),
+                'size': data.nbytes,
+                'chunk_size': chunk_size,
+                'chunk_cnt': chunk_cnt
+            }
+            dfs = DirFileSystem(f'/{file_name}', self._fs)
+            uploaded = self._get_uploaded_chunks(file_name, dfs, manifest)
+            if uploaded is None:
+                if self._fs.exists(file_name):
+                    self._fs.rm(file_name)
+                self._fs.mkdir(file_name)
+                assert self._fs.exists(file_name), f'{file_name} folder make failed'
+                with dfs.open('manifest.json', 'w') as f:
+                    f.write(json.dumps(manifest))
+                uploaded = set()
+            elif len(uploaded) == chunk_cnt and dfs.exists('total.txt'):
+                print(f'Skip upload {remote_path}: already uploaded')
+                return
+            else:
+                print(f'Resume upload {remote_path}: {len(uploaded)}/{chunk_cnt} chunks uploaded')
+            indices = [i for i in range(chunk_cnt) if i not in uploaded]
+            if self._transport is not None:
+                futures = [
+                    self._transport.submit(self._upload_chunk_async(
+                        file_name, ext, i, data[i * chunk_size:(i + 1) * chunk_size]))
+                    for i in indices]
+                for future in tqdm.tqdm(futures, desc=f'Upload {remote_path}'):
+                    future.result()
+            else:
+                with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                    output_pipe = executor.map(
+                        lambda i: self._upload_chunk(
+                            dfs, ext, i, io.BytesIO(data[i * chunk_size:(i + 1) * chunk_size])),
+                        indices)
+                    list(
+                        tqdm.tqdm(
+                            output_pipe,
+                            total=len(indices),
+                            desc=f'Upload {remote_path}'))
+        print('number of chunks:', chunk_cnt)
         with dfs.open('total.txt', 'w') as f:
-            f.write(str(total_size))
-        print(f'Done upload {total_size} files')
+            f.write(str(chunk_cnt))
+        print(f'Done upload {chunk_cnt} files')
+
+    def _get_uploaded_chunks(self, file_name: str, dfs: DirFileSystem,
+                             manifest: Dict) -> Optional[Set[int]]:
+        """
+        Indices of the chunks already uploaded for the content of `manifest`.
+        Return None if there is no upload of the same content to resume.
+        """
+        if not self._fs.exists(file_name) or not dfs.exists('manifest.json'):
+            return None
+        try:
+            with dfs.open('manifest.json', 'r') as f:
+                if json.loads(f.read()) != manifest:
+                    return None
+        except ValueError:
+            return None
+        results = set()
+        for info in dfs.ls('', detail=True):
+            index = info['name'].split('/')[-1].split('.')[0]
+            if index.isdigit() and int(index) < manifest['chunk_cnt']:
+                size = min(
+                    manifest['chunk_size'],
+                    manifest['size'] - int(index) * manifest['chunk_size'])
+                # chunk files are committed whole, so a complete chunk has its full base64 size
+                if info['size'] == 4 * -(-size // 3):
+                    results.add(int(index))
+        return results
 
     def _upload_chunk(self, dfs, ext, index, chunk):
         chunk.seek(0)
@@ -152,6 +306,16 @@ class NewDropboxBackend(DropboxBackend):
         chunk.flush()
         chunk.close()
 
+    def _submit_upload_chunk(self, dfs: DirFileSystem, file_name: str, ext: str,
+                             index: int, chunk: bytes) -> Future:
+        if self._transport is not None:
+            return self._transport.submit(self._upload_chunk_async(file_name, ext, index, chunk))
+        return self.executor.submit(self._upload_chunk, dfs, ext, index, io.BytesIO(chunk))
+
+    async def _upload_chunk_async(self, file_name, ext, index, chunk):
+        await self._transport.upload(
+            self._get_chunk_path(file_name, index, ext), base64.b64encode(chunk))
+
     def download_core(self, remote_path: str) -> io.BytesIO:
         """Download file from remote storage
 
@@ -161,42 +325,62 @@ class NewDropboxBackend(DropboxBackend):
         Returns:
             io.BytesIO: downloaded file
         """
-        assert '.' in remote_path, f'requires file ext .xxx provided in `remote_path` but it is {remote_path}'
-        file_name = remote_path.split('.')[0]
-        ext = remote_path.split('.')[1]
-        assert self._fs.exists(
-            f'{file_name}'), f'{file_name} folder does not exists for FileSystem: {self._fs}'
-        dfs = DirFileSystem(file_name, self._fs)
+        return next(self.download_many([remote_path]))[1]
+
+    def download_many(self, remote_paths: List[str]) -> Iterator[Tuple[str, io.BytesIO]]:
+        """Download files through the shared workers
+
+        The chunks of all files are queued at once in the order of
+        `remote_paths`, so the first files complete first and can be
+        consumed while the following ones are still downloading.
+
+        Args:
+            remote_paths (List[str]): remote file paths
+
+        Returns:
+            Iterator[Tuple[str, io.BytesIO]]: remote path and downloaded file,
+                in the order of `remote_paths`
+        """
+        locations = []
+        for remote_path in remote_paths:
+            assert '.' in remote_path, f'requires file ext .xxx provided in `remote_path` but it is {remote_path}'
+            file_name = remote_path.split('.')[0]
+            ext = remote_path.split('.')[1]
+            assert self._fs.exists(
+                f'{file_name}'), f'{file_name} folder does not exists for FileSystem: {self._fs}'
+            locations.append((file_name, ext))
+        totals = list(self.executor.map(
+            self._read_total, [DirFileSystem(file_name, self._fs) for file_name, _ in locations]))
+        print(f'Start download {sum(totals)} files of {len(remote_paths)} objects')
+        futures = [
+            [self._submit_download_chunk(file_name, index, ext) for index in range(total)]
+            for (file_name, ext), total in zip(locations, totals)]
+        try:
+            for remote_path, chunk_futures in zip(remote_paths, futures):
+                result = io.BytesIO()
+                for future in tqdm.tqdm(chunk_futures, desc=f'Download {remote_path}'):
+                    result.write(future.result().getbuffer())
+                result.seek(0)
+                print(f'Done download {len(chunk_futures)} files')
+                yield remote_path, result
+        finally:
+            for chunk_futures in futures:
+                for future in chunk_futures:
+                    future.cancel()
+
+    def _read_total(self, dfs: DirFileSystem) -> int:
         with dfs.open('total.txt', 'r') as f:
-            total_size = int(f.read())
-        max_workers = 32
-        pipe = Pipe(max_workers)
-        pipe.set_total_size(total_size)
-        print(f'Start download {total_size} files')
-        thread = Thread(
-            target=self._download_all,
-            args=(dfs, ext, pipe, max_workers, total_size, remote_path)
-        )
-        thread.start()
-        with SplitFileReader(pipe) as sfw:
-            result = io.BytesIO(sfw.read())
-        thread.join()
-        print(f'Done download {total_size} files')
-        result.seek(0)
-        return result
-
-    def _download_all(self, dfs, ext, pipe, max_workers,
-                      chunk_cnt, remote_path):
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            input_pipe = range(chunk_cnt)
-            input_pipe = map(lambda index: (dfs, index, ext), input_pipe)
-            chunks = executor.map(self._download_chunk, input_pipe)
-            chunks = tqdm.tqdm(
-                chunks,
-                desc=f'Download {remote_path}',
-                total=chunk_cnt
-            )
-            pipe.load_input(chunks)
+            return int(f.read())
+
+    def _submit_download_chunk(self, file_name: str, index: int, ext: str) -> Future:
+        if self._transport is not None:
+            return self._transport.submit(self._download_chunk_async(file_name, index, ext))
+        return self.executor.submit(
+            self._download_chunk, (DirFileSystem(file_name, self._fs), index, ext))
+
+    async def _download_chunk_async(self, file_name, index, ext):
+        data = await self._transport.download(self._get_chunk_path(file_name, index, ext))
+        return io.BytesIO(base64.b64decode(data))
 
     def _download_chunk(self, x):
         dfs, index, ext = x
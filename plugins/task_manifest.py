@@ -0,0 +1,75 @@
+"""
+Manifest locating the tasks of a workflow in the ETL tree
+
+GithubActionAdaptor resolves a task id (`id_N`) by building the DAG of
+the whole ETL and sorting all its vertices. `build_yml.py` saves, for
+every task id, the indices of `etl_units` leading from the root ETL to
+the task and the method to run, so that `run_task.py` can pick its task
+out of the ETL objects directly.
+"""
+from typing import Any, Callable, Dict, Optional, Tuple
+import json
+from batch_framework.adaptor import GithubActionAdaptor
+from batch_framework.etl import ETLGroup
+from batch_framework.base import ETL
+
+__all__ = ['save_manifest', 'load_task']
+
+MANIFEST_PATH = 'tasks.json'
+
+
+def locate_tasks(etl: ETL, path: Tuple[int, ...] = ()) -> Dict[Any, Tuple[Tuple[int, ...], str]]:
+    """
+    Returns:
+        Dict: task (ETL unit or start / end method of ETL group)
+            to its path of `etl_units` indices and method name.
+    """
+    if isinstance(etl, ETLGroup):
+        results = {etl.start: (path, 'start'), etl.end: (path, 'end')}
+        for i, etl_unit in enumerate(etl.etl_units):
+            results.update(locate_tasks(etl_unit, path + (i,)))
+        return results
+    return {etl: (path, 'execute')}
+
+
+def save_manifest(adaptor: GithubActionAdaptor, etl: ETL, manifest_path: str = MANIFEST_PATH):
+    locations = locate_tasks(etl)
+    results = dict()
+    for vertex in adaptor.vertices:
+        if isinstance(vertex, str):
+            continue
+        assert vertex in locations, f'{vertex} is not found in the ETL tree'
+        path, method = locations[vertex]
+        results[adaptor.obj2id(vertex)] = {
+            'name': str(vertex),
+            'path': list(path),
+            'method': method
+        }
+    with open(manifest_path, 'w') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+    print(manifest_path, 'generated with', len(results), 'tasks')
+
+
+def load_task(etl: ETL, task_id: str, manifest_path: str = MANIFEST_PATH) -> Optional[Callable]:
+    """
+    Returns:
+        the task of `task_id`, or None if the manifest does not
+        have it or is out of date with `etl`.
+    """
+    try:
+        with open(manifest_path) as f:
+            task = json.load(f).get(task_id)
+    except FileNotFoundError:
+        return None
+    if task is None:
+        return None
+    vertex = etl
+    for i in task['path']:
+        if not isinstance(vertex, ETLGroup) or i >= len(vertex.etl_units):
+            return None
+        vertex = vertex.etl_units[i]
+    if task['method'] != 'execute':
+        vertex = getattr(vertex, task['method'])
+    if str(vertex) != task['name']:
+        return None
+    return vertex
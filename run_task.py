@@ -1,9 +1,20 @@
 import sys
 from etl import get_transformer
 from batch_framework.adaptor import GithubActionAdaptor
+from batch_framework.executor import DagExecutor
+from plugins.task_manifest import load_task
 
 if __name__ == '__main__':
     etl_obj = get_transformer(local=False)
-    adaptor = GithubActionAdaptor(etl_group=etl_obj)
-    task_id = sys.argv[1]
-    adaptor.run_by_id(task_id)
+    adaptor = None
+    # a job may run several tasks packed together: `id_1,id_5,...`
+    for task_id in sys.argv[1].split(','):
+        # tasks.json (written by build_yml.py) locates the task without building the DAG
+        task = load_task(etl_obj, task_id)
+        if task is not None:
+            DagExecutor.execute_vertex(task)
+        else:
+            print(f'{task_id} not found in the task manifest: resolving it by the DAG')
+            if adaptor is None:
+                adaptor = GithubActionAdaptor(etl_group=etl_obj)
+            adaptor.run_by_id(task_id)
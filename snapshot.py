@@ -0,0 +1,45 @@
+"""
+Compact and read the graph snapshots recorded by etl.py
+
+Usage:
+    python snapshot.py list
+    python snapshot.py compact                       # base of the latest snapshot
+    python snapshot.py expire --as-of 2024-01-01     # drop the history before it
+    python snapshot.py materialize --as-of 2024-01-01 --tables link_has_requirement \\
+        --output data/snapshot_2024-01-01/
+
+`--local` uses the local snapshots (data/snapshot/) instead of Dropbox.
+"""
+import argparse
+from batch_framework.filesystem import LocalBackend
+from batch_framework.storage import PandasStorage
+from src.graph.snapshot import SnapshotStore
+from etl import get_dropbox_fs
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('command', choices=['list', 'compact', 'expire', 'materialize'])
+    parser.add_argument('--as-of', default=None,
+                        help='label (date) of the snapshot; latest if omitted')
+    parser.add_argument('--tables', nargs='*', default=None,
+                        help='tables to materialize; all if omitted')
+    parser.add_argument('--output', default='data/snapshot_output/')
+    parser.add_argument('--local', action='store_true')
+    args = parser.parse_args()
+    if args.local:
+        store = SnapshotStore(LocalBackend('data/snapshot/'))
+    else:
+        store = SnapshotStore(get_dropbox_fs('/data/snapshot/'))
+    snapshot = store.latest if args.as_of is None else store.as_of(args.as_of)
+    if args.command == 'list':
+        for s in store.snapshots:
+            print(s['id'], s['label'], s['changes'])
+    elif args.command == 'compact':
+        store.compact(snapshot)
+    elif args.command == 'expire':
+        store.expire(snapshot)
+    else:
+        output_storage = PandasStorage(LocalBackend(args.output))
+        for table in args.tables or store.tables:
+            output_storage.upload(store.materialize(table, snapshot), f'{table}_final')
+            print('materialized', table, 'of snapshot', snapshot)
@@ -1,4 +1,8 @@
 from .main import GraphDataPlatform
 from .metagraph import MetaGraph
+from .encoding import ParquetOptions
+from .analytics import GraphAnalytics
+from .resources import ResourceConfig
+from .snapshot import SnapshotStore
 
-__all__ = ['GraphDataPlatform', 'MetaGraph']
+__all__ = ['GraphDataPlatform', 'MetaGraph', 'ParquetOptions', 'GraphAnalytics', 'ResourceConfig', 'SnapshotStore']
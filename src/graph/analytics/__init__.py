@@ -0,0 +1,3 @@
+from .main import GraphAnalytics
+
+__all__ = ['GraphAnalytics']
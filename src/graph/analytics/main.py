@@ -0,0 +1,83 @@
+from typing import Dict, List, Tuple
+from batch_framework.etl import ETLGroup
+from batch_framework.storage import PandasStorage
+from batch_framework.filesystem import FileSystem
+from .processors import NodeDegree, DegreeDistribution, NodeRank
+
+
+class GraphAnalytics(ETLGroup):
+    """
+    Compute graph metrics of the final graph as node attribute tables:
+        - node_{node}_degree: in/out degree of every node on each link type
+        - degree_distribution_{link}_final: node count by degree of each link type
+        - node_{node}_rank: weakly connected component and PageRank
+            over the union graph of `rank_links`
+    """
+
+    def __init__(self, triplets: Dict[str, Tuple[str, str]],
+                 rank_links: List[str],
+                 input_fs: FileSystem, output_fs: FileSystem):
+        input_storage = PandasStorage(input_fs)
+        output_storage = PandasStorage(output_fs)
+        args = []
+        for node in GraphAnalytics.get_nodes(triplets):
+            args.append(NodeDegree(
+                node, triplets, input_storage, output_storage))
+        for link in triplets:
+            args.append(DegreeDistribution(
+                link, input_storage, output_storage))
+        if rank_links:
+            args.append(NodeRank(
+                rank_links, triplets, input_storage, output_storage))
+        self._inputs = []
+        self._outputs = []
+        for etl_unit in args:
+            for id in etl_unit.input_ids:
+                if id not in self._inputs:
+                    self._inputs.append(id)
+            self._outputs.extend(etl_unit.output_ids)
+        super().__init__(*args)
+
+    @staticmethod
+    def get_nodes(triplets: Dict[str, Tuple[str, str]]) -> List[str]:
+        results = []
+        for src_node, dest_node in triplets.values():
+            for node in [src_node, dest_node]:
+                if node not in results:
+                    results.append(node)
+        return results
+
+    @staticmethod
+    def get_node_attributes(triplets: Dict[str, Tuple[str, str]],
+                            rank_links: List[str]) -> Dict[str, List[str]]:
+        """
+        Node attribute tables produced for each node
+        """
+        results = dict()
+        for node in GraphAnalytics.get_nodes(triplets):
+            results[node] = [f'node_{node}_degree']
+        for link in rank_links:
+            for node in triplets[link]:
+                if f'node_{node}_rank' not in results[node]:
+                    results[node].append(f'node_{node}_rank')
+        return results
+
+    @staticmethod
+    def get_summary_tables(triplets: Dict[str, Tuple[str, str]]) -> List[str]:
+        """
+        Tables produced for the whole graph rather than for its nodes
+        (collected from `{table}_final`)
+        """
+        return [f'degree_distribution_{link}' for link in triplets]
+
+    @property
+    def input_ids(self):
+        return self._inputs
+
+    @property
+    def external_input_ids(self) -> List[str]:
+        return self.input_ids
+
+    @property
+    def output_ids(self):
+        return self._outputs
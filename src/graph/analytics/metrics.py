@@ -0,0 +1,65 @@
+"""
+Vectorized graph metrics over integer-indexed edges
+"""
+from typing import Tuple
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import connected_components
+
+__all__ = ['degree_distribution', 'weakly_connected_components', 'pagerank']
+
+
+def degree_distribution(degrees: np.ndarray) -> pd.DataFrame:
+    """
+    Returns:
+        pd.DataFrame: `degree` and `num_nodes` having the degree.
+    """
+    counts = np.bincount(degrees)
+    degree = np.flatnonzero(counts)
+    return pd.DataFrame({
+        'degree': degree.astype(np.int64),
+        'num_nodes': counts[degree].astype(np.int64)
+    })
+
+
+def weakly_connected_components(
+        src: np.ndarray, dst: np.ndarray, n: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: component label of every node and
+            the size of the component of every node.
+    """
+    graph = csr_matrix(
+        (np.ones(len(src), dtype=bool), (src, dst)), shape=(n, n))
+    _, labels = connected_components(graph, directed=True, connection='weak')
+    sizes = np.bincount(labels)
+    return labels, sizes[labels]
+
+
+def pagerank(src: np.ndarray, dst: np.ndarray, n: int,
+             damping: float = 0.85, tol: float = 1e-9,
+             max_iter: int = 100) -> np.ndarray:
+    """
+    PageRank by power iteration on a sparse transition matrix.
+    Rank of dangling nodes (without out links) is spread uniformly.
+    """
+    if n == 0:
+        return np.zeros(0)
+    pairs = np.unique(src.astype(np.int64) * n + dst)
+    src, dst = pairs // n, pairs % n
+    out_degree = np.bincount(src, minlength=n).astype(np.float64)
+    weights = 1.0 / out_degree[src]
+    # transition[j, i]: probability of walking from i to j
+    transition = csr_matrix((weights, (dst, src)), shape=(n, n))
+    dangling = out_degree == 0
+    rank = np.full(n, 1.0 / n)
+    for i in range(max_iter):
+        new_rank = damping * (transition @ rank)
+        new_rank += (damping * rank[dangling].sum() + 1.0 - damping) / n
+        err = np.abs(new_rank - rank).sum()
+        rank = new_rank
+        if err < n * tol:
+            break
+    print('pagerank - #Iterations:', i + 1, 'error:', err)
+    return rank
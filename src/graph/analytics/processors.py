@@ -0,0 +1,165 @@
+from typing import Dict, List, Tuple
+import numpy as np
+import pandas as pd
+from batch_framework.etl import ObjProcessor
+from batch_framework.storage import PandasStorage
+from ..csr.builder import build_node_index, lookup_positions
+from .metrics import degree_distribution, weakly_connected_components, pagerank
+from ..profiling import ProfiledObjProcessor
+
+__all__ = ['NodeDegree', 'DegreeDistribution', 'NodeRank']
+
+
+class NodeDegree(ProfiledObjProcessor, ObjProcessor):
+    """
+    Count out degree (as source) and in degree (as target)
+    of the nodes of a node type on every link type.
+    """
+
+    def __init__(self, node: str, triplets: Dict[str, Tuple[str, str]],
+                 input_storage: PandasStorage, output_storage: PandasStorage):
+        self._node = node
+        self._columns = []
+        self._links = []
+        for link, (src_node, dest_node) in triplets.items():
+            if src_node == node:
+                self._columns.append((link, 'from_id', f'{link}_out_degree'))
+            if dest_node == node:
+                self._columns.append((link, 'to_id', f'{link}_in_degree'))
+            if node in (src_node, dest_node):
+                self._links.append(link)
+        super().__init__(input_storage, output_storage)
+
+    @property
+    def input_ids(self):
+        return [f'node_{self._node}_final'] + [
+            f'link_{link}_final' for link in self._links]
+
+    @property
+    def input_columns(self) -> Dict[str, List[str]]:
+        results = {f'node_{self._node}_final': ['node_id']}
+        for link, id_column, _ in self._columns:
+            results.setdefault(f'link_{link}_final', []).append(id_column)
+        return results
+
+    @property
+    def output_ids(self):
+        return [f'node_{self._node}_degree']
+
+    def transform(self, inputs: List[pd.DataFrame]) -> List[pd.DataFrame]:
+        index = build_node_index(inputs[0].node_id)
+        link_dfs = dict(zip(self._links, inputs[1:]))
+        result = pd.DataFrame({'node_id': index.astype(str)})
+        for link, id_column, column in self._columns:
+            positions = lookup_positions(index, link_dfs[link][id_column])
+            result[column] = np.bincount(
+                positions, minlength=len(index)).astype(np.int32)
+        return [result]
+
+
+class DegreeDistribution(ProfiledObjProcessor, ObjProcessor):
+    """
+    Count nodes by their out degree and in degree on a link type.
+    Nodes without any link are not counted.
+    """
+
+    def __init__(self, link: str, input_storage: PandasStorage,
+                 output_storage: PandasStorage):
+        self._link = link
+        super().__init__(input_storage, output_storage)
+
+    @property
+    def input_ids(self):
+        return [f'link_{self._link}_final']
+
+    @property
+    def input_columns(self) -> Dict[str, List[str]]:
+        return {f'link_{self._link}_final': ['from_id', 'to_id']}
+
+    @property
+    def output_ids(self):
+        return [f'degree_distribution_{self._link}_final']
+
+    def transform(self, inputs: List[pd.DataFrame]) -> List[pd.DataFrame]:
+        link_df = inputs[0]
+        out_df = degree_distribution(
+            link_df.from_id.value_counts(sort=False).to_numpy())
+        in_df = degree_distribution(
+            link_df.to_id.value_counts(sort=False).to_numpy())
+        result = out_df.merge(
+            in_df, on='degree', how='outer', suffixes=('_out', '_in'))
+        result = result.fillna(0).astype(np.int64).sort_values('degree')
+        return [result.reset_index(drop=True)]
+
+
+class NodeRank(ProfiledObjProcessor, ObjProcessor):
+    """
+    Compute weakly connected components and PageRank over
+    the union graph of `links`. Nodes of different node types
+    are indexed into a global integer index.
+    """
+
+    def __init__(self, links: List[str], triplets: Dict[str, Tuple[str, str]],
+                 input_storage: PandasStorage, output_storage: PandasStorage,
+                 damping: float = 0.85):
+        self._links = links
+        self._triplets = triplets
+        self._nodes = []
+        for link in links:
+            for node in triplets[link]:
+                if node not in self._nodes:
+                    self._nodes.append(node)
+        self._damping = damping
+        super().__init__(input_storage, output_storage)
+
+    @property
+    def input_ids(self):
+        return [f'node_{node}_final' for node in self._nodes] + [
+            f'link_{link}_final' for link in self._links]
+
+    @property
+    def input_columns(self) -> Dict[str, List[str]]:
+        results = {f'node_{node}_final': ['node_id'] for node in self._nodes}
+        for link in self._links:
+            results[f'link_{link}_final'] = ['from_id', 'to_id']
+        return results
+
+    @property
+    def output_ids(self):
+        return [f'node_{node}_rank' for node in self._nodes]
+
+    def transform(self, inputs: List[pd.DataFrame]) -> List[pd.DataFrame]:
+        node_dfs = inputs[:len(self._nodes)]
+        link_dfs = inputs[len(self._nodes):]
+        indexes = dict()
+        offsets = dict()
+        n = 0
+        for node, node_df in zip(self._nodes, node_dfs):
+            indexes[node] = build_node_index(node_df.node_id)
+            offsets[node] = n
+            n += len(indexes[node])
+        srcs = []
+        dsts = []
+        for link, link_df in zip(self._links, link_dfs):
+            src_node, dest_node = self._triplets[link]
+            srcs.append(offsets[src_node] + lookup_positions(
+                indexes[src_node], link_df.from_id))
+            dsts.append(offsets[dest_node] + lookup_positions(
+                indexes[dest_node], link_df.to_id))
+        src = np.concatenate(srcs)
+        dst = np.concatenate(dsts)
+        component_id, component_size = weakly_connected_components(
+            src, dst, n)
+        rank = pagerank(src, dst, n, damping=self._damping)
+        results = []
+        for node in self._nodes:
+            start = offsets[node]
+            end = start + len(indexes[node])
+            results.append(pd.DataFrame({
+                'node_id': indexes[node].astype(str),
+                'component_id': component_id[start:end].astype(np.int64),
+                'component_size': component_size[start:end].astype(np.int64),
+                'pagerank': rank[start:end]
+            }))
+        print('rank', self._links, '- #Nodes:', n, '#Links:', len(src))
+        return results
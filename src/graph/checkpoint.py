@@ -0,0 +1,158 @@
+"""
+Checkpoint markers of ETL outputs
+
+A marker `{id}_checkpoint.json` is written next to an output object
+after the object is completely uploaded. It holds the content hash
+of the object and the key of the work that produced it (a hash of the
+SQL and of the content hashes of its inputs), so that a rerun can
+skip outputs whose marker matches the work to be done.
+
+Outputs written as tables of a DuckDB database have their keys
+in a table of the same database instead (see `TableCheckpoint`).
+
+Table outputs of ObjProcessors (e.g., `latest_*` of LatestTabularize) get
+markers without a key, holding the hash of the uploaded table (see `table_hash`),
+so that the SQL stages reading them do not download them to hash them.
+"""
+from typing import Dict, List, Optional, Union
+import hashlib
+import io
+import json
+import pandas as pd
+import pyarrow as pa
+from batch_framework.filesystem import FileSystem
+
+__all__ = ['Checkpoint', 'TableCheckpoint', 'content_hash', 'table_hash', 'work_key']
+
+
+def content_hash(buff: io.BytesIO) -> str:
+    return hashlib.sha256(buff.getbuffer()).hexdigest()
+
+
+class _HashSink:
+    """
+    Writable file hashing the written bytes instead of keeping them
+    """
+
+    def __init__(self):
+        self.closed = False
+        self._sha256 = hashlib.sha256()
+
+    def write(self, data) -> int:
+        self._sha256.update(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def hexdigest(self) -> str:
+        return self._sha256.hexdigest()
+
+
+def table_hash(table: Union[pd.DataFrame, pa.Table]) -> str:
+    """
+    Hash of the schema and the values of a table, computed
+    on its Arrow IPC stream batch by batch.
+    """
+    if isinstance(table, pd.DataFrame):
+        table = pa.Table.from_pandas(table)
+    sink = _HashSink()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        for batch in table.to_batches():
+            writer.write_batch(batch)
+    return sink.hexdigest()
+
+
+def work_key(sql: str, input_hashes: Dict[str, str]) -> str:
+    """
+    Hash identifying the work producing an output
+    """
+    return hashlib.sha256(
+        json.dumps([sql, input_hashes], sort_keys=True).encode()).hexdigest()
+
+
+class Checkpoint:
+    """
+    Markers of completed output objects stored on a FileSystem
+    """
+
+    def __init__(self, fs: FileSystem):
+        self._fs = fs
+
+    @staticmethod
+    def marker_path(id: str) -> str:
+        return f'{id}_checkpoint.json'
+
+    def load(self, id: str) -> Optional[Dict]:
+        if not self._fs.check_exists(Checkpoint.marker_path(id)):
+            return None
+        try:
+            marker = json.load(self._fs.download_core(Checkpoint.marker_path(id)))
+        except ValueError:
+            return None
+        if not marker.get('completed', False):
+            return None
+        return marker
+
+    def save(self, id: str, content_hash: str, key: Optional[str] = None):
+        marker = {
+            'id': id,
+            'content_hash': content_hash,
+            'key': key,
+            'completed': True
+        }
+        buff = io.BytesIO(json.dumps(marker, sort_keys=True).encode())
+        self._fs.upload_core(buff, Checkpoint.marker_path(id))
+
+    def drop(self, id: str):
+        self._fs.drop_file(Checkpoint.marker_path(id))
+
+    def is_done(self, id: str, key: str) -> bool:
+        """
+        Whether `id` is completely uploaded by the work of `key`
+        """
+        marker = self.load(id)
+        return marker is not None and marker['key'] == key and \
+            self._fs.check_exists(f'{id}.parquet')
+
+    def get_hashes(self, ids: List[str]) -> Dict[str, str]:
+        """
+        Content hashes of the objects having markers
+        """
+        results = dict()
+        for id in ids:
+            marker = self.load(id)
+            if marker is not None:
+                results[id] = marker['content_hash']
+        return results
+
+
+class TableCheckpoint:
+    """
+    Keys of the works producing the tables of a DuckDB database,
+    stored in its table `_checkpoint`. Save the key in the transaction
+    creating the table, so that the key always describes the table.
+    """
+    TABLE = '_checkpoint'
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self._cursor.execute(
+            f'CREATE TABLE IF NOT EXISTS {TableCheckpoint.TABLE} (id VARCHAR PRIMARY KEY, key VARCHAR)')
+
+    def save(self, id: str, key: str):
+        self._cursor.execute(
+            f'INSERT OR REPLACE INTO {TableCheckpoint.TABLE} VALUES (?, ?)', [id, key])
+
+    def is_done(self, id: str, key: str) -> bool:
+        """
+        Whether table `id` is created by the work of `key`
+        """
+        marker = self._cursor.execute(
+            f'SELECT key FROM {TableCheckpoint.TABLE} WHERE id = ?', [id]).fetchone()
+        exists = self._cursor.execute(
+            'SELECT COUNT(*) FROM duckdb_tables() WHERE table_name = ?', [id]).fetchone()[0]
+        return marker is not None and marker[0] == key and exists > 0
@@ -0,0 +1,4 @@
+from .main import CSRExporter
+from .reader import CSRGraph
+
+__all__ = ['CSRExporter', 'CSRGraph']
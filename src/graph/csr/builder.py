@@ -0,0 +1,64 @@
+"""
+Vectorized builders of dense node indexes and CSR adjacency arrays
+"""
+from typing import Tuple
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+__all__ = ['as_uint64', 'build_node_index', 'lookup_positions', 'build_csr']
+
+
+def as_uint64(node_ids: pd.Series) -> np.ndarray:
+    """
+    Convert node ids (hash values as string or integer) into uint64.
+    """
+    return pa.array(node_ids).cast(pa.uint64()).to_numpy(zero_copy_only=False)
+
+
+def build_node_index(node_ids: pd.Series) -> np.ndarray:
+    """
+    Build the dense index of a node table.
+
+    Args:
+        node_ids: `node_id` column of a node table (hash values as string or integer).
+    Returns:
+        np.ndarray: sorted unique uint64 node ids. The position of an id
+            in the array is the dense integer index of the node.
+    """
+    return np.unique(as_uint64(node_ids))
+
+
+def lookup_positions(index: np.ndarray, node_ids: pd.Series) -> np.ndarray:
+    """
+    Map node ids to their dense positions in `index`.
+    """
+    ids = as_uint64(node_ids)
+    positions = np.searchsorted(index, ids)
+    found = positions < len(index)
+    found[found] = index[positions[found]] == ids[found]
+    assert found.all(), f'{(~found).sum()} ids are not in the node index'
+    return positions
+
+
+def build_csr(src: np.ndarray, dst: np.ndarray,
+              num_src: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Build compressed sparse row arrays from edge positions.
+
+    Args:
+        src: dense positions of source nodes of the edges.
+        dst: dense positions of target nodes of the edges.
+        num_src: number of source nodes.
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: (indptr, indices), where the targets
+            of the source node `i` are `indices[indptr[i]:indptr[i + 1]]`
+            in ascending order.
+    """
+    order = np.lexsort((dst, src))
+    indices = dst[order]
+    if len(indices) == 0 or indices.max() < np.iinfo(np.int32).max:
+        indices = indices.astype(np.int32)
+    indptr = np.zeros(num_src + 1, dtype=np.int64)
+    np.cumsum(np.bincount(src, minlength=num_src), out=indptr[1:])
+    return indptr, indices
@@ -0,0 +1,98 @@
+from typing import Dict, List
+import numpy as np
+import pandas as pd
+from batch_framework.etl import ObjProcessor
+from batch_framework.storage import PandasStorage
+from .storage import NumpyStorage
+from ..profiling import ProfiledObjProcessor
+from .builder import as_uint64, build_node_index, lookup_positions, build_csr
+
+__all__ = ['NodeIndexExporter', 'AdjacencyExporter']
+
+
+class NodeIndexExporter(ProfiledObjProcessor, ObjProcessor):
+    """
+    Save sorted node ids of a final node table.
+    The position of a node id is its dense integer index.
+    """
+
+    def __init__(self, node: str, input_storage: PandasStorage,
+                 output_storage: NumpyStorage):
+        self._node = node
+        super().__init__(input_storage, output_storage)
+
+    @property
+    def input_ids(self):
+        return [f'node_{self._node}_final']
+
+    @property
+    def input_columns(self) -> Dict[str, List[str]]:
+        return {f'node_{self._node}_final': ['node_id']}
+
+    @property
+    def output_ids(self):
+        return [f'csr_{self._node}_node_id']
+
+    def transform(self, inputs: List[pd.DataFrame]) -> List[np.ndarray]:
+        index = build_node_index(inputs[0].node_id)
+        print('csr', self._node, '- #Nodes:', len(index))
+        return [index]
+
+
+class AdjacencyExporter(ProfiledObjProcessor, ObjProcessor):
+    """
+    Save CSR (by source) and CSC (by target) adjacency arrays
+    of a final link table, indexed by the dense node indexes
+    saved by NodeIndexExporter.
+
+    Args:
+        - link_storage: storage of the final link table.
+        - storage: storage of the node indexes and the adjacency arrays.
+    """
+
+    def __init__(self, link: str, src_node: str, dest_node: str,
+                 link_storage: PandasStorage, storage: NumpyStorage):
+        self._link = link
+        self._src_node = src_node
+        self._dest_node = dest_node
+        self._link_storage = link_storage
+        super().__init__(storage)
+
+    @property
+    def input_ids(self):
+        results = [f'link_{self._link}_final', f'csr_{self._src_node}_node_id']
+        if self._dest_node != self._src_node:
+            results.append(f'csr_{self._dest_node}_node_id')
+        return results
+
+    @property
+    def input_columns(self) -> Dict[str, List[str]]:
+        return {f'link_{self._link}_final': ['from_id', 'to_id']}
+
+    @property
+    def output_ids(self):
+        return [
+            f'csr_{self._link}_indptr',
+            f'csr_{self._link}_indices',
+            f'csc_{self._link}_indptr',
+            f'csc_{self._link}_indices'
+        ]
+
+    def _extract_inputs(self) -> List[object]:
+        # the link table is read as its uint64 (from_id, to_id) arrays
+        link_df = self._extract_input(self.input_ids[0], storage=self._link_storage)
+        return [as_uint64(link_df.from_id), as_uint64(link_df.to_id)] + [
+            self._extract_input(id) for id in self.input_ids[1:]]
+
+    def transform(self, inputs: List[np.ndarray]) -> List[np.ndarray]:
+        from_ids, to_ids, src_index = inputs[:3]
+        if self._dest_node != self._src_node:
+            dest_index = inputs[3]
+        else:
+            dest_index = src_index
+        src = lookup_positions(src_index, from_ids)
+        dest = lookup_positions(dest_index, to_ids)
+        csr_indptr, csr_indices = build_csr(src, dest, len(src_index))
+        csc_indptr, csc_indices = build_csr(dest, src, len(dest_index))
+        print('csr', self._link, '- #Links:', len(from_ids))
+        return [csr_indptr, csr_indices, csc_indptr, csc_indices]
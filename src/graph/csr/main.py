@@ -0,0 +1,56 @@
+from typing import Dict, List, Tuple
+from batch_framework.etl import ETLGroup
+from batch_framework.storage import PandasStorage
+from batch_framework.filesystem import FileSystem
+from .storage import NumpyStorage
+from .exporter import NodeIndexExporter, AdjacencyExporter
+
+
+class CSRExporter(ETLGroup):
+    """
+    Export the final graph as memory-mappable NumPy arrays:
+        - csr_{node}_node_id: sorted node ids of each node type
+        - csr_{link}_indptr / csr_{link}_indices: adjacency by source node
+        - csc_{link}_indptr / csc_{link}_indices: adjacency by target node
+    """
+
+    def __init__(self, triplets: Dict[str, Tuple[str, str]],
+                 input_fs: FileSystem, output_fs: FileSystem):
+        input_storage = PandasStorage(input_fs)
+        output_storage = NumpyStorage(output_fs)
+        nodes = []
+        for src_node, dest_node in triplets.values():
+            for node in [src_node, dest_node]:
+                if node not in nodes:
+                    nodes.append(node)
+        args = [
+            NodeIndexExporter(node, input_storage, output_storage)
+            for node in nodes
+        ]
+        for link, (src_node, dest_node) in triplets.items():
+            args.append(
+                AdjacencyExporter(
+                    link, src_node, dest_node, input_storage, output_storage)
+            )
+        self._inputs = []
+        self._outputs = []
+        for etl_unit in args:
+            self._outputs.extend(etl_unit.output_ids)
+        # node indexes are read back by AdjacencyExporter, so they are not inputs of the group
+        for etl_unit in args:
+            for id in etl_unit.input_ids:
+                if id not in self._inputs and id not in self._outputs:
+                    self._inputs.append(id)
+        super().__init__(*args)
+
+    @property
+    def input_ids(self):
+        return self._inputs
+
+    @property
+    def external_input_ids(self) -> List[str]:
+        return self.input_ids
+
+    @property
+    def output_ids(self):
+        return self._outputs
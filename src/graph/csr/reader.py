@@ -0,0 +1,45 @@
+import os
+from typing import Dict
+import numpy as np
+
+__all__ = ['CSRGraph']
+
+
+class CSRGraph:
+    """
+    Read-only view of the arrays exported by `CSRExporter`
+    from a local directory. Arrays are memory-mapped, so only
+    the touched pages are loaded.
+    """
+
+    def __init__(self, directory: str, mmap: bool = True):
+        self._directory = directory
+        self._mmap_mode = 'r' if mmap else None
+        self._arrays: Dict[str, np.ndarray] = dict()
+
+    def _load(self, obj_id: str) -> np.ndarray:
+        if obj_id not in self._arrays:
+            self._arrays[obj_id] = np.load(
+                os.path.join(self._directory, obj_id + '.npy'),
+                mmap_mode=self._mmap_mode)
+        return self._arrays[obj_id]
+
+    def node_ids(self, node: str) -> np.ndarray:
+        return self._load(f'csr_{node}_node_id')
+
+    def position(self, node: str, node_id: int) -> int:
+        ids = self.node_ids(node)
+        pos = int(np.searchsorted(ids, np.uint64(node_id)))
+        if pos >= len(ids) or ids[pos] != np.uint64(node_id):
+            raise KeyError(f'{node_id} is not a {node} node')
+        return pos
+
+    def successors(self, link: str, pos: int) -> np.ndarray:
+        """Dense positions of target nodes linked from source node `pos`"""
+        indptr = self._load(f'csr_{link}_indptr')
+        return self._load(f'csr_{link}_indices')[indptr[pos]:indptr[pos + 1]]
+
+    def predecessors(self, link: str, pos: int) -> np.ndarray:
+        """Dense positions of source nodes linked to target node `pos`"""
+        indptr = self._load(f'csc_{link}_indptr')
+        return self._load(f'csc_{link}_indices')[indptr[pos]:indptr[pos + 1]]
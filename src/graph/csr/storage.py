@@ -0,0 +1,39 @@
+import io
+import numpy as np
+from batch_framework.storage import Storage
+from batch_framework.filesystem import FileSystem
+
+__all__ = ['NumpyStorage']
+
+
+class NumpyStorage(Storage):
+    """
+    Storage of NumPy arrays saved as `.npy` files
+    """
+
+    def __init__(self, backend: FileSystem):
+        assert isinstance(
+            backend, FileSystem), 'NumpyStorage should have FileSystem backend'
+        super().__init__(backend=backend)
+
+    def upload(self, array: np.ndarray, obj_id: str):
+        buff = io.BytesIO()
+        np.save(buff, array, allow_pickle=False)
+        self._backend.upload_core(buff, obj_id + '.npy')
+
+    def download(self, obj_id: str) -> np.ndarray:
+        buff = self._backend.download_core(obj_id + '.npy')
+        buff.seek(0)
+        return np.load(buff, allow_pickle=False)
+
+    def check_exists(self, obj_id: str) -> bool:
+        return self._backend.check_exists(obj_id + '.npy')
+
+    def drop(self, obj_id: str):
+        return self._backend.drop_file(obj_id + '.npy')
+
+    def copy(self, src_obj_id: str, dest_obj_id: str):
+        self._backend.copy_file(
+            src_obj_id + '.npy',
+            dest_obj_id + '.npy'
+        )
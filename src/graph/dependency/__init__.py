@@ -0,0 +1,3 @@
+from .main import DependencyClosure
+
+__all__ = ['DependencyClosure']
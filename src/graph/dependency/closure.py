@@ -0,0 +1,216 @@
+"""
+Transitive dependency metrics over a directed graph
+with cycles condensed into strongly connected components.
+
+Transitive dependents (the reverse-dependency index) are the
+transitive dependencies of the graph with its edges reversed.
+"""
+from typing import Dict, Set, Tuple
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import connected_components
+from ..csr.builder import as_uint64, build_node_index, lookup_positions
+
+__all__ = ['compute_closure', 'update_closure']
+
+METRICS = ['num_dependencies', 'num_transitive_dependencies',
+           'dependency_depth', 'num_dependents', 'num_transitive_dependents']
+
+
+def _adjacency(src: np.ndarray, dst: np.ndarray, n: int) -> csr_matrix:
+    data = np.ones(len(src), dtype=bool)
+    graph = csr_matrix((data, (src, dst)), shape=(n, n))
+    graph.sum_duplicates()
+    return graph
+
+
+def reachable(graph: csr_matrix, sources: np.ndarray) -> np.ndarray:
+    """
+    Mask of nodes reachable from `sources` (sources included)
+    by a frontier-at-a-time breadth first search.
+    """
+    visited = np.zeros(graph.shape[0], dtype=bool)
+    visited[sources] = True
+    frontier = np.unique(sources)
+    while len(frontier):
+        neighbors = np.unique(graph[frontier].indices)
+        frontier = neighbors[~visited[neighbors]]
+        visited[frontier] = True
+    return visited
+
+
+def _condensed_metrics(src: np.ndarray, dst: np.ndarray, n: int):
+    """
+    Args:
+        src, dst: dense positions of edges without self loops.
+        n: number of nodes.
+    Returns:
+        (num_transitive_dependencies, dependency_depth) per node
+    """
+    if n == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int32)
+    graph = _adjacency(src, dst, n)
+    num_comp, labels = connected_components(
+        graph, directed=True, connection='strong')
+    comp_size = np.bincount(labels, minlength=num_comp)
+    # Condensation DAG
+    csrc, cdst = labels[src], labels[dst]
+    keep = csrc != cdst
+    pairs = np.unique(csrc[keep].astype(np.int64) * num_comp + cdst[keep])
+    csrc, cdst = pairs // num_comp, pairs % num_comp
+    dag = _adjacency(csrc, cdst, num_comp)
+    reverse_dag = _adjacency(cdst, csrc, num_comp)
+    # Peel the DAG from its sinks: the peeling round of a component
+    # is the length of its longest dependency chain.
+    out_degree = np.diff(dag.indptr)
+    depth = np.zeros(num_comp, dtype=np.int32)
+    frontier = np.flatnonzero(out_degree == 0)
+    order = []
+    level = 0
+    while len(frontier):
+        depth[frontier] = level
+        order.append(frontier)
+        preds = reverse_dag[frontier].indices
+        np.subtract.at(out_degree, preds, 1)
+        preds = np.unique(preds)
+        frontier = preds[out_degree[preds] == 0]
+        level += 1
+    # Union reachable components sinks first, releasing a set
+    # once all of its dependents have consumed it.
+    pending = np.diff(reverse_dag.indptr).copy()
+    reach: Dict[int, Set[int]] = dict()
+    comp_count = np.zeros(num_comp, dtype=np.int64)
+    for frontier in order:
+        for c in frontier.tolist():
+            succs = dag.indices[dag.indptr[c]:dag.indptr[c + 1]].tolist()
+            result = set(succs)
+            for d in succs:
+                result |= reach[d]
+                pending[d] -= 1
+                if pending[d] == 0:
+                    del reach[d]
+            if result:
+                comp_count[c] = comp_size[list(result)].sum()
+            if pending[c] > 0:
+                reach[c] = result
+    transitive = comp_count[labels] + comp_size[labels] - 1
+    return transitive, depth[labels]
+
+
+def _edge_positions(link_df: pd.DataFrame, index: np.ndarray):
+    src = lookup_positions(index, link_df.from_id)
+    dst = lookup_positions(index, link_df.to_id)
+    keep = src != dst
+    return src[keep], dst[keep]
+
+
+def _to_frame(index: np.ndarray, num_deps: np.ndarray,
+              transitive: np.ndarray, depth: np.ndarray,
+              num_dependents: np.ndarray,
+              transitive_dependents: np.ndarray) -> pd.DataFrame:
+    return pd.DataFrame({
+        'node_id': index.astype(str),
+        'num_dependencies': num_deps.astype(np.int32),
+        'num_transitive_dependencies': transitive.astype(np.int32),
+        'dependency_depth': depth.astype(np.int32),
+        'num_dependents': num_dependents.astype(np.int32),
+        'num_transitive_dependents': transitive_dependents.astype(np.int32)
+    })
+
+
+def _direct_degrees(src: np.ndarray, dst: np.ndarray, n: int):
+    pairs = np.unique(src.astype(np.int64) * n + dst)
+    return (np.bincount(pairs // n, minlength=n),
+            np.bincount(pairs % n, minlength=n))
+
+
+def compute_closure(link_df: pd.DataFrame,
+                    node_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Compute dependency metrics of every node.
+
+    Args:
+        link_df: dependency links with `from_id` depending on `to_id`.
+        node_df: nodes with `node_id`.
+    Returns:
+        pd.DataFrame: node_id, num_dependencies, num_transitive_dependencies,
+            dependency_depth, num_dependents and num_transitive_dependents of every node.
+    """
+    index = build_node_index(node_df.node_id)
+    n = len(index)
+    src, dst = _edge_positions(link_df, index)
+    num_deps, num_dependents = _direct_degrees(src, dst, n)
+    transitive, depth = _condensed_metrics(src, dst, n)
+    transitive_dependents, _ = _condensed_metrics(dst, src, n)
+    return _to_frame(
+        index, num_deps, transitive, depth, num_dependents, transitive_dependents)
+
+
+def _update_metrics(src: np.ndarray, dst: np.ndarray, n: int, changed: np.ndarray,
+                    prev_transitive: np.ndarray,
+                    prev_depth: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Recompute the metrics of `_condensed_metrics` of the nodes reaching
+    a `changed` node (the affected nodes), over the subgraph they can reach.
+    The previous metrics are kept for the other nodes.
+    """
+    affected = reachable(_adjacency(dst, src, n), np.flatnonzero(changed))
+    print('dependency closure - #Affected:', int(affected.sum()), '/', n)
+    scope = reachable(_adjacency(src, dst, n), np.flatnonzero(affected))
+    positions = np.flatnonzero(scope)
+    local = np.full(n, -1, dtype=np.int64)
+    local[positions] = np.arange(len(positions))
+    in_scope = scope[src]
+    transitive_local, depth_local = _condensed_metrics(
+        local[src[in_scope]], local[dst[in_scope]], len(positions))
+    transitive = prev_transitive.astype(np.int64)
+    depth = prev_depth.astype(np.int32)
+    transitive[affected] = transitive_local[local[affected]]
+    depth[affected] = depth_local[local[affected]]
+    return transitive, depth
+
+
+def update_closure(link_df: pd.DataFrame, node_df: pd.DataFrame,
+                   prev_link_df: pd.DataFrame,
+                   prev_result: pd.DataFrame) -> pd.DataFrame:
+    """
+    Update dependency metrics computed from `prev_link_df`.
+
+    Only packages whose dependencies changed and their dependents
+    (ancestors) are recomputed, and likewise for transitive dependents:
+    packages whose dependents changed and their dependencies (descendants).
+    """
+    if not set(METRICS) <= set(prev_result.columns):
+        return compute_closure(link_df, node_df)
+    index = build_node_index(node_df.node_id)
+    n = len(index)
+    src, dst = _edge_positions(link_df, index)
+    num_deps, num_dependents = _direct_degrees(src, dst, n)
+    diff = link_df[['from_id', 'to_id']].merge(
+        prev_link_df[['from_id', 'to_id']], how='outer', indicator=True)
+    diff = diff[diff['_merge'] != 'both']
+    # Previous metrics aligned with `index` (new nodes are always recomputed)
+    prev_index = pd.Index(as_uint64(prev_result.node_id), dtype='uint64')
+    prev_positions = prev_index.get_indexer(index)
+    is_new = prev_positions < 0
+
+    def prev_metric(column: str) -> np.ndarray:
+        return np.where(
+            is_new, 0, prev_result[column].to_numpy()[prev_positions])
+
+    def changed_nodes(column: str) -> np.ndarray:
+        ids = as_uint64(diff[column].unique())
+        ids = ids[np.isin(ids, index)]
+        changed = is_new.copy()
+        changed[np.searchsorted(index, ids)] = True
+        return changed
+
+    transitive, depth = _update_metrics(
+        src, dst, n, changed_nodes('from_id'),
+        prev_metric('num_transitive_dependencies'), prev_metric('dependency_depth'))
+    transitive_dependents, _ = _update_metrics(
+        dst, src, n, changed_nodes('to_id'),
+        prev_metric('num_transitive_dependents'), np.zeros(n, dtype=np.int32))
+    return _to_frame(
+        index, num_deps, transitive, depth, num_dependents, transitive_dependents)
@@ -0,0 +1,55 @@
+from typing import Dict, List
+import pandas as pd
+from batch_framework.etl import ObjProcessor
+from batch_framework.storage import PandasStorage
+from .closure import compute_closure, update_closure
+from ..profiling import ProfiledObjProcessor
+
+
+class DependencyClosure(ProfiledObjProcessor, ObjProcessor):
+    """
+    Precompute transitive dependency metrics of the nodes
+    of a dependency link (e.g., package -has_requirement-> package)
+    as a node attribute table `node_{node}_dependency`:
+        - num_dependencies: number of direct dependencies
+        - num_transitive_dependencies: number of nodes reachable by the link
+        - dependency_depth: longest dependency chain, cycles counted as one level
+        - num_dependents: number of direct reverse dependencies (fan-in)
+        - num_transitive_dependents: number of nodes reaching the node by the link
+
+    The inputs and outputs of the last run are cached, so that
+    a rerun only recomputes packages affected by changed links.
+    """
+
+    def __init__(self, link: str, node: str, storage: PandasStorage):
+        self._link = link
+        self._node = node
+        super().__init__(storage, make_cache=True)
+
+    @property
+    def input_ids(self):
+        return [f'link_{self._link}_final', f'node_{self._node}_final']
+
+    @property
+    def input_columns(self) -> Dict[str, List[str]]:
+        return {
+            f'link_{self._link}_final': ['from_id', 'to_id'],
+            f'node_{self._node}_final': ['node_id']
+        }
+
+    @property
+    def output_ids(self):
+        return [f'node_{self._node}_dependency']
+
+    def transform(self, inputs: List[pd.DataFrame]) -> List[pd.DataFrame]:
+        link_df, node_df = inputs
+        if self.exists_cache:
+            result = update_closure(
+                link_df, node_df,
+                prev_link_df=self.load_cache(self.input_ids[0]),
+                prev_result=self.load_cache(self.output_ids[0])
+            )
+        else:
+            result = compute_closure(link_df, node_df)
+        print('dependency closure', self._node, '- #Nodes:', len(result))
+        return [result]
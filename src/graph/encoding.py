@@ -0,0 +1,243 @@
+"""
+Tuned parquet encoding of exported graph tables
+"""
+from typing import Dict, List, Optional, Tuple, Union
+import io
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from batch_framework.storage import PandasStorage, PyArrowStorage
+from batch_framework.filesystem import FileSystem
+
+__all__ = ['ParquetOptions', 'EncodedStorage', 'RowGroupWriter', 'write_batches', 'read_columns']
+
+# row group size of `pq.write_table` with default settings
+DEFAULT_ROW_GROUP_SIZE = 1024 * 1024
+
+
+def read_columns(storage: Union[PandasStorage, PyArrowStorage], obj_id: str,
+                 columns: List[str]) -> Union[pd.DataFrame, pa.Table]:
+    """
+    Download only `columns` of an object, decoding no other column chunk of the parquet.
+
+    Returns:
+        pd.DataFrame / pa.Table: by the download type of `storage`.
+    """
+    backend = storage._backend
+    if isinstance(backend, FileSystem):
+        table = pq.read_table(backend.download_core(obj_id + '.parquet'), columns=columns)
+    else:
+        cursor = backend.get_conn()
+        try:
+            table = cursor.execute(
+                f'SELECT {", ".join(columns)} FROM {obj_id};').arrow()
+        finally:
+            cursor.close()
+    if isinstance(storage, PandasStorage):
+        return table.to_pandas()
+    return table
+
+
+class RowGroupWriter:
+    """
+    ParquetWriter writing row groups of `row_group_size` rows whatever
+    the sizes of the written tables, i.e., the row groups of `pq.write_table`.
+    Rows of an incomplete row group are held until it is complete or the
+    writer is closed.
+    """
+
+    def __init__(self, writer: pq.ParquetWriter, row_group_size: int):
+        self._writer = writer
+        self._row_group_size = row_group_size
+        self._pending: List[pa.Table] = []
+        self._num_pending = 0
+        self._num_written = 0
+
+    def write_table(self, table: pa.Table):
+        self._pending.append(table)
+        self._num_pending += table.num_rows
+        if self._num_pending >= self._row_group_size:
+            # concatenating and slicing do not copy the batches
+            pending = pa.concat_tables(self._pending)
+            num_rows = pending.num_rows - pending.num_rows % self._row_group_size
+            self._writer.write_table(
+                pending.slice(0, num_rows), row_group_size=self._row_group_size)
+            self._num_written += num_rows
+            rest = pending.slice(num_rows)
+            self._pending = [rest] if rest.num_rows > 0 else []
+            self._num_pending = rest.num_rows
+
+    def close(self):
+        if self._num_pending > 0:
+            self._writer.write_table(
+                pa.concat_tables(self._pending), row_group_size=self._row_group_size)
+        elif self._num_written == 0:
+            # an empty table is written as an empty row group
+            self._writer.write_table(self._writer.schema.empty_table())
+        self._pending = []
+        self._num_pending = 0
+        self._writer.close()
+
+
+def write_batches(reader: pa.RecordBatchReader,
+                  writers: List[Union[pq.ParquetWriter, RowGroupWriter]]) -> int:
+    """
+    Write the batches of `reader` into every writer, holding one batch
+    in memory at a time (or the rows of a row group of a RowGroupWriter).
+    A ParquetWriter writes every batch as a row group.
+
+    Returns:
+        int: number of written rows.
+    """
+    num_rows = 0
+    for batch in reader:
+        table = pa.Table.from_batches([batch])
+        for writer in writers:
+            writer.write_table(table)
+        num_rows += batch.num_rows
+    for writer in writers:
+        writer.close()
+    return num_rows
+
+
+class ParquetOptions:
+    """
+    Data Class describing how graph tables are encoded into parquet
+
+    Args:
+        - compression: parquet compression codec.
+        - compression_level: level of the compression codec (zstd: 1 ~ 22).
+        - row_group_size: maximum number of rows in a row group.
+        - use_dictionary: dictionary-encode all columns (True), no columns (False)
+            or only the listed columns (list of column names).
+        - sort_by: columns to sort a table by before writing. If None, node tables
+            (`node_*`) are sorted by `node_id` and link tables (`link_*`) by
+            (`from_id`, `to_id`) so that runs of repeated values compress well.
+        - measure_baseline: also measure the size of the table written with default
+            pyarrow settings, so that the report shows bytes before and after tuning.
+            It encodes every table twice, so it is meant for benchmarks.
+    """
+
+    def __init__(self,
+                 compression: str = 'zstd',
+                 compression_level: Optional[int] = 9,
+                 row_group_size: int = 1000000,
+                 use_dictionary: Union[bool, List[str]] = True,
+                 sort_by: Optional[List[str]] = None,
+                 measure_baseline: bool = False):
+        self.compression = compression
+        self.compression_level = compression_level
+        self.row_group_size = row_group_size
+        self.use_dictionary = use_dictionary
+        self.sort_by = sort_by
+        self.measure_baseline = measure_baseline
+
+    def get_sort_keys(self, obj_id: str) -> List[str]:
+        if self.sort_by is not None:
+            return self.sort_by
+        elif obj_id.startswith('node_'):
+            return ['node_id']
+        elif obj_id.startswith('link_'):
+            return ['from_id', 'to_id']
+        else:
+            return []
+
+    def get_dictionary_columns(
+            self, column_names: List[str]) -> Union[bool, List[str]]:
+        if isinstance(self.use_dictionary, bool):
+            return self.use_dictionary
+        return [c for c in self.use_dictionary if c in column_names]
+
+    def write(self, table: pa.Table, sink: Union[io.BytesIO, pa.NativeFile]):
+        pq.write_table(
+            table,
+            sink,
+            compression=self.compression,
+            compression_level=self.compression_level,
+            row_group_size=self.row_group_size,
+            use_dictionary=self.get_dictionary_columns(table.column_names)
+        )
+
+    def open_writer(self, schema: pa.Schema, sink) -> RowGroupWriter:
+        """
+        Writer encoding tables of `schema` into `sink` batch by batch,
+        in the row groups of `write`
+        """
+        return RowGroupWriter(pq.ParquetWriter(
+            sink,
+            schema,
+            compression=self.compression,
+            compression_level=self.compression_level,
+            use_dictionary=self.get_dictionary_columns(schema.names)
+        ), self.row_group_size)
+
+
+class EncodedStorage(PyArrowStorage):
+    """
+    Storage of pyarrow Table writing parquet with `ParquetOptions`.
+
+    Bytes of every uploaded table are recorded in `report`
+    as (bytes with default encoding, bytes with tuned encoding).
+    """
+
+    def __init__(self, backend: FileSystem, options: ParquetOptions):
+        assert isinstance(
+            backend, FileSystem), 'EncodedStorage should have FileSystem backend'
+        self._options = options
+        self._report: Dict[str, Tuple[Optional[int], int]] = dict()
+        super().__init__(backend)
+
+    def upload(self, dataframe: pa.Table, obj_id: str):
+        self._backend.upload_core(self.encode(dataframe, obj_id), obj_id + '.parquet')
+
+    def get_sort_keys(self, obj_id: str, column_names: List[str]) -> List[str]:
+        return [k for k in self._options.get_sort_keys(obj_id) if k in column_names]
+
+    def encode(self, dataframe: pa.Table, obj_id: str) -> io.BytesIO:
+        """
+        Encode a table into parquet bytes and record its size in `report`
+        """
+        sort_keys = self.get_sort_keys(obj_id, dataframe.column_names)
+        if sort_keys:
+            dataframe = dataframe.sort_by([(k, 'ascending') for k in sort_keys])
+        if self._options.measure_baseline:
+            sink = pa.MockOutputStream()
+            pq.write_table(dataframe, sink)
+            before = sink.size()
+        else:
+            before = None
+        buff = io.BytesIO()
+        self._options.write(dataframe, buff)
+        self._report[obj_id] = (before, buff.getbuffer().nbytes)
+        return buff
+
+    def encode_batches(self, reader: pa.RecordBatchReader, obj_id: str, sink) -> int:
+        """
+        Encode the batches of a table, already sorted by `get_sort_keys`,
+        into a writable file object and record its size in `report`
+
+        Returns:
+            int: number of encoded rows.
+        """
+        start = sink.tell()
+        writers = [self._options.open_writer(reader.schema, sink)]
+        baseline = pa.MockOutputStream() if self._options.measure_baseline else None
+        if baseline is not None:
+            writers.append(RowGroupWriter(
+                pq.ParquetWriter(baseline, reader.schema), DEFAULT_ROW_GROUP_SIZE))
+        num_rows = write_batches(reader, writers)
+        self._report[obj_id] = (
+            baseline.size() if baseline is not None else None, sink.tell() - start)
+        return num_rows
+
+    @property
+    def report(self) -> Dict[str, Tuple[Optional[int], int]]:
+        return self._report
+
+    def print_report(self):
+        for obj_id, (before, after) in self._report.items():
+            if before is None:
+                print('table', obj_id, '- #Bytes:', after)
+            else:
+                print('table', obj_id, '- #Bytes before:', before,
+                      'after:', after, f'({after / max(before, 1):.1%})')
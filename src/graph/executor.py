@@ -0,0 +1,233 @@
+"""
+SQLExecutor base of the graph pipeline
+"""
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+import io
+import re
+import pyarrow as pa
+import pyarrow.parquet as pq
+from batch_framework.etl import SQLExecutor
+from batch_framework.rdb import RDB
+from batch_framework.filesystem import FileSystem
+from .encoding import EncodedStorage, write_batches
+from .resources import ResourceConfig
+from .checkpoint import Checkpoint, TableCheckpoint, content_hash, work_key
+from .profiling import profiler, ProfiledETL
+
+__all__ = ['GraphSQLExecutor']
+
+
+class GraphSQLExecutor(ProfiledETL, SQLExecutor):
+    """
+    SQLExecutor recording a profiling span for every
+    registered input object and every executed SQL.
+
+    If `resource_config` is provided, it is applied to
+    the DuckDB cursor before the SQLs are run.
+
+    If `checkpoint` is True, a checkpoint marker is written for every
+    uploaded output, and outputs whose marker matches the SQL and
+    the contents of the inputs are skipped on reruns. Without `output_fs`,
+    the outputs are tables of `rdb`: they are replaced together with
+    their keys of `TableCheckpoint`, and unchanged tables are kept.
+
+    If `output_fs` supports `open_upload` (e.g., NewDropboxBackend), outputs are
+    streamed: record batches fetched from DuckDB are written as parquet row groups
+    into the upload, without holding the whole table or its encoded bytes in memory.
+    """
+
+    def __init__(self, rdb: RDB, input_fs: Optional[FileSystem] = None,
+                 output_fs: Optional[FileSystem] = None,
+                 resource_config: Optional[ResourceConfig] = None,
+                 checkpoint: bool = False):
+        self._input_fs = input_fs
+        self._output_fs = output_fs
+        self._resource_config = resource_config
+        if checkpoint:
+            assert input_fs is not None, 'checkpoint requires input_fs'
+            self._input_checkpoint = Checkpoint(input_fs)
+            self._output_checkpoint = Checkpoint(output_fs) if output_fs is not None else None
+        else:
+            self._input_checkpoint = None
+            self._output_checkpoint = None
+        super().__init__(rdb, input_fs=input_fs, output_fs=output_fs)
+
+    def _execute(self, **kwargs):
+        sqls = dict(self.sqls(**kwargs))
+        assert set(sqls.keys()) == set(
+            self.output_ids), 'sqls key should corresponds to the output_ids'
+        buffers = dict()
+        keys = dict()
+        cursor = self._rdb.get_conn()
+        references = {
+            output_id: self._get_references(sql) for output_id, sql in sqls.items()}
+        try:
+            if self._input_checkpoint is not None:
+                # every output is keyed on the inputs its SQL references only
+                input_hashes = self._get_input_hashes(
+                    set().union(*references.values()), buffers)
+                keys = {
+                    id: work_key(sql, {i: input_hashes[i] for i in references[id]})
+                    for id, sql in sqls.items()}
+                if self._output_checkpoint is not None:
+                    output_checkpoint = self._output_checkpoint
+                else:
+                    output_checkpoint = TableCheckpoint(cursor)
+                done_ids = [id for id in sqls if output_checkpoint.is_done(id, keys[id])]
+                for id in done_ids:
+                    print(f'@{self} Skip Checkpointed Output: {id}')
+                    del sqls[id]
+                if not sqls:
+                    return
+            if self._resource_config is not None:
+                self._resource_config.apply(cursor)
+            if self._input_fs is None:
+                for output_id, sql in sqls.items():
+                    self._run_sql(cursor, output_id, sql, keys.get(output_id))
+                return
+            # Inputs are registered in the order the SQLs need them, and every
+            # SQL runs as soon as its inputs are registered, while the
+            # following inputs are still being downloaded.
+            input_ids = []
+            for output_id in sqls:
+                input_ids.extend(
+                    [id for id in references[output_id] if id not in input_ids])
+            for id in input_ids:
+                if id not in buffers and not self._input_storage.check_exists(id):
+                    raise ValueError(f'{id} does not exists')
+            pending = list(sqls.keys())
+            registered = set()
+            for id, buff in self._download_inputs(input_ids, buffers):
+                with profiler.span(f'read:{id}', 'object') as span:
+                    print(f'@{self} Start Registering Input: {id}')
+                    cursor.register(id, self._read_input(id, span, buff))
+                    print(f'@{self} End Registering Input: {id}')
+                registered.add(id)
+                while pending and references[pending[0]] <= registered:
+                    output_id = pending.pop(0)
+                    self._run_sql(cursor, output_id, sqls[output_id], keys.get(output_id))
+            for output_id in pending:
+                self._run_sql(cursor, output_id, sqls[output_id], keys.get(output_id))
+        finally:
+            cursor.close()
+
+    def _get_references(self, sql: str) -> Set[str]:
+        """
+        Input tables referenced by a SQL
+        """
+        return {
+            id for id in self.input_ids
+            if re.search(rf'\b{id}\b', sql, flags=re.IGNORECASE)}
+
+    def _download_inputs(self, ids: List[str],
+                         buffers: Dict[str, io.BytesIO]) -> Iterator[Tuple[str, io.BytesIO]]:
+        """
+        Download the inputs in order. Inputs already in `buffers`
+        are taken from there. If the input FileSystem supports
+        `download_many` (e.g., NewDropboxBackend), the others are
+        downloaded together through its shared workers.
+        """
+        paths = [id + '.parquet' for id in ids if id not in buffers]
+        if hasattr(self._input_fs, 'download_many'):
+            downloads = iter(self._input_fs.download_many(paths))
+        else:
+            downloads = ((path, self._input_fs.download_core(path)) for path in paths)
+        for id in ids:
+            if id in buffers:
+                yield id, buffers.pop(id)
+            else:
+                path, buff = next(downloads)
+                assert path == id + '.parquet', f'{path} is downloaded out of order'
+                yield id, buff
+
+    def _run_sql(self, cursor, output_id: str, sql: str, key: Optional[str] = None):
+        with profiler.span(f'sql:{output_id}', 'sql') as span:
+            if self._output_fs is not None:
+                print(f'@{self} Start Uploading Output: {output_id}')
+                if hasattr(self._output_fs, 'open_upload'):
+                    self._stream_output(cursor, output_id, sql, span, key)
+                else:
+                    table = cursor.execute(f'SELECT * FROM ({sql})').fetch_arrow_table()
+                    self._write_output(table, output_id, span, key)
+                print(f'@{self} End Uploading Output: {output_id}')
+            else:
+                cursor.begin()
+                cursor.execute(f'''
+                CREATE OR REPLACE TABLE {output_id} AS ({sql});
+                ''')
+                if key is not None:
+                    TableCheckpoint(cursor).save(output_id, key)
+                cursor.commit()
+                span['rows_out'] = cursor.execute(
+                    f'SELECT COUNT(*) FROM {output_id}').fetchone()[0]
+
+    def _get_input_hashes(self, ids: Set[str],
+                          buffers: Dict[str, io.BytesIO]) -> Dict[str, str]:
+        """
+        Content hashes of the inputs `ids`, taken from their checkpoint markers.
+        Inputs without markers are downloaded into `buffers` and hashed.
+        """
+        ids = [id for id in self.input_ids if id in ids]
+        results = self._input_checkpoint.get_hashes(ids)
+        ids = [id for id in ids if id not in results]
+        for id in ids:
+            if not self._input_storage.check_exists(id):
+                raise ValueError(f'{id} does not exists')
+        for id, buff in self._download_inputs(ids, dict()):
+            buffers[id] = buff
+            results[id] = content_hash(buff)
+        return results
+
+    def _read_input(self, id: str, span: dict,
+                    buff: Optional[io.BytesIO] = None) -> pa.Table:
+        if buff is None:
+            buff = self._input_fs.download_core(id + '.parquet')
+        span['bytes_in'] = buff.getbuffer().nbytes
+        table = pq.read_table(buff)
+        span['rows_out'] = table.num_rows
+        return table
+
+    def _write_output(self, table: pa.Table, output_id: str, span: dict,
+                      key: Optional[str] = None):
+        span['rows_in'] = table.num_rows
+        if isinstance(self._output_storage, EncodedStorage):
+            buff = self._output_storage.encode(table, output_id)
+        else:
+            buff = io.BytesIO()
+            pq.write_table(table, buff)
+        span['bytes_out'] = buff.getbuffer().nbytes
+        if self._output_checkpoint is not None:
+            # invalidate the previous marker before the object is overwritten
+            self._output_checkpoint.drop(output_id)
+            digest = content_hash(buff)
+            self._output_fs.upload_core(buff, output_id + '.parquet')
+            self._output_checkpoint.save(output_id, digest, key=key)
+        else:
+            self._output_fs.upload_core(buff, output_id + '.parquet')
+
+    def _stream_output(self, cursor, output_id: str, sql: str, span: dict,
+                       key: Optional[str] = None):
+        """
+        Write the result of a SQL into an upload of `output_fs`, batch by batch.
+        Sorting of EncodedStorage is done by the SQL instead of the encoder.
+        """
+        query = f'SELECT * FROM ({sql})'
+        if isinstance(self._output_storage, EncodedStorage):
+            column_names = [
+                row[0] for row in cursor.execute(f'DESCRIBE {query}').fetchall()]
+            sort_keys = self._output_storage.get_sort_keys(output_id, column_names)
+            if sort_keys:
+                query += ' ORDER BY ' + ', '.join(f'"{k}"' for k in sort_keys)
+        reader = cursor.execute(query).fetch_record_batch()
+        if self._output_checkpoint is not None:
+            # invalidate the previous marker before the object is overwritten
+            self._output_checkpoint.drop(output_id)
+        with self._output_fs.open_upload(output_id + '.parquet') as sink:
+            if isinstance(self._output_storage, EncodedStorage):
+                span['rows_in'] = self._output_storage.encode_batches(reader, output_id, sink)
+            else:
+                span['rows_in'] = write_batches(
+                    reader, [pq.ParquetWriter(sink, reader.schema)])
+        span['bytes_out'] = sink.tell()
+        if self._output_checkpoint is not None:
+            self._output_checkpoint.save(output_id, sink.sha256, key=key)
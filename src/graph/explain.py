@@ -0,0 +1,194 @@
+"""
+Query plan capture of MetaGraph SQLs
+
+Every node, link and grouping SQL is run with `EXPLAIN ANALYZE`
+on DuckDB and its operator tree is flattened into a report of
+operator timings and cardinalities. Expensive patterns are flagged:
+
+- redundant_distinct_on: a `DISTINCT ON` hash aggregate removing no rows.
+- distinct_on_aggregate: a `DISTINCT ON` hash aggregate dominating the SQL.
+- join_blowup: a join producing more rows than its largest input.
+
+The report is plain JSON with sorted keys so that reports of
+two runs can be compared with `compare_reports` or `diff`.
+"""
+from typing import Any, Dict, List, Optional
+import json
+import re
+from batch_framework.rdb import RDB
+from batch_framework.storage import PyArrowStorage
+from batch_framework.filesystem import FileSystem
+from .metagraph import MetaGraph
+
+__all__ = ['explain_sql', 'explain_metagraph', 'compare_reports', 'save_report', 'load_report']
+
+DISTINCT_ON_PATTERN = re.compile(r'\bDISTINCT\s+ON\b', re.IGNORECASE)
+AGGREGATE_OPERATORS = ['HASH_GROUP_BY', 'PERFECT_HASH_GROUP_BY']
+SKIPPED_OPERATORS = ['EXPLAIN_ANALYZE', 'RESULT_COLLECTOR', 'QUERY']
+
+
+def _is_join(name: str) -> bool:
+    return 'JOIN' in name or name == 'CROSS_PRODUCT'
+
+
+def _flatten(node: Dict[str, Any], depth: int = 0) -> List[Dict[str, Any]]:
+    """
+    Flatten a DuckDB json profile into pre-ordered operators.
+    Keys of both old (`name`, `timing`, `cardinality`) and
+    new (`operator_*`) profile formats are supported.
+    """
+    name = node.get('operator_name', node.get('name'))
+    children = node.get('children', [])
+    if name is None or name in SKIPPED_OPERATORS:
+        results = []
+        for child in children:
+            results.extend(_flatten(child, depth))
+        return results
+    extra_info = node.get('extra_info', {})
+    if not isinstance(extra_info, dict):
+        extra_info = {'info': str(extra_info).strip()}
+    operator = {
+        'depth': depth,
+        'name': name,
+        'ms': round(node.get('operator_timing', node.get('timing', 0.)) * 1000, 3),
+        'rows': node.get('operator_cardinality', node.get('cardinality', 0)),
+        'child_rows': [
+            child.get('operator_cardinality', child.get('cardinality', 0))
+            for child in children],
+        'detail': {
+            k: v for k, v in extra_info.items()
+            if k in ['Table', 'Join Type', 'Conditions', 'Groups', 'Aggregates', 'Estimated Cardinality']}
+    }
+    results = [operator]
+    for child in children:
+        results.extend(_flatten(child, depth + 1))
+    return results
+
+
+def _find_issues(sql: str, operators: List[Dict[str, Any]],
+                 blowup_ratio: float, aggregate_share: float) -> List[str]:
+    issues = []
+    total_ms = max(sum(op['ms'] for op in operators), 1e-6)
+    for op in operators:
+        if op['name'] in AGGREGATE_OPERATORS and DISTINCT_ON_PATTERN.search(sql):
+            input_rows = sum(op['child_rows'])
+            if input_rows == op['rows']:
+                issues.append(
+                    f"redundant_distinct_on: {op['name']} {input_rows} -> {op['rows']} rows")
+            elif op['ms'] / total_ms >= aggregate_share:
+                issues.append(
+                    f"distinct_on_aggregate: {op['name']} {input_rows} -> {op['rows']} rows "
+                    f"({op['ms'] / total_ms:.0%} of time)")
+        elif _is_join(op['name']) and op['child_rows']:
+            largest = max(op['child_rows'])
+            if op['rows'] > largest * blowup_ratio:
+                issues.append(
+                    f"join_blowup: {op['name']} {op['detail'].get('Join Type', '')} "
+                    f"{op['child_rows']} -> {op['rows']} rows")
+    return issues
+
+
+def explain_sql(cursor, sql: str, blowup_ratio: float = 1.0,
+                aggregate_share: float = 0.5) -> Dict[str, Any]:
+    """
+    Run `EXPLAIN ANALYZE` of a SQL.
+
+    Args:
+        - cursor: DuckDB cursor with the input tables registered.
+        - sql: the SELECT statement.
+        - blowup_ratio: flag joins whose output exceeds `blowup_ratio`
+            times the rows of their largest input.
+        - aggregate_share: flag `DISTINCT ON` aggregates taking
+            at least this share of the SQL time.
+    Returns:
+        Dict: total_ms, rows, flagged issues and the flattened operators.
+    """
+    cursor.execute("PRAGMA enable_profiling='json'")
+    plan = cursor.execute(f'EXPLAIN ANALYZE {sql}').fetchall()
+    profile = json.loads(plan[0][1])
+    operators = _flatten(profile)
+    return {
+        'total_ms': round(sum(op['ms'] for op in operators), 3),
+        'rows': operators[0]['rows'] if operators else 0,
+        'issues': _find_issues(sql, operators, blowup_ratio, aggregate_share),
+        'operators': operators
+    }
+
+
+def explain_metagraph(metagraph: MetaGraph, rdb: RDB, input_fs: FileSystem,
+                      blowup_ratio: float = 1.0) -> Dict[str, Dict[str, Any]]:
+    """
+    Explain all SQLs of a MetaGraph on the tabular data of `input_fs`.
+
+    The subgraph tables are materialized after being explained
+    so that the grouping SQLs can be explained on top of them.
+
+    Returns:
+        Dict: keys are `node_sql/{name}`, `link_sql/{name}` and
+            `grouping/{name}`; values are results of `explain_sql`.
+    """
+    storage = PyArrowStorage(input_fs)
+    grouping_meta = metagraph.grouping_meta
+    report = dict()
+    cursor = rdb.get_conn()
+    try:
+        for id in metagraph.input_ids:
+            cursor.register(id, storage.download(id))
+        for kind, sqls in [('node_sql', metagraph.node_sqls), ('link_sql', metagraph.link_sqls)]:
+            for name, sql in sqls.items():
+                report[f'{kind}/{name}'] = explain_sql(cursor, sql, blowup_ratio)
+                cursor.execute("PRAGMA disable_profiling")
+                cursor.execute(f'CREATE OR REPLACE TABLE {name} AS ({sql})')
+        grouping_sqls = {
+            **grouping_meta.node_grouping_sqls, **grouping_meta.link_grouping_sqls}
+        for name, sql in grouping_sqls.items():
+            report[f'grouping/{name}'] = explain_sql(cursor, sql, blowup_ratio)
+    finally:
+        cursor.execute("PRAGMA disable_profiling")
+        cursor.close()
+    return report
+
+
+def compare_reports(old: Dict[str, Dict[str, Any]], new: Dict[str, Dict[str, Any]],
+                    tolerance: float = 0.5, min_ms: float = 10.) -> List[str]:
+    """
+    Compare two reports of `explain_metagraph`.
+
+    Args:
+        - tolerance: allowed relative slowdown of a SQL.
+        - min_ms: ignore slowdowns of SQLs faster than this.
+    Returns:
+        List[str]: regressions: slower SQLs, changed row counts,
+            new issues and changed operator trees.
+    """
+    regressions = []
+    for key, result in new.items():
+        if key not in old:
+            continue
+        base = old[key]
+        if result['total_ms'] > max(base['total_ms'] * (1 + tolerance), min_ms):
+            regressions.append(
+                f"{key}: {base['total_ms']:.1f}ms -> {result['total_ms']:.1f}ms")
+        if result['rows'] != base['rows']:
+            regressions.append(f"{key}: rows {base['rows']} -> {result['rows']}")
+        for issue in result['issues']:
+            if issue.split(':')[0] not in [i.split(':')[0] for i in base['issues']]:
+                regressions.append(f'{key}: new {issue}')
+        plan = [(op['depth'], op['name']) for op in result['operators']]
+        base_plan = [(op['depth'], op['name']) for op in base['operators']]
+        if plan != base_plan:
+            regressions.append(f'{key}: plan changed')
+    return regressions
+
+
+def save_report(report: Dict[str, Dict[str, Any]], path: str):
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+
+
+def load_report(path: str) -> Optional[Dict[str, Dict[str, Any]]]:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
@@ -1,19 +1,34 @@
-from batch_framework.etl import SQLExecutor
+from typing import Optional
 from batch_framework.rdb import RDB
 from batch_framework.filesystem import FileSystem
 from .meta import GroupingMeta
+from ..encoding import ParquetOptions, EncodedStorage
+from ..executor import GraphSQLExecutor
+from ..resources import ResourceConfig
 
 
-class NodeGrouper(SQLExecutor):
+class GrouperBase(GraphSQLExecutor):
+    def __init__(self, meta: GroupingMeta, rdb: RDB,
+                 input_fs: FileSystem, output_fs: FileSystem,
+                 parquet_options: Optional[ParquetOptions] = None,
+                 resource_config: Optional[ResourceConfig] = None,
+                 checkpoint: bool = False):
+        self._meta = meta
+        super().__init__(rdb, input_fs=input_fs, output_fs=output_fs,
+                         resource_config=resource_config, checkpoint=checkpoint)
+        if parquet_options is not None:
+            self._output_storage = EncodedStorage(output_fs, parquet_options)
+
+    def end(self, **kwargs):
+        if isinstance(self._output_storage, EncodedStorage):
+            self._output_storage.print_report()
+
+
+class NodeGrouper(GrouperBase):
     """
     Group nodes of subgraph and save node tables to target folder
     """
 
-    def __init__(self, meta: GroupingMeta, rdb: RDB,
-                 input_fs: FileSystem, output_fs: FileSystem):
-        self._meta = meta
-        super().__init__(rdb, input_fs=input_fs, output_fs=output_fs)
-
     @property
     def input_ids(self):
         return self._meta.input_nodes
@@ -26,16 +41,11 @@ class NodeGrouper(SQLExecutor):
         return self._meta.node_grouping_sqls
 
 
-class LinkGrouper(SQLExecutor):
+class LinkGrouper(GrouperBase):
     """
     Group links of subgraph and save link tables to target folder
     """
 
-    def __init__(self, meta: GroupingMeta, rdb: RDB,
-                 input_fs: FileSystem, output_fs: FileSystem):
-        self._meta = meta
-        super().__init__(rdb, input_fs=input_fs, output_fs=output_fs)
-
     @property
     def input_ids(self):
         return self._meta.input_links
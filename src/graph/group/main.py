@@ -1,24 +1,37 @@
+from typing import Optional
 from batch_framework.filesystem import FileSystem
 from batch_framework.etl import ETLGroup
 from batch_framework.rdb import RDB
 from .groupers import NodeGrouper, LinkGrouper
 from .meta import GroupingMeta
+from ..encoding import ParquetOptions
+from ..profiling import ProfiledETL
+from ..resources import ResourceConfig
 
 
-class GraphGrouper(ETLGroup):
+class GraphGrouper(ProfiledETL, ETLGroup):
     def __init__(self, meta: GroupingMeta, rdb: RDB, input_fs: FileSystem,
-                 output_fs: FileSystem):
+                 output_fs: FileSystem,
+                 parquet_options: Optional[ParquetOptions] = None,
+                 resource_config: Optional[ResourceConfig] = None,
+                 checkpoint: bool = False):
         node_grouper = NodeGrouper(
             meta=meta,
             rdb=rdb,
             input_fs=input_fs,
-            output_fs=output_fs
+            output_fs=output_fs,
+            parquet_options=parquet_options,
+            resource_config=resource_config,
+            checkpoint=checkpoint
         )
         link_grouper = LinkGrouper(
             meta=meta,
             rdb=rdb,
             input_fs=input_fs,
-            output_fs=output_fs
+            output_fs=output_fs,
+            parquet_options=parquet_options,
+            resource_config=resource_config,
+            checkpoint=checkpoint
         )
         self._meta = meta
         self._inputs = node_grouper.input_ids + link_grouper.input_ids
@@ -111,14 +111,14 @@ class GroupingMeta:
         result = []
         for _, nodes in self.node_grouping.items():
             result.extend(nodes)
-        return list(set(result))
+        return list(dict.fromkeys(result))
 
     @property
     def input_links(self) -> List[str]:
         result = []
         for _, links in self.link_grouping.items():
             result.extend(links)
-        return list(set(result))
+        return list(dict.fromkeys(result))
 
     @property
     def output_nodes(self) -> List[str]:
@@ -1,28 +1,64 @@
-from typing import List
+from typing import Dict, List, Optional
 from batch_framework.rdb import DuckDBBackend
 from batch_framework.filesystem import FileSystem
 from batch_framework.etl import ETLGroup
 from batch_framework.rdb import RDB
+from batch_framework.storage import PandasStorage
 from .subgraph import SubgraphExtractor
 from .group import GraphGrouper
+from .resolution import EntityResolution
+from .csr import CSRExporter
+from .dependency import DependencyClosure
+from .analytics import GraphAnalytics
+from .snapshot import GraphSnapshot
 from .metagraph import MetaGraph
+from .encoding import ParquetOptions
+from .profiling import ProfiledETL
+from .resources import ResourceConfig
 
 
-class GraphDataPlatform(ETLGroup):
+class GraphDataPlatform(ProfiledETL, ETLGroup):
     """
     Data Flow:
         1. canonicalize data
         2. extract subgraphs
-        3. do entity resolution
+        3. (optional) do entity resolution of the node groups of `resolution`
         4. group subgraph
+        5. (optional) export CSR adjacency arrays of the final graph
+        6. (optional) precompute transitive dependencies of `dependency_link`
+        7. (optional) compute degree, component and PageRank metrics
+            (PageRank and components over `analytics_links`)
+        8. (optional) record the final graph as a snapshot on `snapshot_fs`
+
+    `resolution` lists the node groups (e.g., ['person', 'domain'])
+    whose subgraph nodes are resolved into entities before grouping.
+
+    `resources` maps a SQL stage (`subgraph` or `grouping`)
+    to the ResourceConfig bounding DuckDB while running it.
+
+    If `checkpoint` is True, the SQL stages write checkpoint markers
+    of their outputs and skip completed outputs when rerun.
     """
 
     def __init__(self, metagraph: MetaGraph,
                  canon_fs: FileSystem,
                  subgraph_fs: FileSystem,
                  output_fs: FileSystem,
-                 rdb: RDB = DuckDBBackend()
+                 rdb: RDB = DuckDBBackend(),
+                 parquet_options: Optional[ParquetOptions] = None,
+                 csr_fs: Optional[FileSystem] = None,
+                 dependency_link: Optional[str] = None,
+                 analytics_links: Optional[List[str]] = None,
+                 resources: Optional[Dict[str, ResourceConfig]] = None,
+                 checkpoint: bool = False,
+                 resolution: Optional[List[str]] = None,
+                 snapshot_fs: Optional[FileSystem] = None
                  ):
+        if resources is None:
+            resources = dict()
+        for stage in resources:
+            assert stage in ['subgraph', 'grouping'], f'resources of unknown stage `{stage}`'
+
         # Connecting MetaGraph with Entity Resolution Meta
         grouping_meta = metagraph.grouping_meta
         # Basic ETL components
@@ -31,19 +67,69 @@ class GraphDataPlatform(ETLGroup):
             metagraph=metagraph,
             rdb=rdb,
             input_fs=canon_fs,
-            output_fs=subgraph_fs
+            output_fs=subgraph_fs,
+            resource_config=resources.get('subgraph'),
+            checkpoint=checkpoint
         )
         args = [subgraph_extractor]
-        # 2. Group Subgraphs into Final Graph
+        # 2. Resolve Entities of Subgraph Nodes
+        if resolution:
+            args.append(EntityResolution(
+                groups=resolution,
+                grouping_meta=grouping_meta,
+                subgraphs=metagraph.subgraphs,
+                fs=subgraph_fs
+            ))
+        # 3. Group Subgraphs into Final Graph
         self._grouper = GraphGrouper(
             meta=grouping_meta,
             rdb=rdb,
             input_fs=subgraph_fs,
-            output_fs=output_fs
+            output_fs=output_fs,
+            parquet_options=parquet_options,
+            resource_config=resources.get('grouping'),
+            checkpoint=checkpoint
         )
         args.append(self._grouper)
         self._input_ids = subgraph_extractor.input_ids
         self._output_ids = self._grouper.output_ids
+        # 4. Export Final Graph as CSR Adjacency Arrays
+        if csr_fs is not None:
+            csr_exporter = CSRExporter(
+                triplets=metagraph.triplets,
+                input_fs=output_fs,
+                output_fs=csr_fs
+            )
+            args.append(csr_exporter)
+            self._output_ids = self._output_ids + csr_exporter.output_ids
+        # 5. Precompute Transitive Dependencies as Node Attributes
+        if dependency_link is not None:
+            src_node, dest_node = metagraph.triplets[dependency_link]
+            assert src_node == dest_node, f'dependency_link `{dependency_link}` should link nodes of the same type'
+            dependency_closure = DependencyClosure(
+                dependency_link, src_node, PandasStorage(output_fs))
+            args.append(dependency_closure)
+            self._output_ids = self._output_ids + dependency_closure.output_ids
+        # 6. Compute Graph Metrics as Node Attributes
+        if analytics_links is not None:
+            graph_analytics = GraphAnalytics(
+                triplets=metagraph.triplets,
+                rank_links=analytics_links,
+                input_fs=output_fs,
+                output_fs=output_fs
+            )
+            args.append(graph_analytics)
+            self._output_ids = self._output_ids + graph_analytics.output_ids
+        # 7. Record Final Graph as a Snapshot
+        if snapshot_fs is not None:
+            graph_snapshot = GraphSnapshot(
+                tables=[f'node_{n}' for n in metagraph.node_grouping] + [
+                    f'link_{l}' for l in metagraph.triplets],
+                input_fs=output_fs,
+                snapshot_fs=snapshot_fs
+            )
+            args.append(graph_snapshot)
+            self._output_ids = self._output_ids + graph_snapshot.output_ids
         self._rdb = rdb
         super().__init__(*args)
 
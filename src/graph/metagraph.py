@@ -1,6 +1,9 @@
-import copy
-from typing import Dict, Tuple, List
+from types import MappingProxyType
+from typing import Any, Dict, Tuple, List, Mapping, Union
+import hashlib
+import json
 from .group import GroupingMeta
+from .spec import compile_spec
 
 
 class MetaGraph:
@@ -22,6 +25,11 @@ class MetaGraph:
         - input_ids: name of tables from which the subgraph is extracted.
         - node_sqls: define how node tables are extracted from the tables of `input_ids`
         - link_sqls: define how link tables are extracted from the tables of `input_ids`
+
+    A MetaGraph is immutable. Its derived properties are computed once
+    at construction and ordered by definition: subgraph nodes by their
+    first appearance in `subgraphs`, and nodes / links left out of
+    `node_grouping` / `link_grouping` after the grouped ones.
     """
 
     def __init__(self,
@@ -34,34 +42,87 @@ class MetaGraph:
                  node_grouping_sqls: Dict[str, str] = dict(),
                  link_grouping_sqls: Dict[str, str] = dict(),
                  ):
-        self._subgraphs = subgraphs
-        self._node_grouping = node_grouping
-        self.__check_subgraph_nodes()
-        self._link_grouping = link_grouping
-        self.__check_subgraph_links()
-        self.input_ids = input_ids
-        self.node_sqls = node_sqls
+        self._subgraphs = MappingProxyType(
+            {link: tuple(nodes) for link, nodes in subgraphs.items()})
+        self._nodes = tuple(dict.fromkeys(
+            node for nodes in self._subgraphs.values() for node in nodes))
+        self._links = tuple(self._subgraphs.keys())
+        self.__check_subgraph_nodes(node_grouping)
+        self.__check_subgraph_links(link_grouping)
+        self._input_ids = tuple(input_ids)
+        self._node_sqls = MappingProxyType(dict(node_sqls))
         self.__check_node_sqls()
-        self.link_sqls = link_sqls
+        self._link_sqls = MappingProxyType(dict(link_sqls))
         self.__check_link_sqls()
-        self.__node_grouping_sqls = node_grouping_sqls
-        self.__link_grouping_sqls = link_grouping_sqls
+        self.__node_grouping_sqls = MappingProxyType(dict(node_grouping_sqls))
+        self.__link_grouping_sqls = MappingProxyType(dict(link_grouping_sqls))
+        self._node_grouping = MetaGraph._complete_grouping(node_grouping, self._nodes)
+        self._link_grouping = MetaGraph._complete_grouping(link_grouping, self._links)
+        self._node_parents = MetaGraph._get_parents(self._node_grouping)
+        self._link_parents = MetaGraph._get_parents(self._link_grouping)
+        self._triplets = MappingProxyType({
+            link: (
+                self._node_parents[self._subgraphs[link_children[0]][0]],
+                self._node_parents[self._subgraphs[link_children[0]][1]]
+            ) for link, link_children in self._link_grouping.items()
+        })
+        self._spec_hash = hashlib.sha256(json.dumps([
+            self._subgraphs, self._node_grouping, self._link_grouping,
+            self._input_ids, self._node_sqls, self._link_sqls,
+            self.__node_grouping_sqls, self.__link_grouping_sqls
+        ], default=dict).encode()).hexdigest()
+
+    @classmethod
+    def from_spec(cls, spec: Union[str, Dict[str, Any]]) -> 'MetaGraph':
+        """
+        Args:
+            - spec: declarative spec (or path of its YAML file)
+                to be compiled by `compile_spec`.
+        """
+        return cls(**compile_spec(spec))
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        return (MetaGraph, (
+            dict(self._subgraphs),
+            {group: list(nodes) for group, nodes in self._node_grouping.items()},
+            {group: list(links) for group, links in self._link_grouping.items()},
+            list(self._input_ids),
+            dict(self._node_sqls),
+            dict(self._link_sqls),
+            dict(self.__node_grouping_sqls),
+            dict(self.__link_grouping_sqls)
+        ))
 
-    @property
-    def triplets(self) -> Dict[str, Tuple[str, str]]:
+    @staticmethod
+    def _complete_grouping(grouping: Dict[str, List[str]],
+                           children: Tuple[str, ...]) -> Mapping[str, Tuple[str, ...]]:
+        """
+        Add a 1-1 group for every child not in `grouping`
+        """
+        result = {group: tuple(group_children) for group, group_children in grouping.items()}
+        exist_children = set(child for group_children in result.values() for child in group_children)
+        for child in children:
+            if child not in exist_children:
+                result[child] = (child,)
+        return MappingProxyType(result)
+
+    @staticmethod
+    def _get_parents(grouping: Mapping[str, Tuple[str, ...]]) -> Mapping[str, str]:
         results = dict()
-        node_grouping = copy.deepcopy(self.node_grouping)
-        link_grouping = copy.deepcopy(self.link_grouping)
-        for link, link_children in link_grouping.items():
-            link_child = link_children[0]
-            src_child_node = self._subgraphs[link_child][0]
-            dest_child_node = self._subgraphs[link_child][1]
-            src_node = MetaGraph.get_parent_item_by_child(
-                node_grouping, src_child_node)
-            dest_node = MetaGraph.get_parent_item_by_child(
-                node_grouping, dest_child_node)
-            results[link] = (src_node, dest_node)
-        return results
+        for group, children in grouping.items():
+            for child in children:
+                results.setdefault(child, group)
+        return MappingProxyType(results)
+
+    @property
+    def triplets(self) -> Mapping[str, Tuple[str, str]]:
+        return self._triplets
 
     @staticmethod
     def get_parent_item_by_child(grouping, target_child: str):
@@ -72,19 +133,54 @@ class MetaGraph:
         raise ValueError(
             f'cannot find target_child {target_child} in grouping: {grouping}')
 
+    def get_parent_node(self, node: str) -> str:
+        """
+        Grouped node of a subgraph node
+        """
+        if node not in self._node_parents:
+            raise ValueError(f'cannot find node {node} in node_grouping: {self._node_grouping}')
+        return self._node_parents[node]
+
+    def get_parent_link(self, link: str) -> str:
+        """
+        Grouped link of a subgraph link
+        """
+        if link not in self._link_parents:
+            raise ValueError(f'cannot find link {link} in link_grouping: {self._link_grouping}')
+        return self._link_parents[link]
+
+    @property
+    def spec_hash(self) -> str:
+        """
+        Hash of the whole specification, e.g., for cache keys
+        """
+        return self._spec_hash
+
     @property
-    def subgraphs(self):
+    def subgraphs(self) -> Mapping[str, Tuple[str, str]]:
         return self._subgraphs
 
-    def __check_subgraph_nodes(self):
+    @property
+    def input_ids(self) -> List[str]:
+        return list(self._input_ids)
+
+    @property
+    def node_sqls(self) -> Mapping[str, str]:
+        return self._node_sqls
+
+    @property
+    def link_sqls(self) -> Mapping[str, str]:
+        return self._link_sqls
+
+    def __check_subgraph_nodes(self, node_grouping: Dict[str, List[str]]):
         subgraph_nodes = self.nodes
-        for _, nodes in self._node_grouping.items():
+        for _, nodes in node_grouping.items():
             for node in nodes:
                 assert node in subgraph_nodes, f'node `{node}` is not defined in nodes of subgraphs ({subgraph_nodes})'
 
-    def __check_subgraph_links(self):
+    def __check_subgraph_links(self, link_grouping: Dict[str, List[str]]):
         subgraph_links = self.links
-        for _, links in self._link_grouping.items():
+        for _, links in link_grouping.items():
             for link in links:
                 assert link in subgraph_links, f'link `{link}` is not defined in links of subgraphs ({subgraph_links})'
 
@@ -104,44 +200,30 @@ class MetaGraph:
 
     @property
     def nodes(self) -> List[str]:
-        results = []
-        for from_node, to_node in self._subgraphs.values():
-            results.append(from_node)
-            results.append(to_node)
-        return list(set(results))
+        return list(self._nodes)
 
     @property
     def links(self) -> List[str]:
-        return list(set([link for link in self._subgraphs.keys()]))
+        return list(self._links)
 
     @property
     def grouping_meta(self) -> GroupingMeta:
+        """
+        A new GroupingMeta of every access, since it can be altered
+        (e.g., by entity resolution).
+        """
         return GroupingMeta(
-            self.node_grouping,
-            self.link_grouping,
-            self.__node_grouping_sqls,
-            self.__link_grouping_sqls,
-            triplets=self.triplets
+            {group: list(nodes) for group, nodes in self._node_grouping.items()},
+            {group: list(links) for group, links in self._link_grouping.items()},
+            dict(self.__node_grouping_sqls),
+            dict(self.__link_grouping_sqls),
+            triplets=dict(self._triplets)
         )
 
     @property
-    def node_grouping(self) -> Dict[str, List[str]]:
-        result = copy.copy(self._node_grouping)
-        exist_subgraph_nodes = []
-        for nodes in self._node_grouping.values():
-            exist_subgraph_nodes.extend(nodes)
-        for node in self.nodes:
-            if node not in exist_subgraph_nodes:
-                result.update({node: [node]})
-        return result
+    def node_grouping(self) -> Mapping[str, Tuple[str, ...]]:
+        return self._node_grouping
 
     @property
-    def link_grouping(self) -> Dict[str, List[str]]:
-        result = copy.copy(self._link_grouping)
-        exist_subgraph_links = []
-        for links in self._link_grouping.values():
-            exist_subgraph_links.extend(links)
-        for link in self.links:
-            if link not in exist_subgraph_links:
-                result.update({link: [link]})
-        return result
+    def link_grouping(self) -> Mapping[str, Tuple[str, ...]]:
+        return self._link_grouping
@@ -0,0 +1,212 @@
+"""
+Structured instrumentation of ETL runs
+
+Spans record wall time, cpu time, memory, rows and bytes of
+ETL units, SQLs and objects. They are emitted as JSON lines
+(`*.jsonl`) or as a Chrome trace event file (`*.json`) viewable in
+chrome://tracing or https://ui.perfetto.dev.
+
+`cpu_ms` is the cpu time of the thread running the span. `process_cpu_ms` is
+the cpu time of the whole process, including native worker threads (e.g.,
+DuckDB, Arrow) but also other spans running concurrently.
+
+Enable by setting the `PYPI_GRAPH_PROFILE` environment variable
+to the output path, or by calling `profiler.enable(path)`.
+"""
+from typing import Any, Dict, Iterator, List, Optional
+import atexit
+import contextlib
+import json
+import os
+import resource
+import threading
+import time
+import pandas as pd
+import pyarrow as pa
+from batch_framework.storage import Storage
+from .encoding import read_columns
+from .checkpoint import Checkpoint, table_hash
+
+__all__ = ['Profiler', 'profiler', 'ProfiledETL', 'ProfiledObjProcessor']
+
+
+def _current_rss() -> int:
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return 0
+
+
+def _max_rss() -> int:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class Profiler:
+    """
+    Collect spans of an ETL run
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self._lock = threading.Lock()
+        self._path = None
+        self._events: List[Dict[str, Any]] = []
+        if path:
+            self.enable(path)
+
+    @property
+    def enabled(self) -> bool:
+        return self._path is not None
+
+    def enable(self, path: str):
+        self._path = path
+        if self._is_trace:
+            atexit.register(self.dump)
+
+    @property
+    def _is_trace(self) -> bool:
+        return self._path is not None and not self._path.endswith('.jsonl')
+
+    @contextlib.contextmanager
+    def span(self, name: str, category: str, **args) -> Iterator[Dict[str, Any]]:
+        """
+        Record a span around the `with` block.
+
+        Yields:
+            Dict: span arguments; the caller may add counters
+                such as rows_in, rows_out, bytes_in and bytes_out.
+        """
+        if not self.enabled:
+            yield args
+            return
+        start = time.time()
+        wall_start = time.perf_counter()
+        cpu_start = time.thread_time()
+        process_cpu_start = time.process_time()
+        rss_start = _current_rss()
+        try:
+            yield args
+        finally:
+            wall = time.perf_counter() - wall_start
+            self._record({
+                'name': name,
+                'cat': category,
+                'ts': start,
+                'wall_ms': round(wall * 1000, 3),
+                'cpu_ms': round((time.thread_time() - cpu_start) * 1000, 3),
+                'process_cpu_ms': round((time.process_time() - process_cpu_start) * 1000, 3),
+                'rss_start_mb': round(rss_start / 2**20, 1),
+                'rss_end_mb': round(_current_rss() / 2**20, 1),
+                'max_rss_mb': round(_max_rss() / 2**20, 1),
+                'pid': os.getpid(),
+                'tid': threading.get_ident(),
+                'args': args
+            })
+
+    def _record(self, event: Dict[str, Any]):
+        with self._lock:
+            if self._is_trace:
+                self._events.append(event)
+            else:
+                with open(self._path, 'a') as f:
+                    f.write(json.dumps(event, default=str) + '\n')
+
+    def dump(self):
+        """
+        Write collected spans as Chrome trace events
+        """
+        if not self._is_trace:
+            return
+        with self._lock:
+            trace_events = [{
+                'name': e['name'],
+                'cat': e['cat'],
+                'ph': 'X',
+                'ts': int(e['ts'] * 1e6),
+                'dur': int(e['wall_ms'] * 1000),
+                'pid': e['pid'],
+                'tid': e['tid'],
+                'args': {
+                    **e['args'],
+                    **{k: e[k] for k in ['cpu_ms', 'process_cpu_ms', 'rss_start_mb', 'rss_end_mb', 'max_rss_mb']}
+                }
+            } for e in self._events]
+            with open(self._path, 'w') as f:
+                json.dump({'traceEvents': trace_events}, f, default=str)
+
+
+profiler = Profiler(os.environ.get('PYPI_GRAPH_PROFILE'))
+
+
+class ProfiledETL:
+    """
+    Mixin recording a span around `execute` of an ETL unit or group
+    """
+
+    def execute(self, **kwargs):
+        with profiler.span(type(self).__name__, 'etl', etl=str(self)):
+            super().execute(**kwargs)
+
+
+class ProfiledObjProcessor(ProfiledETL):
+    """
+    Mixin of ObjProcessor recording a span of every extracted
+    and loaded object together with its row count.
+
+    Inputs listed in `input_columns` are read with column projection.
+    """
+
+    @property
+    def input_columns(self) -> Dict[str, List[str]]:
+        """
+        Columns to be read of the inputs. Inputs not listed are read whole.
+        """
+        return dict()
+
+    def _extract_inputs(self) -> List[object]:
+        return [self._extract_input(id) for id in self.input_ids]
+
+    def _extract_input(self, id: str, storage: Optional[Storage] = None) -> object:
+        """
+        Args:
+            - id: id of the input.
+            - storage: storage of the input, if not `input_storage`.
+        """
+        if storage is None:
+            storage = self._input_storage
+        input_columns = self.input_columns
+        with profiler.span(f'read:{id}', 'object') as span:
+            print(f'@{self} Start Extracting Input: {id}')
+            if id in input_columns:
+                table = read_columns(storage, id, input_columns[id])
+            else:
+                table = storage.download(id)
+            print(f'@{self} End Extracting Input: {id}')
+            span['rows_out'] = _count_rows(table)
+        return table
+
+    def _load(self, output_tables: List[object]):
+        """
+        Upload the outputs. Table outputs get checkpoint markers
+        holding their `table_hash` (see `GraphSQLExecutor`).
+        """
+        for id, table in zip(self.output_ids, output_tables):
+            with profiler.span(f'write:{id}', 'object') as span:
+                span['rows_in'] = _count_rows(table)
+                print(f'@{self} Start Loading Output: {id}')
+                if isinstance(table, (pd.DataFrame, pa.Table)):
+                    checkpoint = Checkpoint(self._output_storage._backend)
+                    # invalidate the previous marker before the object is overwritten
+                    checkpoint.drop(id)
+                    self._output_storage.upload(table, id)
+                    checkpoint.save(id, table_hash(table))
+                else:
+                    self._output_storage.upload(table, id)
+                print(f'@{self} End Loading Output: {id}')
+
+
+def _count_rows(obj: object) -> Optional[int]:
+    try:
+        return len(obj)
+    except TypeError:
+        return None
@@ -0,0 +1,4 @@
+from .main import EntityResolution, EntityResolver
+from .keys import RESOLUTION_KEYS
+
+__all__ = ['EntityResolution', 'EntityResolver', 'RESOLUTION_KEYS']
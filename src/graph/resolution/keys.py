@@ -0,0 +1,134 @@
+"""
+Blocking keys and clustering of entity resolution
+
+A blocking key is an integer code of a normalized value of every record
+(-1 if the record has no key). Values are normalized once per distinct value.
+Records sharing a key fall into the same block and are linked to the
+first record of the block, so that the number of links is linear in the
+number of records (no pairwise comparisons). Clusters are the connected
+components of the links.
+
+Keys of records having several values (e.g., the packages a person is linked to)
+are given as a pair of arrays: the records and their keys, one element per value.
+"""
+from typing import Callable, Dict, List, Tuple, Union
+import numpy as np
+import pandas as pd
+from ..analytics.metrics import weakly_connected_components
+
+__all__ = ['normalize_name', 'normalize_email', 'normalize_domain',
+           'person_keys', 'domain_keys', 'RESOLUTION_KEYS', 'BlockingKey', 'cluster']
+
+# key of every record, or (records, keys) of records with several keys
+BlockingKey = Union[np.ndarray, Tuple[np.ndarray, np.ndarray]]
+
+
+def _empty_to_na(values: pd.Series) -> pd.Series:
+    return values.where(values != '')
+
+
+def normalize_name(names: pd.Series) -> pd.Series:
+    """
+    Lowercased ascii names with punctuation removed and whitespace collapsed
+    """
+    names = names.astype('string').str.normalize('NFKD').str.encode(
+        'ascii', errors='ignore').str.decode('ascii').str.lower()
+    names = names.str.replace(r'[^a-z0-9]+', ' ', regex=True).str.strip()
+    return _empty_to_na(names)
+
+
+def normalize_email(emails: pd.Series) -> pd.Series:
+    """
+    Lowercased emails without `+tag` of the local part
+    """
+    emails = emails.astype('string').str.strip().str.lower()
+    emails = emails.str.replace(r'\+[^@]*@', '@', regex=True)
+    return _empty_to_na(emails.where(emails.str.contains('@', regex=False)))
+
+
+def normalize_domain(domains: pd.Series) -> pd.Series:
+    domains = domains.astype('string').str.strip().str.lower()
+    domains = domains.str.replace(r'^www\.', '', regex=True).str.rstrip('.')
+    return _empty_to_na(domains)
+
+
+def _encode(values: pd.Series,
+            normalize: Callable[[pd.Series], pd.Series]) -> Tuple[np.ndarray, pd.Series]:
+    """
+    Returns:
+        Tuple[np.ndarray, pd.Series]: code of the normalized value of every
+            record (-1 if NA) and the normalized values of the codes.
+    """
+    codes, uniques = pd.factorize(values)
+    normalized_codes, normalized = pd.factorize(normalize(pd.Series(uniques, dtype=object)))
+    return np.where(codes >= 0, normalized_codes[codes], -1), pd.Series(normalized, dtype=object)
+
+
+def _combine(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """
+    Key of the pair of keys, -1 if any of them is -1
+    """
+    return np.where((a >= 0) & (b >= 0), a * (b.max(initial=-1) + 1) + b, -1)
+
+
+def person_keys(df: pd.DataFrame, neighbors: pd.DataFrame) -> List[BlockingKey]:
+    """
+    Persons are the same if they have
+        - the same email, or
+        - the same name and email local part (e.g., john@gmail.com, John@example.com), or
+        - the same name and a common neighbor, e.g., the author and the maintainer
+            of a package. Persons sharing only a name are not merged across packages.
+
+    Args:
+        - df: person records with `name` and `email`.
+        - neighbors: nodes linked to the records (see `EntityResolver`).
+    """
+    name, _ = _encode(df['name'], normalize_name)
+    email, emails = _encode(df['email'], normalize_email)
+    local_part, _ = pd.factorize(emails.str.split('@').str[0])
+    local_part = np.where(email >= 0, local_part[email], -1)
+    records = neighbors['record'].to_numpy()
+    neighbor = neighbors.groupby(['node', 'neighbor_id'], sort=False).ngroup().to_numpy()
+    return [
+        email,
+        _combine(name, local_part),
+        (records, _combine(name[records], neighbor))
+    ]
+
+
+def domain_keys(df: pd.DataFrame, neighbors: pd.DataFrame) -> List[BlockingKey]:
+    domain, _ = _encode(df['domain'], normalize_domain)
+    return [domain]
+
+
+# blocking keys of the node groups that can be resolved
+RESOLUTION_KEYS: Dict[str, Callable[[pd.DataFrame, pd.DataFrame], List[BlockingKey]]] = {
+    'person': person_keys,
+    'domain': domain_keys
+}
+
+
+def cluster(keys: List[BlockingKey], n: int) -> np.ndarray:
+    """
+    Args:
+        - keys: blocking keys of `n` records.
+
+    Returns:
+        np.ndarray: cluster label of every record.
+    """
+    src = [np.arange(n)]
+    dst = [np.arange(n)]
+    for key in keys:
+        if isinstance(key, tuple):
+            records, key = key
+        else:
+            records = np.arange(n)
+        records = records[key >= 0]
+        key = key[key >= 0]
+        # first record of every block
+        _, first, block = np.unique(key, return_index=True, return_inverse=True)
+        src.append(records)
+        dst.append(records[first[block]])
+    labels, _ = weakly_connected_components(
+        np.concatenate(src), np.concatenate(dst), n)
+    return labels
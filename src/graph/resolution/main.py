@@ -0,0 +1,151 @@
+from typing import Callable, Dict, List, Tuple
+import numpy as np
+import pandas as pd
+from batch_framework.etl import ETLGroup, ObjProcessor
+from batch_framework.storage import PandasStorage
+from batch_framework.filesystem import FileSystem
+from .keys import RESOLUTION_KEYS, BlockingKey, cluster
+from ..group.meta import GroupingMeta
+from ..profiling import ProfiledObjProcessor
+
+
+class EntityResolver(ProfiledObjProcessor, ObjProcessor):
+    """
+    Resolve the subgraph nodes of a node group (e.g., author and maintainer
+    of person) into entities clustered by the blocking keys of `get_keys`.
+
+    Besides the nodes, `get_keys` gets their neighbors: the nodes outside
+    of the group linked to them (`record`: position of the linked node,
+    `node`: subgraph node of the neighbor, `neighbor_id`: its node_id).
+
+    Every entity is identified by the smallest node_id of its nodes
+    (`canonical_id`). The outputs are
+        - {node}_resolved: nodes with their canonical_id as node_id, one row per entity.
+        - {link}_resolved: links with the canonical_ids as from_id / to_id.
+        - {group}_resolution: `node_id` -> `canonical_id` of every node.
+    """
+
+    def __init__(self, group: str, nodes: List[str], subgraphs: Dict[str, Tuple[str, str]],
+                 get_keys: Callable[[pd.DataFrame, pd.DataFrame], List[BlockingKey]], storage: PandasStorage):
+        self._group = group
+        self._nodes = nodes
+        self._links = [
+            link for link, (src_node, dest_node) in subgraphs.items()
+            if src_node in nodes or dest_node in nodes]
+        self._ends = {link: subgraphs[link] for link in self._links}
+        self._get_keys = get_keys
+        super().__init__(storage, storage)
+
+    @property
+    def nodes(self) -> List[str]:
+        return self._nodes
+
+    @property
+    def links(self) -> List[str]:
+        return self._links
+
+    @property
+    def input_ids(self):
+        return self._nodes + self._links
+
+    @property
+    def output_ids(self):
+        return [f'{n}_resolved' for n in self._nodes] + [
+            f'{l}_resolved' for l in self._links] + [f'{self._group}_resolution']
+
+    def transform(self, inputs: List[pd.DataFrame]) -> List[pd.DataFrame]:
+        node_dfs = inputs[:len(self._nodes)]
+        link_dfs = inputs[len(self._nodes):]
+        records = pd.concat(node_dfs, ignore_index=True).drop_duplicates(
+            'node_id').reset_index(drop=True)
+        neighbors = self._get_neighbors(records.node_id, link_dfs)
+        labels = cluster(self._get_keys(records, neighbors), len(records))
+        canonical_ids = records.node_id.groupby(labels).transform('min')
+        mapping = pd.Series(canonical_ids.to_numpy(), index=records.node_id.to_numpy())
+        print('entity resolution', self._group, '- #Nodes:', len(records),
+              '#Entities:', canonical_ids.nunique())
+        results = []
+        for node_df in node_dfs:
+            canonical = node_df.node_id.map(mapping)
+            # keep the attributes of the canonical node if available
+            node_df = node_df.assign(node_id=canonical).iloc[
+                (node_df.node_id != canonical).argsort(kind='stable')]
+            results.append(node_df.drop_duplicates('node_id').reset_index(drop=True))
+        for link, link_df in zip(self._links, link_dfs):
+            src_node, dest_node = self._ends[link]
+            if src_node in self._nodes:
+                link_df = link_df.assign(from_id=link_df.from_id.map(mapping))
+            if dest_node in self._nodes:
+                link_df = link_df.assign(to_id=link_df.to_id.map(mapping))
+            results.append(link_df.drop_duplicates(['from_id', 'to_id']).reset_index(drop=True))
+        results.append(pd.DataFrame({
+            'node_id': records.node_id, 'canonical_id': canonical_ids}))
+        return results
+
+    def _get_neighbors(self, node_ids: pd.Series, link_dfs: List[pd.DataFrame]) -> pd.DataFrame:
+        """
+        Nodes outside of the group linked to `node_ids`
+        """
+        index = pd.Index(node_ids)
+        neighbors = []
+        for link, link_df in zip(self._links, link_dfs):
+            src_node, dest_node = self._ends[link]
+            if src_node in self._nodes and dest_node in self._nodes:
+                continue
+            if src_node in self._nodes:
+                ids, node, neighbor_ids = link_df.from_id, dest_node, link_df.to_id
+            else:
+                ids, node, neighbor_ids = link_df.to_id, src_node, link_df.from_id
+            neighbors.append(pd.DataFrame({
+                'record': index.get_indexer(ids),
+                'node': node,
+                'neighbor_id': neighbor_ids.to_numpy()
+            }))
+        if not neighbors:
+            return pd.DataFrame({
+                'record': np.empty(0, dtype=np.int64), 'node': [], 'neighbor_id': []})
+        neighbors = pd.concat(neighbors, ignore_index=True)
+        return neighbors[neighbors.record >= 0].reset_index(drop=True)
+
+
+class EntityResolution(ETLGroup):
+    """
+    Resolve the subgraph nodes of node groups (`groups`, e.g., ['person'])
+    between subgraph extraction and grouping, and alter `grouping_meta`
+    to group the resolved nodes and links instead.
+    """
+
+    def __init__(self, groups: List[str], grouping_meta: GroupingMeta,
+                 subgraphs: Dict[str, Tuple[str, str]], fs: FileSystem):
+        storage = PandasStorage(fs)
+        args = []
+        for group in groups:
+            assert group in RESOLUTION_KEYS, f'no blocking keys to resolve `{group}`'
+            args.append(EntityResolver(
+                group, list(grouping_meta.node_grouping[group]), subgraphs,
+                RESOLUTION_KEYS[group], storage))
+        self._inputs = []
+        self._outputs = []
+        for etl_unit in args:
+            for id in etl_unit.input_ids:
+                assert id not in self._inputs, f'`{id}` is resolved by more than one group'
+                self._inputs.append(id)
+            self._outputs.extend(etl_unit.output_ids)
+        for etl_unit in args:
+            for node in etl_unit.nodes:
+                grouping_meta.alter_input_node(node, f'{node}_resolved')
+            for link in etl_unit.links:
+                grouping_meta.alter_input_link(link, f'{link}_resolved')
+        super().__init__(*args)
+
+    @property
+    def input_ids(self):
+        return self._inputs
+
+    @property
+    def external_input_ids(self) -> List[str]:
+        return self.input_ids
+
+    @property
+    def output_ids(self):
+        return self._outputs
@@ -0,0 +1,64 @@
+"""
+Resource governance of DuckDB execution
+"""
+from typing import Dict, Optional
+import os
+
+__all__ = ['ResourceConfig']
+
+
+class ResourceConfig:
+    """
+    Data Class describing resources DuckDB may use while running
+    the SQLs of a stage. Settings left as None keep DuckDB defaults.
+
+    Args:
+        - memory_limit: maximum memory of the database (e.g., '4GB').
+            Operators exceeding it spill to `temp_directory`.
+        - temp_directory: folder of spilled intermediates.
+        - max_temp_directory_size: maximum size of `temp_directory` (e.g., '20GB').
+        - threads: number of threads of the database.
+        - preserve_insertion_order: set to False where the order of rows
+            does not matter (no `ORDER BY`), so that operators
+            can stream and spill without buffering to keep order.
+
+    NOTE: the settings are global to a DuckDB database, so stages sharing
+        one `RDB` should not run concurrently with different configs.
+    """
+
+    def __init__(self,
+                 memory_limit: Optional[str] = None,
+                 temp_directory: Optional[str] = None,
+                 max_temp_directory_size: Optional[str] = None,
+                 threads: Optional[int] = None,
+                 preserve_insertion_order: Optional[bool] = None):
+        self.memory_limit = memory_limit
+        self.temp_directory = temp_directory
+        self.max_temp_directory_size = max_temp_directory_size
+        self.threads = threads
+        self.preserve_insertion_order = preserve_insertion_order
+
+    @property
+    def settings(self) -> Dict[str, str]:
+        results = dict()
+        if self.memory_limit is not None:
+            results['memory_limit'] = f"'{self.memory_limit}'"
+        if self.temp_directory is not None:
+            results['temp_directory'] = f"'{self.temp_directory}'"
+        if self.max_temp_directory_size is not None:
+            results['max_temp_directory_size'] = f"'{self.max_temp_directory_size}'"
+        if self.threads is not None:
+            results['threads'] = str(self.threads)
+        if self.preserve_insertion_order is not None:
+            results['preserve_insertion_order'] = str(
+                self.preserve_insertion_order).lower()
+        return results
+
+    def apply(self, cursor):
+        """
+        Apply the settings on a DuckDB cursor
+        """
+        if self.temp_directory is not None:
+            os.makedirs(self.temp_directory, exist_ok=True)
+        for key, value in self.settings.items():
+            cursor.execute(f'SET {key} = {value}')
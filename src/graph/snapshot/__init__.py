@@ -0,0 +1,4 @@
+from .main import GraphSnapshot
+from .store import SnapshotStore
+
+__all__ = ['GraphSnapshot', 'SnapshotStore']
@@ -0,0 +1,47 @@
+from typing import List, Optional
+import datetime
+import pandas as pd
+from batch_framework.etl import ObjProcessor
+from batch_framework.storage import PandasStorage
+from batch_framework.filesystem import FileSystem
+from .store import SnapshotStore
+from ..profiling import ProfiledObjProcessor
+
+
+class GraphSnapshot(ProfiledObjProcessor, ObjProcessor):
+    """
+    Record the final node and link tables as a snapshot
+    of a SnapshotStore on `snapshot_fs`, labeled by `label`
+    (the UTC date of the run if None).
+
+    The output `snapshot_log` lists the rows added and removed
+    of every changed table of every recorded snapshot.
+    """
+
+    def __init__(self, tables: List[str], input_fs: FileSystem,
+                 snapshot_fs: FileSystem, label: Optional[str] = None):
+        self._tables = tables
+        self._snapshot_fs = snapshot_fs
+        self._label = label
+        super().__init__(PandasStorage(input_fs), PandasStorage(snapshot_fs))
+
+    @property
+    def input_ids(self):
+        return [f'{table}_final' for table in self._tables]
+
+    @property
+    def output_ids(self):
+        return ['snapshot_log']
+
+    def transform(self, inputs: List[pd.DataFrame]) -> List[pd.DataFrame]:
+        store = SnapshotStore(self._snapshot_fs)
+        label = self._label
+        if label is None:
+            label = datetime.datetime.now(datetime.timezone.utc).date().isoformat()
+        store.record(dict(zip(self._tables, inputs)), label)
+        log = pd.DataFrame([
+            (s['id'], s['label'], table, added, removed)
+            for s in store.snapshots
+            for table, (added, removed) in s['changes'].items()
+        ], columns=['snapshot', 'label', 'table', 'added', 'removed'])
+        return [log]
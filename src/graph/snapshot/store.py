@@ -0,0 +1,210 @@
+"""
+Snapshot-versioned storage of graph tables
+
+Every recorded snapshot of a table is kept as a delta against the
+previous snapshot: the rows added (`snapshot_{table}_add_{n}`) and the
+hashes of the rows removed (`snapshot_{table}_remove_{n}`). A changed row
+is removed and added. Tables unchanged in a snapshot write nothing, so that
+the storage grows with the churn of the graph, not with the number of snapshots.
+
+A snapshot is materialized from the latest base (`snapshot_{table}_base_{n}`,
+a full copy) at or before it, followed by its deltas. The first snapshot of a
+table is a base; `compact` writes more bases to bound the deltas to be applied,
+and `expire` drops the history before a snapshot. The current state of every
+table is also kept (`snapshot_{table}_head_{n}`), so that the latest snapshot
+and the next delta need no replay.
+
+Objects of a snapshot are uploaded before the manifest (`snapshots.json`)
+refers to them, so that an interrupted run leaves the previous snapshots intact.
+"""
+from typing import Dict, List, Optional
+import io
+import json
+import numpy as np
+import pandas as pd
+from batch_framework.filesystem import FileSystem
+from batch_framework.storage import PandasStorage
+
+__all__ = ['SnapshotStore', 'row_hashes']
+
+HASH_COLUMN = '_hash'
+
+
+def row_hashes(df: pd.DataFrame) -> np.ndarray:
+    """
+    Hashes identifying the rows of a table by all of their values
+    """
+    return pd.util.hash_pandas_object(df, index=False).to_numpy()
+
+
+class SnapshotStore:
+    """
+    Snapshots of tables stored on a FileSystem
+
+    Args:
+        - fs: FileSystem holding the manifest and the objects of the snapshots.
+    """
+    MANIFEST = 'snapshots.json'
+
+    def __init__(self, fs: FileSystem):
+        self._fs = fs
+        self._storage = PandasStorage(fs)
+        self._manifest = self._load_manifest()
+
+    def _load_manifest(self) -> Dict:
+        if not self._fs.check_exists(SnapshotStore.MANIFEST):
+            return {'snapshots': [], 'tables': dict()}
+        return json.load(self._fs.download_core(SnapshotStore.MANIFEST))
+
+    def _save_manifest(self):
+        buff = io.BytesIO(json.dumps(self._manifest, sort_keys=True).encode())
+        self._fs.upload_core(buff, SnapshotStore.MANIFEST)
+
+    @property
+    def snapshots(self) -> List[Dict]:
+        """
+        Recorded snapshots: id, label and the number of rows
+        added and removed of every changed table.
+        """
+        return list(self._manifest['snapshots'])
+
+    @property
+    def tables(self) -> List[str]:
+        return list(self._manifest['tables'].keys())
+
+    @property
+    def latest(self) -> Optional[int]:
+        if not self._manifest['snapshots']:
+            return None
+        return self._manifest['snapshots'][-1]['id']
+
+    def as_of(self, label: str) -> int:
+        """
+        Latest snapshot whose label (e.g., ISO date) is not after `label`
+        """
+        ids = [s['id'] for s in self._manifest['snapshots'] if s['label'] <= label]
+        assert ids, f'no snapshot as of {label}'
+        return ids[-1]
+
+    def record(self, tables: Dict[str, pd.DataFrame], label: str) -> int:
+        """
+        Record the tables as a new snapshot.
+
+        Returns:
+            int: id of the snapshot.
+        """
+        snapshot = 0 if self.latest is None else self.latest + 1
+        changes = dict()
+        old_heads = []
+        for table, df in tables.items():
+            df = df.reset_index(drop=True)
+            hashes = row_hashes(df)
+            info = self._manifest['tables'].get(table)
+            if info is None:
+                self._storage.upload(
+                    df.assign(**{HASH_COLUMN: hashes}), f'snapshot_{table}_base_{snapshot}')
+                info = {'bases': [snapshot], 'deltas': [], 'head': None}
+                self._manifest['tables'][table] = info
+                changes[table] = [len(df), 0]
+            else:
+                head_hashes = self._load_head(table)[HASH_COLUMN].to_numpy()
+                added = ~np.isin(hashes, head_hashes)
+                removed = head_hashes[~np.isin(head_hashes, hashes)]
+                if not added.any() and len(removed) == 0:
+                    continue
+                self._storage.upload(
+                    df[added].assign(**{HASH_COLUMN: hashes[added]}).reset_index(drop=True),
+                    f'snapshot_{table}_add_{snapshot}')
+                self._storage.upload(
+                    pd.DataFrame({HASH_COLUMN: removed}), f'snapshot_{table}_remove_{snapshot}')
+                info['deltas'].append(snapshot)
+                changes[table] = [int(added.sum()), len(removed)]
+                old_heads.append(f'snapshot_{table}_head_{info["head"]}')
+            self._storage.upload(
+                df.assign(**{HASH_COLUMN: hashes}), f'snapshot_{table}_head_{snapshot}')
+            info['head'] = snapshot
+        self._manifest['snapshots'].append(
+            {'id': snapshot, 'label': label, 'changes': changes})
+        self._save_manifest()
+        for id in old_heads:
+            self._storage.drop(id)
+        print('snapshot', snapshot, label, '- #Changed Tables:', len(changes))
+        return snapshot
+
+    def _load_head(self, table: str) -> pd.DataFrame:
+        return self._storage.download(
+            f'snapshot_{table}_head_{self._manifest["tables"][table]["head"]}')
+
+    def _materialize(self, table: str, snapshot: int) -> pd.DataFrame:
+        assert table in self._manifest['tables'], f'table `{table}` has no snapshots'
+        info = self._manifest['tables'][table]
+        if snapshot >= info['head']:
+            return self._load_head(table)
+        bases = [b for b in info['bases'] if b <= snapshot]
+        assert bases, f'table `{table}` has no snapshot {snapshot}'
+        base = bases[-1]
+        result = self._storage.download(f'snapshot_{table}_base_{base}')
+        for delta in info['deltas']:
+            if base < delta <= snapshot:
+                removed = self._storage.download(
+                    f'snapshot_{table}_remove_{delta}')[HASH_COLUMN].to_numpy()
+                added = self._storage.download(f'snapshot_{table}_add_{delta}')
+                result = pd.concat([
+                    result[~np.isin(result[HASH_COLUMN].to_numpy(), removed)],
+                    added
+                ], ignore_index=True)
+        return result
+
+    def materialize(self, table: str, snapshot: Optional[int] = None) -> pd.DataFrame:
+        """
+        Args:
+            - table: name of the table.
+            - snapshot: id of the snapshot (latest if None).
+        """
+        if snapshot is None:
+            snapshot = self.latest
+        assert snapshot is not None and snapshot <= self.latest, f'unknown snapshot {snapshot}'
+        return self._materialize(table, snapshot).drop(
+            columns=[HASH_COLUMN]).reset_index(drop=True)
+
+    def compact(self, snapshot: Optional[int] = None):
+        """
+        Write a base at `snapshot` (latest if None) for every table
+        having deltas since its previous base.
+        """
+        if snapshot is None:
+            snapshot = self.latest
+        for table, info in self._manifest['tables'].items():
+            bases = [b for b in info['bases'] if b <= snapshot]
+            if not bases or not any(bases[-1] < d <= snapshot for d in info['deltas']):
+                continue
+            self._storage.upload(
+                self._materialize(table, snapshot), f'snapshot_{table}_base_{snapshot}')
+            info['bases'] = sorted(info['bases'] + [snapshot])
+            print('snapshot', snapshot, '- Compacted:', table)
+        self._save_manifest()
+
+    def expire(self, snapshot: int):
+        """
+        Drop the snapshots before `snapshot`, keeping only
+        the objects needed to materialize the later ones.
+        """
+        self.compact(snapshot)
+        dropped = []
+        for table, info in self._manifest['tables'].items():
+            bases = [b for b in info['bases'] if b <= snapshot]
+            if not bases:
+                continue
+            keep = bases[-1]
+            dropped.extend(f'snapshot_{table}_base_{b}' for b in info['bases'] if b < keep)
+            for d in info['deltas']:
+                if d <= keep:
+                    dropped.extend([f'snapshot_{table}_add_{d}', f'snapshot_{table}_remove_{d}'])
+            info['bases'] = [b for b in info['bases'] if b >= keep]
+            info['deltas'] = [d for d in info['deltas'] if d > keep]
+        self._manifest['snapshots'] = [
+            s for s in self._manifest['snapshots'] if s['id'] >= snapshot]
+        self._save_manifest()
+        for id in dropped:
+            self._storage.drop(id)
+        print('snapshot', snapshot, '- Expired Objects:', len(dropped))
@@ -0,0 +1,119 @@
+"""
+Compiler of declarative MetaGraph specs into SQLs
+
+A spec (YAML file or dict) describes nodes and links by their source
+table, key columns, filters and attributes (see src/metagraph.yml).
+The compiler generates one SQL per node and link, such that
+- ids are hashes of the key expressions shared by nodes and links:
+    `node_id = HASH(key)`, `from_id` / `to_id` the ids of the linked nodes
+    and `link_id = HASH(from_key | to_key)`.
+- `DISTINCT ON` is always on the key columns, i.e., on the id.
+- filters are named predicates shared across SQLs, de-duplicated per SQL.
+"""
+from typing import Any, Dict, List, Union
+import yaml
+
+__all__ = ['load_spec', 'compile_spec']
+
+SPEC_SECTIONS = [
+    'input_ids', 'keys', 'filters', 'nodes', 'links',
+    'node_grouping', 'link_grouping', 'node_grouping_sqls', 'link_grouping_sqls'
+]
+
+
+def load_spec(spec: Union[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Args:
+        - spec: path of a YAML spec file, or the spec itself.
+    """
+    if isinstance(spec, str):
+        with open(spec) as f:
+            spec = yaml.safe_load(f)
+    for section in spec:
+        assert section in SPEC_SECTIONS, f'unknown section `{section}` of spec'
+    return spec
+
+
+def compile_spec(spec: Union[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Returns:
+        Dict: arguments of MetaGraph.
+    """
+    spec = load_spec(spec)
+    keys = spec.get('keys', dict())
+    filters = spec.get('filters', dict())
+    nodes = spec['nodes']
+    links = spec['links']
+    for name, node in nodes.items():
+        assert node['source'] in spec['input_ids'], f'source `{node["source"]}` of node `{name}` is not in input_ids'
+        assert node['key'] in keys, f'key `{node["key"]}` of node `{name}` is not defined in keys'
+    for name, link in links.items():
+        assert link['source'] in spec['input_ids'], f'source `{link["source"]}` of link `{name}` is not in input_ids'
+        for end in ['from', 'to']:
+            assert link[end] in nodes, f'{end} node `{link[end]}` of link `{name}` is not defined in nodes'
+    return {
+        'subgraphs': {
+            name: (link['from'], link['to']) for name, link in links.items()},
+        'node_grouping': spec.get('node_grouping', dict()),
+        'link_grouping': spec.get('link_grouping', dict()),
+        'input_ids': spec['input_ids'],
+        'node_sqls': {
+            name: _compile_node_sql(node, keys, filters) for name, node in nodes.items()},
+        'link_sqls': {
+            name: _compile_link_sql(
+                link, keys[nodes[link['from']]['key']], keys[nodes[link['to']]['key']], filters)
+            for name, link in links.items()},
+        'node_grouping_sqls': spec.get('node_grouping_sqls', dict()),
+        'link_grouping_sqls': spec.get('link_grouping_sqls', dict())
+    }
+
+
+def _key_expr(columns: List[str]) -> str:
+    if len(columns) == 1:
+        return columns[0]
+    parts = columns[:1]
+    for column in columns[1:]:
+        parts.extend(["'|'", column])
+    return f"CONCAT({', '.join(parts)})"
+
+
+def _hash(expr: str) -> str:
+    return f'CAST(HASH({expr}) AS VARCHAR)'
+
+
+def _where(items: List[str], filters: Dict[str, str]) -> str:
+    predicates = list(dict.fromkeys(
+        ' '.join(filters.get(item, item).split()) for item in items))
+    if not predicates:
+        return ''
+    return '\nWHERE ' + '\nAND '.join(f'({p})' for p in predicates)
+
+
+def _compile_node_sql(node: Dict[str, Any], keys: Dict[str, List[str]],
+                      filters: Dict[str, str]) -> str:
+    columns = keys[node['key']]
+    select = [_hash(_key_expr(columns)) + ' AS node_id'] + node.get('attributes', [])
+    return (
+        f"SELECT DISTINCT ON ({', '.join(columns)})\n"
+        + ',\n'.join(select)
+        + f"\nFROM {node['source']}"
+        + _where(node.get('filters', []), filters)
+    )
+
+
+def _compile_link_sql(link: Dict[str, Any], from_columns: List[str], to_columns: List[str],
+                      filters: Dict[str, str]) -> str:
+    from_key = _key_expr(from_columns)
+    to_key = _key_expr(to_columns)
+    select = [
+        _hash(f"CONCAT({from_key}, '|', {to_key})") + ' AS link_id',
+        _hash(from_key) + ' AS from_id',
+        _hash(to_key) + ' AS to_id'
+    ] + link.get('attributes', [])
+    distinct_columns = list(dict.fromkeys(from_columns + to_columns))
+    return (
+        f"SELECT DISTINCT ON ({', '.join(distinct_columns)})\n"
+        + ',\n'.join(select)
+        + f"\nFROM {link['source']}"
+        + _where(link.get('filters', []), filters)
+    )
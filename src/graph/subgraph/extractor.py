@@ -1,17 +1,21 @@
-from typing import List
-from batch_framework.etl import SQLExecutor
+from typing import List, Optional
 from batch_framework.rdb import RDB
 from batch_framework.filesystem import FileSystem
 from ..metagraph import MetaGraph
+from ..executor import GraphSQLExecutor
+from ..resources import ResourceConfig
 
 __all__ = ['LinkExtractor', 'NodeExtractor']
 
 
-class ExtractorBase(SQLExecutor):
+class ExtractorBase(GraphSQLExecutor):
     def __init__(self, metagraph: MetaGraph, rdb: RDB,
-                 input_fs: FileSystem, output_fs: FileSystem):
+                 input_fs: FileSystem, output_fs: FileSystem,
+                 resource_config: Optional[ResourceConfig] = None,
+                 checkpoint: bool = False):
         self._metagraph = metagraph
-        super().__init__(rdb, input_fs=input_fs, output_fs=output_fs)
+        super().__init__(rdb, input_fs=input_fs, output_fs=output_fs,
+                         resource_config=resource_config, checkpoint=checkpoint)
 
     @property
     def input_ids(self):
@@ -1,4 +1,4 @@
-from typing import List
+from typing import List, Optional
 from batch_framework.rdb import RDB
 from batch_framework.etl import ETLGroup
 from batch_framework.storage import PandasStorage
@@ -6,20 +6,26 @@ from batch_framework.filesystem import FileSystem
 from .extractor import NodeExtractor, LinkExtractor
 from .validate import Validator
 from ..metagraph import MetaGraph
+from ..profiling import ProfiledETL
+from ..resources import ResourceConfig
 
 
-class SubgraphExtractor(ETLGroup):
+class SubgraphExtractor(ProfiledETL, ETLGroup):
     """
     Extract Link and Node from Raw Tabular Data
     """
 
     def __init__(self, metagraph: MetaGraph, rdb: RDB,
-                 input_fs: FileSystem, output_fs: FileSystem):
+                 input_fs: FileSystem, output_fs: FileSystem,
+                 resource_config: Optional[ResourceConfig] = None,
+                 checkpoint: bool = False):
         self._metagraph = metagraph
         link_op = LinkExtractor(
-            metagraph=metagraph, rdb=rdb, input_fs=input_fs, output_fs=output_fs)
+            metagraph=metagraph, rdb=rdb, input_fs=input_fs, output_fs=output_fs,
+            resource_config=resource_config, checkpoint=checkpoint)
         node_op = NodeExtractor(
-            metagraph=metagraph, rdb=rdb, input_fs=input_fs, output_fs=output_fs)
+            metagraph=metagraph, rdb=rdb, input_fs=input_fs, output_fs=output_fs,
+            resource_config=resource_config, checkpoint=checkpoint)
         val_op = Validator(metagraph, PandasStorage(output_fs))
         super().__init__(link_op, node_op, val_op)
 
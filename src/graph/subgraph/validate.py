@@ -4,15 +4,22 @@ Validate ID(s) of a Subgraph
 from batch_framework.storage import PandasStorage
 from batch_framework.etl import ETLGroup
 from ..metagraph import MetaGraph
-from ..validate import FromLinkIDValidator, ToLinkIDValidator
+from ..validate import FromLinkIDValidator, ToLinkIDValidator, NodeIDCache
 
 __all__ = ['Validator']
 
 
 class Validator(ETLGroup):
+    """
+    Validate the link ids of every subgraph.
+    The validators share a NodeIDCache, reading every node table once.
+    """
+
     def __init__(self, metagraph: MetaGraph, storage: PandasStorage):
         self._storage = storage
         self.metagraph = metagraph
+        self._node_id_cache = NodeIDCache(storage)
+        self._validator_list = self._build_validators()
         super().__init__(*self.validator_list)
 
     @property
@@ -28,16 +35,21 @@ class Validator(ETLGroup):
 
     @property
     def validator_list(self):
+        return self._validator_list
+
+    def _build_validators(self):
         results = []
-        for link, (src_node, target_node) in self.metagraph._subgraphs.items():
+        for link, (src_node, target_node) in self.metagraph.subgraphs.items():
             results.append(
                 FromLinkIDValidator(
                     link,
                     src_node,
-                    self._storage))
+                    self._storage,
+                    node_id_cache=self._node_id_cache))
             results.append(
                 ToLinkIDValidator(
                     link,
                     target_node,
-                    self._storage))
+                    self._storage,
+                    node_id_cache=self._node_id_cache))
         return results
@@ -1,22 +1,81 @@
 
-from typing import List
+from typing import Dict, List, Optional
+from threading import Lock
+import numpy as np
 import pandas as pd
 from batch_framework.etl import ObjProcessor
 from batch_framework.storage import PandasStorage
+from .encoding import read_columns
+from .profiling import ProfiledObjProcessor, profiler
+from .csr.builder import build_node_index
 
 
-class LinkIDValidator(ObjProcessor):
+class NodeIDCache:
+    """
+    Node ids of node tables (sorted unique uint64, see `build_node_index`)
+    shared by the validators of a run, so that every node table is read once.
+
+    A node table is read by its first validator, and its ids are dropped
+    once all of its registered validators released them.
+
+    Args:
+        - storage: storage of the node tables.
+    """
+
+    def __init__(self, storage: PandasStorage):
+        self._storage = storage
+        self._users: Dict[str, int] = dict()
+        self._remains: Dict[str, int] = dict()
+        self._ids: Dict[str, np.ndarray] = dict()
+        self._locks: Dict[str, Lock] = dict()
+        self._lock = Lock()
+
+    def register(self, node: str):
+        """
+        Register a validator of `node`
+        """
+        with self._lock:
+            self._users[node] = self._users.get(node, 0) + 1
+            self._locks.setdefault(node, Lock())
+
+    def acquire(self, node: str) -> np.ndarray:
+        with self._locks[node]:
+            if node not in self._ids:
+                with profiler.span(f'read:{node}', 'object') as span:
+                    ids = build_node_index(
+                        read_columns(self._storage, node, ['node_id']).node_id)
+                    span['rows_out'] = len(ids)
+                self._ids[node] = ids
+                self._remains[node] = self._users[node]
+            return self._ids[node]
+
+    def release(self, node: str):
+        with self._locks[node]:
+            self._remains[node] -= 1
+            if self._remains[node] == 0:
+                del self._ids[node]
+
+
+class LinkIDValidator(ProfiledObjProcessor, ObjProcessor):
     """
     Check whether link source/target IDs are subset
     of corresponding node IDs.
+
+    Only the checked id column of the link table is read,
+    and the node ids are taken from `node_id_cache`.
     """
 
     def __init__(self, link: str, node: str, id_type: str,
-                 input_storage: PandasStorage):
+                 input_storage: PandasStorage,
+                 node_id_cache: Optional[NodeIDCache] = None):
         assert id_type in ['from_id', 'to_id']
         self._link = link
         self._node = node
         self._id_type = id_type
+        if node_id_cache is None:
+            node_id_cache = NodeIDCache(input_storage)
+        self._node_id_cache = node_id_cache
+        self._node_id_cache.register(node)
         super().__init__(input_storage)
 
     @property
@@ -30,26 +89,39 @@ class LinkIDValidator(ObjProcessor):
     def output_ids(self):
         return []
 
+    @property
+    def input_columns(self) -> Dict[str, List[str]]:
+        return {self._link: [self._id_type]}
+
+    def _extract_inputs(self) -> List[object]:
+        # the node table is only a dependency: its ids are read through the cache
+        return [self._extract_input(self._link)]
+
     def transform(self, inputs: List[pd.DataFrame]) -> List[pd.DataFrame]:
         link_df = inputs[0]
-        node_df = inputs[1]
-        print('subgraph', self._link, '- #Link:', len(link_df))
-        print('subgraph', self._node, '- #Nodes:', len(node_df))
-        link_ids = set(link_df[self._id_type].tolist())
-        print('subgraph', self._link, '- #Link Nodes:', len(link_ids))
-        node_ids = set(node_df.node_id.tolist())
-        assert link_ids.issubset(
-            node_ids), f'some {self._id_type} in link is not in the node table'
+        node_ids = self._node_id_cache.acquire(self._node)
+        try:
+            print('subgraph', self._link, '- #Link:', len(link_df))
+            print('subgraph', self._node, '- #Nodes:', len(node_ids))
+            link_ids = build_node_index(link_df[self._id_type])
+            print('subgraph', self._link, '- #Link Nodes:', len(link_ids))
+            found = np.isin(link_ids, node_ids, assume_unique=True)
+            assert found.all(), \
+                f'{(~found).sum()} {self._id_type} in link is not in the node table'
+        finally:
+            self._node_id_cache.release(self._node)
         return []
 
 
 class FromLinkIDValidator(LinkIDValidator):
     def __init__(self, link: str, node: str,
-                 input_storage: PandasStorage):
-        super().__init__(link, node, 'from_id', input_storage)
+                 input_storage: PandasStorage,
+                 node_id_cache: Optional[NodeIDCache] = None):
+        super().__init__(link, node, 'from_id', input_storage, node_id_cache)
 
 
 class ToLinkIDValidator(LinkIDValidator):
     def __init__(self, link: str, node: str,
-                 input_storage: PandasStorage):
-        super().__init__(link, node, 'to_id', input_storage)
+                 input_storage: PandasStorage,
+                 node_id_cache: Optional[NodeIDCache] = None):
+        super().__init__(link, node, 'to_id', input_storage, node_id_cache)
@@ -1,19 +1,21 @@
-from typing import List
+from typing import Dict, List, Optional
 from batch_framework.rdb import DuckDBBackend
 from batch_framework.filesystem import FileSystem
 from batch_framework.etl import ETLGroup
 from batch_framework.storage import PandasStorage
-from .graph import GraphDataPlatform
+from .graph import GraphDataPlatform, ParquetOptions
 from .graph.metagraph import MetaGraph
+from .graph.profiling import ProfiledETL
+from .graph.resources import ResourceConfig
 from .tabularize import LatestTabularize
 
 
-class WholeGraphDataPlatform(ETLGroup):
+class WholeGraphDataPlatform(ProfiledETL, ETLGroup):
     """
     Data Flow:
         1. canonicalize data
         2. extract subgraphs
-        3. do entity resolution
+        3. (optional) do entity resolution
         4. group subgraph
     """
 
@@ -21,7 +23,15 @@ class WholeGraphDataPlatform(ETLGroup):
                  raw_fs: FileSystem,
                  canon_fs: FileSystem,
                  subgraph_fs: FileSystem,
-                 output_fs: FileSystem
+                 output_fs: FileSystem,
+                 parquet_options: Optional[ParquetOptions] = None,
+                 csr_fs: Optional[FileSystem] = None,
+                 dependency_link: Optional[str] = None,
+                 analytics_links: Optional[List[str]] = None,
+                 resources: Optional[Dict[str, ResourceConfig]] = None,
+                 checkpoint: bool = False,
+                 resolution: Optional[List[str]] = None,
+                 snapshot_fs: Optional[FileSystem] = None
                  ):
         # Connecting MetaGraph with Entity Resolution Meta
         # Basic ETL components
@@ -38,7 +48,15 @@ class WholeGraphDataPlatform(ETLGroup):
             canon_fs,
             subgraph_fs=subgraph_fs,
             output_fs=output_fs,
-            rdb=DuckDBBackend()
+            rdb=DuckDBBackend(),
+            parquet_options=parquet_options,
+            csr_fs=csr_fs,
+            dependency_link=dependency_link,
+            analytics_links=analytics_links,
+            resources=resources,
+            checkpoint=checkpoint,
+            resolution=resolution,
+            snapshot_fs=snapshot_fs
         ))
         self._input_ids = args[0].input_ids
         self._output_ids = args[-1].output_ids
@@ -1,27 +1,82 @@
+import os
+import shutil
 import duckdb
-from typing import Dict
-from batch_framework.etl import SQLExecutor
+from typing import Dict, List, Optional
 from batch_framework.rdb import DuckDBBackend
 from batch_framework.filesystem import FileSystem
 from .meta import MetaGraph
+from .graph import ParquetOptions
+from .graph.executor import GraphSQLExecutor
+from .graph.profiling import profiler
+from .graph.resources import ResourceConfig
 
+# DuckDB column types (without parameters, e.g., of DECIMAL(18, 3))
+# to attribute types of puppy graph
 type_mapping = {
     'VARCHAR': 'String',
+    'UUID': 'String',
+    'BOOLEAN': 'Boolean',
+    'TINYINT': 'Int',
+    'SMALLINT': 'Int',
     'INTEGER': 'Int',
-    'UBIGINT': 'Int',
-    'BIGINT': 'Int',
-    'NUMERIC': 'Double'
+    'UTINYINT': 'Int',
+    'USMALLINT': 'Int',
+    'UINTEGER': 'Long',
+    'BIGINT': 'Long',
+    'UBIGINT': 'Long',
+    'HUGEINT': 'Long',
+    'FLOAT': 'Float',
+    'DOUBLE': 'Double',
+    'DECIMAL': 'Double',
+    'NUMERIC': 'Double',
+    'DATE': 'Date',
+    'TIMESTAMP': 'DateTime',
+    'TIMESTAMP_S': 'DateTime',
+    'TIMESTAMP_MS': 'DateTime',
+    'TIMESTAMP_NS': 'DateTime',
+    'TIMESTAMP WITH TIME ZONE': 'DateTime'
 }
 
 
-class ResultCollectLayer(SQLExecutor):
+class ResultCollectLayer(GraphSQLExecutor):
     """
     Store all generated links and nodes tables
     into DuckDB.
+
+    Rows are inserted in the sort order of `parquet_options`
+    (node tables by `node_id` and link tables by (`from_id`, `to_id`)
+    by default), letting DuckDB compress repeated values into runs
+    and skip row groups by their min/max of the sort keys.
+
+    After collection, the tables are laid out for serving: node tables get
+    a unique index on `node_id` and link tables an index on `to_id`
+    (lookups by `from_id` are served by the sort order), and the
+    statistics are refreshed by `ANALYZE`.
+
+    `node_attributes` maps a node to its node attribute tables
+    (e.g., {'package': ['node_package_dependency']}), whose
+    columns are joined into the collected node table by `node_id`.
+
+    `summary_tables` (e.g., `degree_distribution_{link}`) are
+    collected from `{table}_final` as they are, outside of the graph schema.
+
+    The columns and statistics of the collected tables are kept
+    in `table_stats` for `build_schema`.
+
+    `resource_config` bounds memory and threads of DuckDB while collecting.
+
+    If `incremental` is True, the collection is built on top of the
+    existing database: only the tables whose SQL or inputs changed
+    since they were collected are replaced.
     """
 
     def __init__(self, rdb: DuckDBBackend, metagraph: MetaGraph,
-                 input_fs: FileSystem):
+                 input_fs: FileSystem,
+                 parquet_options: Optional[ParquetOptions] = None,
+                 node_attributes: Dict[str, List[str]] = dict(),
+                 summary_tables: List[str] = [],
+                 resource_config: Optional[ResourceConfig] = None,
+                 incremental: bool = False):
         nodes = list(metagraph.node_grouping.keys())
         links = list(metagraph.triplets.keys())
         self._targets = [
@@ -29,39 +84,181 @@ class ResultCollectLayer(SQLExecutor):
         ] + [
             f'link_{l}' for l in links
         ]
-        super().__init__(rdb, input_fs=input_fs)
+        self._parquet_options = parquet_options
+        self._node_attributes = node_attributes
+        self._summary_tables = summary_tables
+        self._table_stats = None
+        super().__init__(rdb, input_fs=input_fs, resource_config=resource_config,
+                         checkpoint=incremental)
 
     @property
     def input_ids(self):
-        return [f'{t}_final' for t in self._targets]
+        results = [f'{t}_final' for t in self._targets]
+        for tables in self._node_attributes.values():
+            results.extend(tables)
+        results.extend(f'{t}_final' for t in self._summary_tables)
+        return results
 
     @property
     def output_ids(self):
-        return self._targets
+        return self._targets + self._summary_tables
 
     def sqls(self, **kwargs):
         results = dict()
         for target in self._targets:
             results[target] = f'SELECT * FROM {target}_final'
+            node = target[len('node_'):]
+            if target.startswith('node_') and node in self._node_attributes:
+                results[target] = self._build_node_attribute_sql(
+                    target, self._node_attributes[node])
+            parquet_options = self._parquet_options or ParquetOptions()
+            sort_keys = parquet_options.get_sort_keys(target)
+            if sort_keys:
+                results[target] = f"""
+                SELECT * FROM ({results[target]})
+                ORDER BY {', '.join(sort_keys)}
+                """
+        for table in self._summary_tables:
+            results[table] = f'SELECT * FROM {table}_final'
         return results
 
+    def _execute(self, **kwargs):
+        super()._execute(**kwargs)
+        cursor = self._rdb.get_conn()
+        try:
+            if self._resource_config is not None:
+                self._resource_config.apply(cursor)
+            self._optimize(cursor)
+        finally:
+            cursor.close()
 
-def convert_duckdb_to_schema(duckdb_path: str, metagraph: MetaGraph) -> Dict:
+    def _optimize(self, cursor):
+        """
+        Create the serving indexes and refresh the statistics.
+        Indexes of replaced tables are dropped with them,
+        so missing indexes are (re-)created on every run.
+        """
+        with profiler.span('optimize', 'sql'):
+            for target in self._targets:
+                if target.startswith('node_'):
+                    cursor.execute(f'''
+                    CREATE UNIQUE INDEX IF NOT EXISTS {target}_node_id ON {target} (node_id);
+                    ''')
+                else:
+                    cursor.execute(f'''
+                    CREATE INDEX IF NOT EXISTS {target}_to_id ON {target} (to_id);
+                    ''')
+                print(f'@{self} Indexed: {target}')
+            cursor.execute('ANALYZE;')
+        with profiler.span('table_stats', 'sql'):
+            self._table_stats = collect_table_stats(cursor, self._targets)
+
+    @property
+    def table_stats(self) -> Dict[str, Dict]:
+        """
+        Columns and statistics of the collected tables (see `collect_table_stats`),
+        available after execution.
+        """
+        assert self._table_stats is not None, 'table_stats is available after execution'
+        return self._table_stats
+
+    @staticmethod
+    def _build_node_attribute_sql(target: str, tables: List[str]) -> str:
+        column_sql = ',\n'.join(
+            ['t0.*'] + [f't{i+1}.* EXCLUDE (node_id)' for i in range(len(tables))])
+        left_join_sql = '\n'.join([
+            f'LEFT JOIN {table} AS t{i+1} ON t0.node_id = t{i+1}.node_id'
+            for i, table in enumerate(tables)
+        ])
+        return f"""
+        SELECT
+            {column_sql}
+        FROM {target}_final AS t0
+            {left_join_sql}
+        """
+
+
+def publish_database(working_path: str, serving_path: str):
+    """
+    Replace the serving database by the collected working copy atomically:
+    readers of `serving_path` see either the previous or the new database.
+    """
+    conn = duckdb.connect(working_path)
+    conn.execute('CHECKPOINT')
+    conn.close()
+    os.makedirs(os.path.dirname(serving_path) or '.', exist_ok=True)
+    tmp_path = serving_path + '.tmp'
+    shutil.copyfile(working_path, tmp_path)
+    os.replace(tmp_path, serving_path)
+
+
+def collect_table_stats(cursor, tables: List[str]) -> Dict[str, Dict]:
+    """
+    Columns and statistics of `tables`, taken from the catalog
+    and one aggregate scan per table.
+
+    Returns:
+        Dict: for every table
+            - row_count: number of rows.
+            - columns: list of {name, type, non_null, distinct},
+                where `type` is the DuckDB type and `distinct` is approximated.
+    """
+    results = dict()
+    for table in tables:
+        columns = cursor.execute('''
+        SELECT column_name, data_type FROM duckdb_columns()
+        WHERE schema_name = 'main' AND table_name = ?
+        ORDER BY column_index
+        ''', [table]).fetchall()
+        assert columns, f'duck db missing table: {table}'
+        aggregates = ['COUNT(*)']
+        for name, _ in columns:
+            aggregates.extend([
+                f'COUNT("{name}")',
+                f'LEAST(APPROX_COUNT_DISTINCT("{name}"), COUNT("{name}"))'
+            ])
+        values = cursor.execute(
+            f'SELECT {", ".join(aggregates)} FROM {table}').fetchone()
+        results[table] = {
+            'row_count': values[0],
+            'columns': [{
+                'name': name,
+                'type': data_type,
+                'non_null': values[1 + 2 * i],
+                'distinct': values[2 + 2 * i]
+            } for i, (name, data_type) in enumerate(columns)]
+        }
+    return results
+
+
+def _get_attributes(table_stats: Dict, meta_fields: List[str]) -> List[Dict[str, str]]:
+    attributes = []
+    for column in table_stats['columns']:
+        if column['name'] in meta_fields:
+            continue
+        data_type = column['type'].split('(')[0]
+        assert data_type in type_mapping, f'type {column["type"]} of column `{column["name"]}` has no puppy graph type'
+        attributes.append({
+            'type': type_mapping[data_type],
+            'name': column['name']
+        })
+    return attributes
+
+
+def build_schema(metagraph: MetaGraph, table_stats: Dict[str, Dict]) -> Dict:
     """
     Generate schema.json of puppy graph
-    from metagraph and the graph-holding duck db.
+    from metagraph and the statistics of the collected tables
+    (e.g., `ResultCollectLayer.table_stats`).
+
+    Besides vertices and edges, `statistics` holds the row count of every table
+    and, for every column, the number of non-null and (approximately) distinct values.
     """
-    conn = duckdb.connect(duckdb_path)
-    db_tables = conn.execute('SHOW ALL TABLES;').fetchdf()
-    db_tables.set_index('name', inplace=True)
-    print(db_tables[['column_names', 'column_types']])
     nodes = list(metagraph.node_grouping.keys())
     links = list(metagraph.triplets.keys())
-    db_table_names = sorted(db_tables.index.tolist())
-    target_table_names = sorted(
-        [f'node_{n}' for n in nodes] + [f'link_{l}' for l in links])
-    assert len(db_table_names) == len(
-        target_table_names), f'duck db missing tables: {set(target_table_names) - set(db_table_names)}'
+    target_table_names = [f'node_{n}' for n in nodes] + [f'link_{l}' for l in links]
+    missing_tables = [t for t in target_table_names if t not in table_stats]
+    assert not missing_tables, f'duck db missing tables: {missing_tables}'
     schema = dict()
     schema['catalogs'] = [
         {
@@ -76,13 +273,6 @@ def convert_duckdb_to_schema(duckdb_path: str, metagraph: MetaGraph) -> Dict:
     vertices = []
     for node in nodes:
         table_name = f'node_{node}'
-        column_names = db_tables.loc[table_name]['column_names']
-        column_types = db_tables.loc[table_name]['column_types']
-        attributes = [{
-            'type': type_mapping[t],
-            'name': n
-        } for n, t in zip(column_names, column_types) if n not in [
-            'node_id', 'from_id', 'to_id']]
         vertices.append(
             {
                 'label': node,
@@ -94,18 +284,13 @@ def convert_duckdb_to_schema(duckdb_path: str, metagraph: MetaGraph) -> Dict:
                         "id": 'node_id'
                     }
                 },
-                'attributes': attributes
+                'attributes': _get_attributes(
+                    table_stats[table_name], ['node_id', 'from_id', 'to_id'])
             }
         )
     edges = []
     for link in links:
         table_name = f'link_{link}'
-        column_names = db_tables.loc[table_name]['column_names']
-        column_types = db_tables.loc[table_name]['column_types']
-        attributes = [{
-            'type': type_mapping[t],
-            'name': n
-        } for n, t in zip(column_names, column_types) if n not in ['link_id', 'from_id', 'to_id']]
         edges.append(
             {
                 'label': link,
@@ -121,9 +306,28 @@ def convert_duckdb_to_schema(duckdb_path: str, metagraph: MetaGraph) -> Dict:
                 },
                 'from': metagraph.triplets[link][0],
                 'to': metagraph.triplets[link][1],
-                'attributes': attributes
+                'attributes': _get_attributes(
+                    table_stats[table_name], ['link_id', 'from_id', 'to_id'])
             }
         )
     schema['vertices'] = vertices
     schema['edges'] = edges
+    schema['statistics'] = {
+        table_name: table_stats[table_name] for table_name in target_table_names}
     return schema
+
+
+def convert_duckdb_to_schema(duckdb_path: str, metagraph: MetaGraph) -> Dict:
+    """
+    Generate schema.json of puppy graph from a graph-holding duck db
+    that is not collected in this process.
+    """
+    nodes = list(metagraph.node_grouping.keys())
+    links = list(metagraph.triplets.keys())
+    conn = duckdb.connect(duckdb_path, read_only=True)
+    try:
+        table_stats = collect_table_stats(
+            conn, [f'node_{n}' for n in nodes] + [f'link_{l}' for l in links])
+    finally:
+        conn.close()
+    return build_schema(metagraph, table_stats)
@@ -0,0 +1,105 @@
+"""
+Parse requirement strings (PEP 508) into structured columns
+
+Every distinct requirement string is parsed once, so that the parsing
+cost depends on the number of distinct requirements, not on the number
+of packages requiring them.
+"""
+from typing import Dict, List, Optional, Tuple
+import re
+import pandas as pd
+from packaging.requirements import Requirement, InvalidRequirement
+from packaging.version import Version, InvalidVersion
+
+__all__ = ['parse_requirement', 'parse_requirements', 'REQUIREMENT_COLUMNS']
+
+EXTRA_MARKER_PATTERN = re.compile(r"""\bextra\s*==\s*['"]([^'"]+)['"]""")
+LOWER_BOUND_OPERATORS = ['>=', '>', '~=', '==', '===']
+UPPER_BOUND_OPERATORS = ['<', '<=', '==', '===']
+
+# - specifier: normalized version specifier (e.g., `<2,>=1.0`)
+# - specifier_operators / specifier_versions: operators and versions of the specifier
+# - min_version / max_version: tightest lower / upper bound of the specifier
+# - extras: comma-separated extras of the required package
+# - has_marker: whether the requirement has an environment marker
+# - marker: the environment marker (e.g., `python_version < "3.8"`)
+# - optional_extra: extra of the requiring package that the requirement is optional for
+REQUIREMENT_COLUMNS = [
+    'specifier', 'specifier_operators', 'specifier_versions', 'min_version',
+    'max_version', 'extras', 'has_marker', 'marker', 'optional_extra'
+]
+# dtypes of the scalar columns, so that columns without any value keep their types
+REQUIREMENT_DTYPES = {
+    'specifier': 'string',
+    'min_version': 'string',
+    'max_version': 'string',
+    'extras': 'string',
+    'has_marker': 'boolean',
+    'marker': 'string',
+    'optional_extra': 'string'
+}
+EMPTY_REQUIREMENT = (None, [], [], None, None, None, None, None, None)
+
+
+def _get_bound(specs: List[Tuple[str, str]], operators: List[str], use_max: bool) -> Optional[str]:
+    bounds = []
+    for operator, version in specs:
+        if operator in operators:
+            try:
+                bounds.append((Version(version), version))
+            except InvalidVersion:
+                continue
+    if not bounds:
+        return None
+    return (max(bounds) if use_max else min(bounds))[1]
+
+
+def parse_requirement(requirement: str) -> Tuple:
+    """
+    Returns:
+        Tuple: values of REQUIREMENT_COLUMNS (empty if `requirement` is invalid).
+    """
+    try:
+        req = Requirement(requirement)
+    except InvalidRequirement:
+        return EMPTY_REQUIREMENT
+    specs = sorted((spec.operator, spec.version) for spec in req.specifier)
+    marker = str(req.marker) if req.marker is not None else None
+    extra = EXTRA_MARKER_PATTERN.search(marker) if marker is not None else None
+    return (
+        str(req.specifier) or None,
+        [operator for operator, _ in specs],
+        [version for _, version in specs],
+        _get_bound(specs, LOWER_BOUND_OPERATORS, use_max=True),
+        _get_bound(specs, UPPER_BOUND_OPERATORS, use_max=False),
+        ','.join(sorted(req.extras)) or None,
+        marker is not None,
+        marker,
+        extra.group(1) if extra is not None else None
+    )
+
+
+def parse_requirements(requirements: pd.Series,
+                       cache: Optional[Dict[str, Tuple]] = None) -> pd.DataFrame:
+    """
+    Args:
+        - requirements: requirement strings.
+        - cache: parsed requirement strings, extended by the strings parsed by this call
+            (e.g., shared by the runs of a process).
+
+    Returns:
+        pd.DataFrame: REQUIREMENT_COLUMNS of every requirement, with the index of `requirements`.
+    """
+    if cache is None:
+        cache = dict()
+    codes, uniques = pd.factorize(requirements)
+    rows = []
+    for requirement in uniques:
+        if requirement not in cache:
+            cache[requirement] = parse_requirement(requirement)
+        rows.append(cache[requirement])
+    # code -1 (missing requirement) takes the last row, the empty one
+    rows.append(EMPTY_REQUIREMENT)
+    result = pd.DataFrame(rows, columns=REQUIREMENT_COLUMNS).iloc[codes]
+    result.index = requirements.index
+    return result.astype(REQUIREMENT_DTYPES)
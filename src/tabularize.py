@@ -3,18 +3,67 @@
 Convert pandas with JSON column to plain pandas dataframe
 
 Parse Email and Person
+
+Rows are accumulated column by column (see `ColumnBuffer`)
+and every table is built into a DataFrame once,
+instead of allocating a dictionary per row.
 """
-from typing import List, Dict, Union, Optional
+from typing import List, Dict, Optional, Tuple
 import pandas as pd
 import json
 from batch_framework.etl import ObjProcessor
+from .graph.profiling import ProfiledObjProcessor
+from .requirement import parse_requirements
 from collections import Counter
 from urllib.parse import urlparse
 import re
 EMAIL_PATTERN = re.compile(r"^(.*?)\s*<([^>]+)")
+PKG_NAME_SEPARATOR_PATTERN = re.compile(r"[-_.]+")
+
+PACKAGE_COLUMNS = ['pkg_name', 'name', 'package_url', 'requires_python',
+                   'version', 'num_releases', 'num_requires_dist', 'license']
+REQUIREMENT_COLUMNS = ['pkg_name', 'required_pkg_name', 'num_match_dist',
+                       'requirement_string', 'newest_dist', 'oldest_dist']
+URL_COLUMNS = ['pkg_name', 'url', 'url_type', 'domain', 'top_level_domain',
+               'path', 'github_repo', 'github_account']
+KEYWORD_COLUMNS = ['pkg_name', 'keyword']
+EMAIL_COLUMNS = ['pkg_name', 'person_name', 'email_record', 'email',
+                 'domain', 'top_level_domain', 'role']
+
+
+def canonicalize_name(name: str) -> str:
+    """
+    Normalized package name of PEP 503 (e.g., Foo_Bar, foo.bar -> foo-bar)
+    """
+    return PKG_NAME_SEPARATOR_PATTERN.sub('-', name).lower()
+
+
+class ColumnBuffer:
+    """
+    Rows of a table accumulated as one list per column
+
+    Args:
+        - columns: column names, in the order of the values of `append`.
+    """
+    __slots__ = ('_columns', '_appends', '_values')
+
+    def __init__(self, columns: List[str]):
+        self._columns = columns
+        self._values = [[] for _ in columns]
+        self._appends = [values.append for values in self._values]
+
+    def append(self, *row):
+        for append, value in zip(self._appends, row):
+            append(value)
+
+    def __len__(self) -> int:
+        return len(self._values[0])
+
+    def to_frame(self) -> pd.DataFrame:
+        return pd.DataFrame(dict(zip(self._columns, self._values)))
 
 
-class LatestTabularize(ObjProcessor):
+class LatestTabularize(ProfiledObjProcessor, ObjProcessor):
     @property
     def input_ids(self):
         return ['latest']
@@ -25,40 +74,48 @@ class LatestTabularize(ObjProcessor):
                 'latest_keyword', 'latest_email']
 
     def transform(self, inputs: List[pd.DataFrame]) -> List[pd.DataFrame]:
-        infos = []
-        reqs = []
-        urls = []
-        keywords = []
+        infos = ColumnBuffer(PACKAGE_COLUMNS)
+        reqs = ColumnBuffer(REQUIREMENT_COLUMNS)
+        urls = ColumnBuffer(URL_COLUMNS)
+        keywords = ColumnBuffer(KEYWORD_COLUMNS)
+        emails = ColumnBuffer(EMAIL_COLUMNS)
         keyword_counter = Counter()
         license_counter = Counter()
-        emails = []
-        for record in inputs[0].to_dict('records'):
-            record['latest'] = json.loads(record['latest'])
-            info = LatestTabularize.simplify_record(
-                record, license_counter=license_counter)
-            _reqs = LatestTabularize.simplify_requires_dist(record)
-            _urls = LatestTabularize.simplify_project_urls(record)
-            _home_page_url = LatestTabularize.simplify_urls(
-                'home_page', record)
-            _docs_url = LatestTabularize.simplify_urls('docs_url', record)
-            _keywords = LatestTabularize.simplify_keywords(
-                record, counter=keyword_counter)
-            _author_emails = LatestTabularize.simplify_emails('author', record)
-            _maintainer_emails = LatestTabularize.simplify_emails(
-                'maintainer', record)
-            infos.append(info)
-            reqs.extend(_reqs)
-            urls.extend(_urls)
-            urls.append(_home_page_url)
-            urls.append(_docs_url)
-            keywords.extend(_keywords)
-            emails.extend(_author_emails)
-            emails.extend(_maintainer_emails)
-        package_df = pd.DataFrame(infos)
-        requirement_df = pd.DataFrame(reqs)
-        urls_df = pd.DataFrame(urls)
-        keywords_df = pd.DataFrame(keywords)
-        emails_df = pd.DataFrame(emails)
+        for pkg_name, latest in zip(inputs[0]['name'].tolist(), inputs[0]['latest'].tolist()):
+            latest = json.loads(latest)
+            info = latest['info']
+            LatestTabularize.simplify_record(
+                pkg_name, latest, infos, license_counter=license_counter)
+            LatestTabularize.simplify_requires_dist(pkg_name, latest, reqs)
+            LatestTabularize.simplify_project_urls(pkg_name, info, urls)
+            LatestTabularize.simplify_urls('home_page', pkg_name, info, urls)
+            LatestTabularize.simplify_urls('docs_url', pkg_name, info, urls)
+            LatestTabularize.simplify_keywords(
+                pkg_name, info, keywords, counter=keyword_counter)
+            LatestTabularize.simplify_emails('author', pkg_name, info, emails)
+            LatestTabularize.simplify_emails('maintainer', pkg_name, info, emails)
+        package_df = infos.to_frame()
+        requirement_df = reqs.to_frame()
+        requirement_df = requirement_df.join(
+            parse_requirements(requirement_df['requirement_string']))
+        urls_df = urls.to_frame()
+        keywords_df = keywords.to_frame()
+        emails_df = emails.to_frame()
+        # package nodes are keyed on the canonicalized package names,
+        # so that spellings of the same package become the same node,
+        # while the package names are kept as they are published
+        canonical_names = dict()
+        for df, column, canonical_column in [
+                (package_df, 'pkg_name', 'canonical_name'),
+                (requirement_df, 'pkg_name', 'canonical_name'),
+                (requirement_df, 'required_pkg_name', 'canonical_required_name'),
+                (urls_df, 'pkg_name', 'canonical_name'),
+                (keywords_df, 'pkg_name', 'canonical_name'),
+                (emails_df, 'pkg_name', 'canonical_name')]:
+            df[canonical_column] = LatestTabularize.canonicalize_names(
+                df[column], canonical_names)
+        print('Canonical Package Names:', len(set(canonical_names.values())),
+              'of Spellings:', len(canonical_names))
         assert len(package_df) > 0
         assert len(requirement_df) > 0
         assert len(urls_df) > 0
@@ -72,82 +129,75 @@ class LatestTabularize(ObjProcessor):
         return [package_df, requirement_df, urls_df, keywords_df, emails_df]
 
     @staticmethod
-    def simplify_record(
-            record: Dict, license_counter: Counter) -> Dict[str, Union[str, int, float, None]]:
-        """Simplify the nestest record dictionary
-
+    def canonicalize_names(names: pd.Series, canonical_names: Dict[str, str]) -> pd.Series:
+        """
         Args:
-            record (Dict): A nested dictionary
+            - names: package names.
+            - canonical_names: dictionary of canonical names shared by the tables,
+                extended by the names not canonicalized yet.
+        """
+        for name in names.unique():
+            if isinstance(name, str) and name not in canonical_names:
+                canonical_names[name] = canonicalize_name(name)
+        return names.map(canonical_names).where(names.notna())
+
+    @staticmethod
+    def simplify_record(pkg_name: str, latest: Dict, packages: ColumnBuffer,
+                        license_counter: Counter):
+        """Simplify the nestest record dictionary into a row of PACKAGE_COLUMNS
 
-        Returns:
-            Dict: The simplified dictionary that is not nested
+        Args:
+            pkg_name (str): name of the package
+            latest (Dict): A nested dictionary
+            packages (ColumnBuffer): package rows
         """
-        license = record['latest']['info']['license']
+        info = latest['info']
+        license = info['license']
         license_counter[license] += 1
         if license_counter[license] < 2:
             license = None
-        return {
-            'pkg_name': record['name'],
-            'name': record['latest']['info']['name'],
-            'package_url': record['latest']['info']['package_url'],
-            'requires_python': record['latest']['info']['requires_python'],
-            'version': record['latest']['info']['version'],
-            'num_releases': record['latest']['num_releases'],
-            'num_requires_dist': record['latest']['num_info_dependencies'],
-            'license': license
-        }
+        packages.append(
+            pkg_name,
+            info['name'],
+            info['package_url'],
+            info['requires_python'],
+            info['version'],
+            latest['num_releases'],
+            latest['num_info_dependencies'],
+            license
+        )
 
     @staticmethod
-    def simplify_urls(url_type: str, record: Dict) -> Dict[str, str]:
+    def simplify_urls(url_type: str, pkg_name: str, info: Dict, urls: ColumnBuffer):
         """
         Aggregate different type of urls and extract domain name
-        and top level domain name
+        and top level domain name into a row of URL_COLUMNS
         """
         assert url_type in ['package_url', 'docs_url', 'home_page']
-        pkg_name = record['name']
-        url = record['latest']['info'][url_type]
+        url = info[url_type]
         if isinstance(url, str):
             url = url.strip('<>')
-        return {
-            'pkg_name': pkg_name,
-            'url': url,
-            'url_type': url_type,
-            **LatestTabularize._extract_url_features(url)
-        }
+        urls.append(pkg_name, url, url_type, *LatestTabularize._extract_url_features(url))
 
     @staticmethod
-    def simplify_project_urls(
-            record: Dict) -> List[Dict[str, str]]:
-        """Simply nested componenet - project_urls in record
+    def simplify_project_urls(pkg_name: str, info: Dict, urls: ColumnBuffer):
+        """Simply nested componenet - project_urls in record into rows of URL_COLUMNS
 
         Args:
-            record (Dict): A nested dictionary
-
-        Returns:
-            List[Dict]:  List of the simplified dictionary that is not nested
+            pkg_name (str): name of the package
+            info (Dict): A nested dictionary
+            urls (ColumnBuffer): url rows
         """
-        pkg_name = record['name']
-        if isinstance(record['latest']['info']['project_urls'], dict):
-            results = []
-            for key, url in record['latest']['info']['project_urls'].items():
+        if isinstance(info['project_urls'], dict):
+            for key, url in info['project_urls'].items():
                 if url is not None:
                     url = url.strip('<>')
-                    results.append(
-                        {
-                            'pkg_name': pkg_name,
-                            'url': url,
-                            'url_type': key,
-                            **LatestTabularize._extract_url_features(url)
-                        }
-                    )
-            return results
-        else:
-            return []
+                    urls.append(pkg_name, url, key, *LatestTabularize._extract_url_features(url))
 
     @staticmethod
-    def _extract_url_features(url: str) -> Dict[str, str]:
+    def _extract_url_features(url: str) -> Tuple[Optional[str], ...]:
         """
-        Extract domain, top_level_domain, path from url
+        Extract domain, top_level_domain, path, github_repo, github_account from url
         """
         parsed = urlparse(url)
         if len(parsed.netloc):
@@ -162,18 +212,14 @@ class LatestTabularize(ObjProcessor):
             top_level_domain = domain.split('.')[-1]
         else:
             top_level_domain = None
-        return {
-            'domain': domain,
-            'top_level_domain': top_level_domain,
-            'path': path,
-            **LatestTabularize._extract_github_repo(domain, path)
-        }
+        return (domain, top_level_domain, path) + \
+            LatestTabularize._extract_github_repo(domain, path)
 
     @staticmethod
     def _extract_github_repo(
-            domain: Optional[str], path: Optional[str]) -> Dict[str, Optional[str]]:
+            domain: Optional[str], path: Optional[str]) -> Tuple[Optional[str], Optional[str]]:
         """
-        Obtain github repo features from url
+        Obtain github repo features (github_repo, github_account) from url
         """
         if domain is not None and path is not None and domain == 'github.com':
             path = path.strip('/')
@@ -184,40 +230,29 @@ class LatestTabularize(ObjProcessor):
                     github_account = path
                 else:
                     github_account = None
-                return {
-                    'github_repo': None,
-                    'github_account': github_account
-                }
+                return None, github_account
             else:
                 github_repo = '/'.join(path.split('/')[:2])
                 github_account = path.split('/')[0]
-                return {
-                    'github_repo': github_repo,
-                    'github_account': github_account
-                }
+                return github_repo, github_account
         else:
-            return {
-                'github_repo': None,
-                'github_account': None
-            }
+            return None, None
 
     @staticmethod
-    def simplify_emails(
-            role: str, record: Dict) -> List[Dict[str, Optional[str]]]:
+    def simplify_emails(role: str, pkg_name: str, info: Dict, emails: ColumnBuffer):
         """Make email unnested and extract domain name and top level domain name
+        into rows of EMAIL_COLUMNS
         Args:
             role (str): author or maintainer
-            record (Dict): A nested dictionary
-        Returns:
-            List[Dict]:  List of the simplified dictionary with email unnested
+            pkg_name (str): name of the package
+            info (Dict): A nested dictionary
+            emails (ColumnBuffer): email rows
         """
-        pkg_name = record['name']
-        person = record['latest']['info'][role]
-        person_email = record['latest']['info'][f'{role}_email']
+        person = info[role]
+        person_email = info[f'{role}_email']
         if isinstance(person_email, str):
             person, person_email = LatestTabularize._parse_person_n_email(
                 person, person_email)
-        results = []
         if isinstance(person_email, str):
             for email in person_email.split(','):
                 domain = email.split('@')[-1]
@@ -225,19 +260,11 @@ class LatestTabularize(ObjProcessor):
                     top_level_domain = domain.split('.')[-1]
                 else:
                     top_level_domain = None
-                results.append({
-                    'pkg_name': pkg_name,
-                    'person_name': person,
-                    'email_record': person_email,
-                    'email': email,
-                    'domain': domain,
-                    'top_level_domain': top_level_domain,
-                    'role': role
-                })
-        return results
+                emails.append(
+                    pkg_name, person, person_email, email, domain, top_level_domain, role)
 
     def _parse_person_n_email(
-            person_name: Optional[str], person_email: str) -> Dict[str, str]:
+            person_name: Optional[str], person_email: str) -> Tuple[str, str]:
         """
         Clean up email fields
         """
@@ -259,83 +286,58 @@ class LatestTabularize(ObjProcessor):
             return person_name, person_email
 
     @staticmethod
-    def simplify_keywords(record: Dict, counter: Counter,
-                          threshold: int = 5) -> List[Dict[str, str]]:
-        """Make keywords unnested
+    def simplify_keywords(pkg_name: str, info: Dict, keywords: ColumnBuffer,
+                          counter: Counter, threshold: int = 5):
+        """Make keywords unnested into rows of KEYWORD_COLUMNS
         Args:
-            record (Dict): A nested dictionary
-        Returns:
-            List[Dict]:  List of the simplified dictionary with keywords unnested
+            pkg_name (str): name of the package
+            info (Dict): A nested dictionary
+            keywords (ColumnBuffer): keyword rows
         """
-        pkg_name = record['name']
-        results = []
-        keywords = record['latest']['info']['keywords']
-        if isinstance(keywords, str):
-            keywords = keywords.strip('[]').strip('""')
-            if ',' in keywords:
+        _keywords = info['keywords']
+        if isinstance(_keywords, str):
+            _keywords = _keywords.strip('[]').strip('""')
+            if ',' in _keywords:
                 LatestTabularize._parse_n_insert_keywords(
-                    results, counter, pkg_name, keywords, ','
+                    keywords, counter, pkg_name, _keywords, ','
                 )
             else:
                 LatestTabularize._parse_n_insert_keywords(
-                    results, counter, pkg_name, keywords, ' '
+                    keywords, counter, pkg_name, _keywords, ' '
                 )
-        return results
 
     @staticmethod
     def _parse_n_insert_keywords(
-            results: List[Dict[str, str]], counter: Counter, pkg_name: str, keywords: str, split_mark: str):
-        for keyword in keywords.split(split_mark):
+            keywords: ColumnBuffer, counter: Counter, pkg_name: str, _keywords: str, split_mark: str):
+        for keyword in _keywords.split(split_mark):
             _keyword = keyword.strip().lower().strip('[]').strip('""')
             if _keyword != '':
                 counter[_keyword] += 1
                 if counter[_keyword] > 300:
-                    results.append({
-                        'pkg_name': pkg_name,
-                        'keyword': _keyword
-                    })
+                    keywords.append(pkg_name, _keyword)
 
     @staticmethod
-    def simplify_requires_dist(
-            record: Dict) -> List[Dict[str, Union[str, int, float, None]]]:
-        """Simply nested componenet - requires_dict in record
+    def simplify_requires_dist(pkg_name: str, latest: Dict, requirements: ColumnBuffer):
+        """Simply nested componenet - requires_dict in record into rows of REQUIREMENT_COLUMNS
 
         Args:
-            record (Dict): A nested dictionary
-
-        Returns:
-            List[Dict]:  List of the simplified dictionary that is not nested
+            pkg_name (str): name of the package
+            latest (Dict): A nested dictionary
+            requirements (ColumnBuffer): requirement rows
         """
-        data = record['latest']['requires']
+        data = latest['requires']
         if data is not None:
-            results = []
-            for req_name in data:
-                if data[req_name] is None:
-                    result = {
-                        'pkg_name': record['name'],
-                        'required_pkg_name': req_name,
-                        'num_match_dist': 0,
-                        'requirement_string': req_name,
-                        'newest_dist': None,
-                        'oldest_dist': None
-                    }
+            for req_name, req in data.items():
+                if req is None:
+                    requirements.append(pkg_name, req_name, 0, req_name, None, None)
                 else:
-                    num_match_dist = len(data[req_name]['releases'])
-                    if num_match_dist:
-                        newest_dist = max(data[req_name]['releases'])
-                        oldest_dist = min(data[req_name]['releases'])
+                    releases = req['releases']
+                    if releases:
+                        newest_dist = max(releases)
+                        oldest_dist = min(releases)
                     else:
                         newest_dist = None
                         oldest_dist = None
-                    result = {
-                        'pkg_name': record['name'],
-                        'required_pkg_name': req_name,
-                        'num_match_dist': num_match_dist,
-                        'requirement_string': data[req_name]['requirement'],
-                        'newest_dist': newest_dist,
-                        'oldest_dist': oldest_dist
-                    }
-                results.append(result)
-            return results
-        else:
-            return []
+                    requirements.append(
+                        pkg_name, req_name, len(releases), req['requirement'],
+                        newest_dist, oldest_dist)
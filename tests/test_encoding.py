@@ -0,0 +1,47 @@
+import io
+from typing import List
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+from batch_framework.filesystem import LocalBackend
+from src.graph.encoding import EncodedStorage, ParquetOptions
+
+
+def _row_groups(buff: io.BytesIO) -> List[int]:
+    metadata = pq.ParquetFile(io.BytesIO(buff.getvalue())).metadata
+    return [metadata.row_group(i).num_rows for i in range(metadata.num_row_groups)]
+
+
+def _table(num_rows: int) -> pa.Table:
+    rng = np.random.default_rng(0)
+    return pa.table({
+        'from_id': rng.integers(0, 100, num_rows).astype(str),
+        'to_id': np.arange(num_rows).astype(str),
+        'weight': rng.random(num_rows)
+    })
+
+
+@pytest.mark.parametrize('num_rows,batch_sizes', [
+    (2500, [300, 700, 1000, 500]),
+    (2500, [2500]),
+    (2000, [1, 999, 1000]),
+    (700, [100] * 7),
+    (0, [])
+])
+def test_streamed_row_groups_match_encode(tmp_path, num_rows, batch_sizes):
+    options = ParquetOptions(row_group_size=1000, measure_baseline=True)
+    storage = EncodedStorage(LocalBackend(str(tmp_path)), options)
+    table = _table(num_rows)
+    encoded = storage.encode(table, 'link_x')
+    # batches of another size than the row groups, sorted as by the SQL
+    table = table.sort_by([('from_id', 'ascending'), ('to_id', 'ascending')])
+    offsets = np.cumsum([0] + batch_sizes)
+    reader = pa.RecordBatchReader.from_batches(table.schema, [
+        batch for start, end in zip(offsets[:-1], offsets[1:])
+        for batch in table.slice(start, end - start).to_batches()])
+    streamed = io.BytesIO()
+    assert storage.encode_batches(reader, 'link_y', streamed) == num_rows
+    assert _row_groups(streamed) == _row_groups(encoded)
+    assert pq.read_table(streamed).equals(pq.read_table(encoded))
+    assert storage.report['link_y'] == storage.report['link_x']
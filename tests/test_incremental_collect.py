@@ -0,0 +1,74 @@
+from typing import List
+import pandas as pd
+import pytest
+from batch_framework.filesystem import LocalBackend
+from batch_framework.rdb import DuckDBBackend
+from src.graph import MetaGraph
+from src.puppygraph import ResultCollectLayer
+
+METAGRAPH = MetaGraph(
+    subgraphs={'has_b': ('a', 'b')},
+    node_grouping=dict(),
+    link_grouping=dict(),
+    input_ids=['source'],
+    node_sqls={
+        'a': 'SELECT CAST(a AS VARCHAR) AS node_id FROM source',
+        'b': 'SELECT CAST(b AS VARCHAR) AS node_id FROM source'
+    },
+    link_sqls={
+        'has_b': 'SELECT CAST(a AS VARCHAR) AS from_id, CAST(b AS VARCHAR) AS to_id FROM source'
+    }
+)
+TABLES = ['node_a', 'node_b', 'link_has_b']
+
+
+def _write(tmp_path, id: str, df: pd.DataFrame):
+    df.to_parquet(tmp_path / 'graph' / f'{id}.parquet', index=False)
+
+
+def _collect(tmp_path) -> DuckDBBackend:
+    rdb = DuckDBBackend(LocalBackend(str(tmp_path / 'persist')), db_name='demo.db')
+    ResultCollectLayer(
+        rdb, metagraph=METAGRAPH, input_fs=LocalBackend(str(tmp_path / 'graph')),
+        incremental=True).execute()
+    return rdb
+
+
+def _mark_tables(rdb: DuckDBBackend):
+    """
+    Comment every collected table. Comments are dropped with replaced tables.
+    """
+    for id in TABLES:
+        rdb.conn.execute(f"COMMENT ON TABLE {id} IS 'kept'")
+    rdb.conn.close()
+
+
+def _get_kept_tables(rdb: DuckDBBackend) -> List[str]:
+    return sorted(id for id, in rdb.conn.execute(
+        "SELECT table_name FROM duckdb_tables() WHERE comment = 'kept'").fetchall())
+
+
+@pytest.fixture
+def graph(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'graph').mkdir()
+    (tmp_path / 'persist').mkdir()
+    _write(tmp_path, 'node_a_final', pd.DataFrame({'node_id': ['1', '2']}))
+    _write(tmp_path, 'node_b_final', pd.DataFrame({'node_id': ['3']}))
+    _write(tmp_path, 'link_has_b_final', pd.DataFrame(
+        {'from_id': ['1', '2'], 'to_id': ['3', '3']}))
+    return tmp_path
+
+
+def test_unchanged_inputs_keep_tables(graph):
+    _mark_tables(_collect(graph))
+    rdb = _collect(graph)
+    assert _get_kept_tables(rdb) == sorted(TABLES)
+
+
+def test_changed_input_replaces_dependent_table_only(graph):
+    _mark_tables(_collect(graph))
+    _write(graph, 'node_a_final', pd.DataFrame({'node_id': ['1', '2', '4']}))
+    rdb = _collect(graph)
+    assert _get_kept_tables(rdb) == ['link_has_b', 'node_b']
+    assert rdb.conn.execute('SELECT COUNT(*) FROM node_a').fetchone()[0] == 3
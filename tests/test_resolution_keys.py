@@ -0,0 +1,76 @@
+from typing import List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from src.graph.resolution.keys import cluster, normalize_email, person_keys
+
+
+def _resolve(persons: List[Tuple[str, Optional[str], List[str]]]) -> List[int]:
+    """
+    Cluster labels of persons given as (name, email, packages)
+    """
+    df = pd.DataFrame({
+        'name': [name for name, _, _ in persons],
+        'email': [email for _, email, _ in persons]
+    })
+    neighbors = pd.DataFrame([
+        {'record': i, 'node': 'package', 'neighbor_id': package}
+        for i, (_, _, packages) in enumerate(persons) for package in packages
+    ], columns=['record', 'node', 'neighbor_id'])
+    return cluster(person_keys(df, neighbors), len(df)).tolist()
+
+
+def test_normalize_email_drops_tag():
+    emails = pd.Series([' John+PyPI@Gmail.com', 'john@gmail.com', 'no-email', ''])
+    assert normalize_email(emails).tolist() == [
+        'john@gmail.com', 'john@gmail.com', pd.NA, pd.NA]
+
+
+def test_same_email_with_tag():
+    labels = _resolve([
+        ('John Smith', 'john+pypi@gmail.com', ['a']),
+        ('J. Smith', 'John@Gmail.com', ['b'])
+    ])
+    assert labels[0] == labels[1]
+
+
+def test_same_name_and_local_part():
+    labels = _resolve([
+        ('John Smith', 'john@gmail.com', ['a']),
+        ('john  smith', 'JOHN@example.com', ['b']),
+        ('Jane Smith', 'john@example.org', ['c'])
+    ])
+    assert labels[0] == labels[1]
+    assert labels[2] != labels[0]
+
+
+def test_same_name_without_email_within_package():
+    labels = _resolve([
+        ('John Smith', None, ['a']),
+        ('John Smith', 'john.smith@example.com', ['a', 'b']),
+        ('John Smith', None, ['c']),
+        ('John Smith', '', ['d'])
+    ])
+    assert labels[0] == labels[1]
+    # sharing only a name, persons of other packages are not merged
+    assert len({labels[1], labels[2], labels[3]}) == 3
+
+
+def test_different_names_are_not_merged():
+    labels = _resolve([
+        ('John Smith', None, ['a']),
+        ('Jane Smith', None, ['a']),
+        ('John Smith', 'john@gmail.com', ['b']),
+        ('Jane Smith', 'jane@gmail.com', ['b'])
+    ])
+    assert len(set(labels)) == 4
+
+
+def test_cluster_is_transitive():
+    # 0-1 share the first key, 1-2 the keys of several values, 3 has no key
+    keys = [
+        np.array([5, 5, -1, -1]),
+        (np.array([1, 1, 2, 3]), np.array([7, 8, 8, -1]))
+    ]
+    labels = cluster(keys, 4).tolist()
+    assert labels[0] == labels[1] == labels[2]
+    assert labels[3] != labels[0]